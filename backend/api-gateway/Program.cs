@@ -1,3 +1,4 @@
+using System.Net;
 using Microsoft.EntityFrameworkCore;
 using ResumeScoring.Api.Data;
 
@@ -21,6 +22,13 @@ builder.Services.AddControllers();
 builder.Services.AddEndpointsApiExplorer();
 builder.Services.AddSwaggerGen();
 
+// Python services compress large JSON responses when the client accepts it
+builder.Services.ConfigureHttpClientDefaults(http =>
+    http.ConfigurePrimaryHttpMessageHandler(() => new HttpClientHandler
+    {
+        AutomaticDecompression = DecompressionMethods.GZip | DecompressionMethods.Deflate
+    }));
+
 // Add HttpClient for parsing service
 builder.Services.AddHttpClient("ParsingService", client =>
 {
@@ -0,0 +1,337 @@
+"""
+Synthetic resume corpus generator
+
+Writes resumes in the formats the parsing service accepts. Each run also
+writes a manifest.json describing every file, which loadgen.py reads.
+
+Formats:
+    pdf        text PDF, laid out over as many pages as the content needs
+    pdf-image  the same PDF rasterized, one image per page and no text
+               layer, so parsing has to go through OCR
+    docx       Word document with headings, paragraphs and bullet lists
+    txt        plain text
+
+Content is drawn from a fixed seed, so a given set of arguments always
+produces the same corpus. The knobs:
+    --words          target length range per resume, e.g. 300-1500
+    --sections       which sections to include and in what order
+    --skill-density  fraction of experience bullets that mention a skill
+
+Requires PyMuPDF for the PDF formats and python-docx for DOCX. Both are
+in the parsing service's requirements.
+
+Usage:
+    python corpus.py --out corpus --count 200
+    python corpus.py --out corpus-ocr --count 20 --formats pdf-image --words 400-600
+"""
+
+import json
+import random
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+SECTIONS = ('summary', 'experience', 'education', 'skills', 'certifications', 'projects')
+
+SKILLS = [
+    'Python', 'JavaScript', 'TypeScript', 'Java', 'C++', 'C#', 'Go', 'Rust', 'PHP', 'Ruby', 'Kotlin', 'Swift',
+    'SQL', 'React', 'Angular', 'Vue.js', 'Node.js', 'Django', 'Flask', 'FastAPI', 'Spring Boot', '.NET',
+    'PostgreSQL', 'MySQL', 'MongoDB', 'Redis', 'Elasticsearch', 'Kafka', 'RabbitMQ', 'Docker', 'Kubernetes',
+    'Terraform', 'Ansible', 'AWS', 'Azure', 'GCP', 'Jenkins', 'GitHub Actions', 'Linux', 'Git', 'GraphQL',
+    'REST APIs', 'Microservices', 'TensorFlow', 'PyTorch', 'scikit-learn', 'Pandas', 'NumPy', 'Spark',
+    'Airflow', 'Tableau', 'Power BI', 'Machine Learning', 'Data Analysis', 'Agile', 'Scrum'
+]
+FIRST_NAMES = ['Alex', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn', 'Rowan',
+               'Sam', 'Devon', 'Priya', 'Wei', 'Amara', 'Mateo', 'Yuki', 'Nadia', 'Omar', 'Elena']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Patel', 'Kim', 'Novak', 'Okafor', 'Silva', 'Müller', 'Haddad',
+              'Johansson', 'Rossi', 'Nguyen', 'Kowalski', 'Brown', 'Ivanova', 'Tanaka', 'Mensah']
+CITIES = ['Austin, TX', 'Seattle, WA', 'London, UK', 'Berlin, Germany', 'Toronto, ON', 'Bangalore, India',
+          'New York, NY', 'Amsterdam, NL', 'Sydney, AU', 'Remote']
+TITLES = ['Software Engineer', 'Senior Software Engineer', 'Backend Developer', 'Data Engineer',
+          'Data Scientist', 'DevOps Engineer', 'Full Stack Developer', 'Machine Learning Engineer',
+          'Engineering Manager', 'Site Reliability Engineer', 'Frontend Developer', 'Solutions Architect']
+COMPANIES = ['Acme Corp', 'Globex', 'Initech', 'Umbrella Analytics', 'Stark Industries', 'Wayne Enterprises',
+             'Hooli', 'Vandelay Industries', 'Soylent Systems', 'Cyberdyne', 'Tyrell Labs', 'Aperture Software']
+DEGREES = ['B.Sc. Computer Science', 'M.Sc. Computer Science', 'B.Eng. Software Engineering',
+           'M.Sc. Data Science', 'B.A. Mathematics', 'Ph.D. Machine Learning', 'B.Sc. Information Systems']
+SCHOOLS = ['State University', 'Institute of Technology', 'University of Toronto', 'Technical University of Munich',
+           'National University', 'Imperial College London', 'University of Washington']
+CERTIFICATIONS = ['AWS Certified Solutions Architect', 'Certified Kubernetes Administrator',
+                  'Google Professional Data Engineer', 'Microsoft Azure Fundamentals', 'PMP',
+                  'Certified Scrum Master', 'Oracle Certified Java Programmer', 'Terraform Associate']
+VERBS = ['Built', 'Designed', 'Led', 'Migrated', 'Optimized', 'Automated', 'Implemented', 'Maintained',
+         'Scaled', 'Refactored', 'Introduced', 'Delivered']
+OBJECTS = ['a customer-facing API', 'the billing pipeline', 'an internal analytics platform',
+           'the deployment process', 'a real-time event processing system', 'the search service',
+           'the mobile backend', 'a data warehouse', 'monitoring and alerting', 'the authentication service']
+OUTCOMES = ['reducing latency by {n}%', 'serving {n}k requests per second', 'cutting costs by {n}%',
+            'improving test coverage to {n}%', 'for a team of {n} engineers', 'across {n} regions',
+            'reducing incident volume by {n}%', 'shortening release cycles by {n}%']
+FILLER = ('Collaborated with product and design to define requirements and ship iteratively. '
+          'Mentored junior engineers and ran code reviews. Wrote technical documentation and runbooks. '
+          'Participated in on-call rotation and postmortems').split('. ')
+
+
+class ResumeGenerator:
+    """Builds resume content as (style, text) lines, then renders it per format"""
+
+    def __init__(self, rng: random.Random, sections: List[str], skill_density: float):
+        self.rng = rng
+        self.sections = sections
+        self.skill_density = skill_density
+
+    def _bullet(self, skills: List[str]) -> str:
+        rng = self.rng
+        sentence = f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}"
+        if rng.random() < self.skill_density:
+            used = rng.sample(skills, k=min(len(skills), rng.randint(1, 3)))
+            sentence += f" using {', '.join(used)}"
+        return f"{sentence}, {rng.choice(OUTCOMES).format(n=rng.randint(2, 90))}."
+
+    def build(self, target_words: int) -> Dict[str, Any]:
+        rng = self.rng
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        skills = rng.sample(SKILLS, k=rng.randint(6, 18))
+        title = rng.choice(TITLES)
+        lines = [
+            ('title', name),
+            ('contact', f"{title} | {rng.choice(CITIES)}"),
+            ('contact', f"{name.lower().replace(' ', '.')}@example.com | +1 555 {rng.randint(100, 999)} "
+                        f"{rng.randint(1000, 9999)} | linkedin.com/in/{name.lower().replace(' ', '')}")
+        ]
+        years = rng.randint(1, 20)
+        jobs = max(1, min(8, years // 3 + 1))
+        bullets_per_job = 3
+
+        # Grow the experience section until the target length is reached. Each
+        # attempt replays the same random stream, so only the bullet count changes.
+        section_seed = rng.random()
+        while True:
+            self.rng = random.Random(section_seed)
+            body = self._sections(skills, title, years, jobs, bullets_per_job)
+            words = sum(len(text.split()) for _, text in lines + body)
+            if words >= target_words or bullets_per_job >= 40:
+                break
+            bullets_per_job += 1
+        lines += body
+        return {'name': name, 'skills': skills, 'years': years, 'lines': lines,
+                'words': sum(len(text.split()) for _, text in lines)}
+
+    def _sections(self, skills, title, years, jobs, bullets_per_job):
+        out = []
+        for section in self.sections:
+            out += getattr(self, f"_section_{section}")(skills, title, years, jobs, bullets_per_job)
+        return out
+
+    def _section_summary(self, skills, title, years, jobs, bullets):
+        return [('heading', 'Summary'),
+                ('paragraph', f"{title} with {years} years of experience in {', '.join(skills[:3])}. "
+                              f"{self.rng.choice(FILLER)}.")]
+
+    def _section_experience(self, skills, title, years, jobs, bullets):
+        out = [('heading', 'Experience')]
+        end = 2024
+        for i in range(jobs):
+            span = max(1, years // jobs)
+            start = end - span
+            role = title if i == 0 else self.rng.choice(TITLES)
+            out.append(('subheading', f"{role} - {self.rng.choice(COMPANIES)}"))
+            out.append(('meta', f"{'Jan' if i % 2 else 'Jun'} {start} - {'Present' if i == 0 else f'Dec {end}'}"))
+            out += [('bullet', self._bullet(skills)) for _ in range(bullets)]
+            end = start
+        return out
+
+    def _section_education(self, skills, title, years, jobs, bullets):
+        out = [('heading', 'Education')]
+        for _ in range(self.rng.randint(1, 2)):
+            out.append(('subheading', f"{self.rng.choice(DEGREES)} - {self.rng.choice(SCHOOLS)}"))
+            out.append(('meta', str(2024 - years - self.rng.randint(0, 4))))
+        return out
+
+    def _section_skills(self, skills, title, years, jobs, bullets):
+        return [('heading', 'Skills'), ('paragraph', ', '.join(skills))]
+
+    def _section_certifications(self, skills, title, years, jobs, bullets):
+        certs = self.rng.sample(CERTIFICATIONS, k=self.rng.randint(0, 3))
+        if not certs:
+            return []
+        return [('heading', 'Certifications')] + [('bullet', cert) for cert in certs]
+
+    def _section_projects(self, skills, title, years, jobs, bullets):
+        out = [('heading', 'Projects')]
+        for _ in range(self.rng.randint(1, 3)):
+            out.append(('subheading', f"{self.rng.choice(OBJECTS).capitalize()} side project"))
+            out.append(('bullet', self._bullet(skills)))
+        return out
+
+
+def render_txt(lines, path: Path):
+    out = []
+    for style, text in lines:
+        if style == 'heading':
+            out += ['', text.upper(), '-' * len(text)]
+        elif style == 'bullet':
+            out.append(f"- {text}")
+        else:
+            out.append(text)
+    path.write_text('\n'.join(out) + '\n', encoding='utf-8')
+
+
+def render_docx(lines, path: Path):
+    import docx
+
+    document = docx.Document()
+    for style, text in lines:
+        if style == 'title':
+            document.add_heading(text, level=0)
+        elif style == 'heading':
+            document.add_heading(text, level=1)
+        elif style == 'subheading':
+            document.add_heading(text, level=2)
+        elif style == 'bullet':
+            document.add_paragraph(text, style='List Bullet')
+        else:
+            document.add_paragraph(text)
+    document.save(str(path))
+
+
+_HTML_TAGS = {'title': 'h1', 'heading': 'h2', 'subheading': 'h3', 'meta': 'p', 'contact': 'p', 'paragraph': 'p'}
+
+
+def _html(lines) -> str:
+    from html import escape
+
+    parts, in_list = [], False
+    for style, text in lines:
+        if style == 'bullet':
+            if not in_list:
+                parts.append('<ul>')
+                in_list = True
+            parts.append(f"<li>{escape(text)}</li>")
+            continue
+        if in_list:
+            parts.append('</ul>')
+            in_list = False
+        tag = _HTML_TAGS[style]
+        parts.append(f"<{tag}>{escape(text)}</{tag}>")
+    if in_list:
+        parts.append('</ul>')
+    return ''.join(parts)
+
+
+def render_pdf(lines, path: Path) -> int:
+    import fitz
+
+    story = fitz.Story(html=_html(lines), user_css='body {font-family: sans-serif; font-size: 10pt;}')
+    mediabox = fitz.paper_rect('letter')
+    where = mediabox + (54, 54, -54, -54)
+    writer = fitz.DocumentWriter(str(path))
+    more, pages = 1, 0
+    while more:
+        device = writer.begin_page(mediabox)
+        more, _ = story.place(where)
+        story.draw(device)
+        writer.end_page()
+        pages += 1
+    writer.close()
+    return pages
+
+
+def render_image_pdf(lines, path: Path, dpi: int) -> int:
+    import fitz
+
+    text_path = path.with_suffix('.text.pdf')
+    render_pdf(lines, text_path)
+    try:
+        with fitz.open(str(text_path)) as source, fitz.open() as scanned:
+            for page in source:
+                pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+                target = scanned.new_page(width=page.rect.width, height=page.rect.height)
+                target.insert_image(target.rect, pixmap=pixmap)
+            scanned.save(str(path), deflate=True)
+            return len(scanned)
+    finally:
+        text_path.unlink(missing_ok=True)
+
+
+EXTENSIONS = {'pdf': 'pdf', 'pdf-image': 'pdf', 'docx': 'docx', 'txt': 'txt'}
+
+
+def parse_range(value: str):
+    low, _, high = value.partition('-')
+    return int(low), int(high or low)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default='corpus', help='Output directory')
+    parser.add_argument('--count', type=int, default=100, help='Number of resumes')
+    parser.add_argument('--formats', default='pdf,docx,txt,pdf-image',
+                        help=f"Comma-separated formats, cycled through ({', '.join(EXTENSIONS)})")
+    parser.add_argument('--words', default='300-1200', help='Target word count range per resume')
+    parser.add_argument('--sections', default=','.join(SECTIONS), help='Sections to include, in order')
+    parser.add_argument('--skill-density', type=float, default=0.5,
+                        help='Fraction of experience bullets mentioning a skill (0-1)')
+    parser.add_argument('--dpi', type=int, default=150, help='Raster resolution of image-only PDFs')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    sections = [s.strip() for s in args.sections.split(',') if s.strip()]
+    for fmt in formats:
+        if fmt not in EXTENSIONS:
+            parser.error(f"Unknown format: {fmt}")
+    for section in sections:
+        if section not in SECTIONS:
+            parser.error(f"Unknown section: {section}")
+    low, high = parse_range(args.words)
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(args.seed)
+    entries = []
+    for i in range(args.count):
+        fmt = formats[i % len(formats)]
+        generator = ResumeGenerator(random.Random(rng.random()), sections, args.skill_density)
+        resume = generator.build(rng.randint(low, high))
+        filename = f"resume_{i:05d}{'_scan' if fmt == 'pdf-image' else ''}.{EXTENSIONS[fmt]}"
+        path = out / filename
+
+        pages = None
+        if fmt == 'txt':
+            render_txt(resume['lines'], path)
+        elif fmt == 'docx':
+            render_docx(resume['lines'], path)
+        elif fmt == 'pdf':
+            pages = render_pdf(resume['lines'], path)
+        else:
+            pages = render_image_pdf(resume['lines'], path, args.dpi)
+
+        entries.append({
+            'file': filename,
+            'format': fmt,
+            'bytes': path.stat().st_size,
+            'pages': pages,
+            'words': resume['words'],
+            'years': resume['years'],
+            'skills': resume['skills'],
+            'sections': sections
+        })
+        if (i + 1) % 50 == 0:
+            print(f"{i + 1}/{args.count} written", flush=True)
+
+    manifest = {
+        'seed': args.seed,
+        'words': [low, high],
+        'skill_density': args.skill_density,
+        'formats': formats,
+        'documents': entries
+    }
+    with open(out / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    total = sum(e['bytes'] for e in entries)
+    print(f"Wrote {len(entries)} resumes ({total / 1024 / 1024:.1f} MB) to {out}")
+
+
+if __name__ == '__main__':
+    main()
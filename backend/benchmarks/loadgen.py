@@ -0,0 +1,362 @@
+"""
+End-to-end load generator for the Python services
+
+Drives the service endpoints with documents from a corpus.py corpus, one
+endpoint at a time, at a fixed client concurrency:
+
+    parse        POST /parse          (parsing, one file per request)
+    parse_batch  POST /parse/batch    (parsing, --batch-size files)
+    extract      POST /extract        (nlp, parsed_data of a corpus file)
+    embed        POST /embed          (embedding, --embed-batch texts)
+    score        POST /score          (scoring, extracted profile vs a job)
+
+The extract, embed and score payloads come from the services themselves:
+a warmup pass parses --prepare files and extracts profiles from them.
+Endpoints whose inputs could not be prepared are skipped.
+
+Per endpoint it reports throughput and latency percentiles, and per stage
+the percentiles of the Server-Timing durations the services return. The
+report (--json) carries the git revision and host details so runs can be
+compared across versions; --compare prints the change against an earlier
+report.
+
+Usage:
+    python corpus.py --out corpus --count 100
+    python loadgen.py --corpus corpus --concurrency 8 --duration 30 --json run.json
+    python loadgen.py --corpus corpus --endpoints score,embed --compare run.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import gzip
+import platform
+import argparse
+import threading
+import subprocess
+import http.client
+from pathlib import Path
+from datetime import datetime
+from urllib.parse import urlsplit
+
+ENDPOINTS = ('parse', 'parse_batch', 'extract', 'embed', 'score')
+CONTENT_TYPES = {'pdf': 'application/pdf', 'txt': 'text/plain',
+                 'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'}
+JOB = {
+    'title': 'Senior Backend Engineer',
+    'description': 'Build and scale Python microservices on AWS and Kubernetes.',
+    'required_skills': ['Python', 'Docker', 'Kubernetes', 'AWS', 'PostgreSQL'],
+    'required_experience_years': 5
+}
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(q / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def multipart(files, field):
+    """Encode (filename, bytes) pairs as a multipart/form-data body"""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for filename, data in files:
+        extension = filename.rsplit('.', 1)[-1]
+        body.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; "
+                   f"filename=\"{filename}\"\r\nContent-Type: {CONTENT_TYPES.get(extension, 'application/octet-stream')}"
+                   f"\r\n\r\n".encode('utf-8'))
+        body.write(data)
+        body.write(b'\r\n')
+    body.write(f"--{boundary}--\r\n".encode('utf-8'))
+    return body.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+def parse_server_timing(header):
+    """'ocr_page;dur=812.4;desc="x3", total;dur=900' -> {'ocr_page': 812.4, 'total': 900.0}"""
+    stages = {}
+    for entry in (header or '').split(','):
+        parts = [p.strip() for p in entry.split(';')]
+        if not parts[0]:
+            continue
+        for param in parts[1:]:
+            if param.startswith('dur='):
+                try:
+                    stages[parts[0]] = float(param[4:])
+                except ValueError:
+                    pass
+    return stages
+
+
+class Client:
+    """Keep-alive HTTP client for one thread"""
+
+    def __init__(self, base_url, timeout, accept_encoding=None):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.timeout = timeout
+        self.accept_encoding = accept_encoding
+        self.conn = None
+
+    def request(self, path, body, content_type):
+        headers = {'Content-Type': content_type}
+        if self.accept_encoding:
+            headers['Accept-Encoding'] = self.accept_encoding
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request('POST', path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                return response.status, data, response.getheader('Server-Timing'), response.getheader(
+                    'Content-Encoding')
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def post_json(self, path, payload):
+        status, data, _, encoding = self.request(path, json.dumps(payload).encode('utf-8'), 'application/json')
+        if encoding == 'gzip':
+            data = gzip.decompress(data)
+        return status, json.loads(data) if data else None
+
+
+class Workload:
+    """Cycles through prepared request bodies for one endpoint"""
+
+    def __init__(self, name, base_url, path, bodies, documents_per_request=1):
+        self.name = name
+        self.base_url = base_url
+        self.path = path
+        self.bodies = bodies
+        self.documents_per_request = documents_per_request
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def next_body(self):
+        with self._lock:
+            body = self.bodies[self._next % len(self.bodies)]
+            self._next += 1
+        return body
+
+
+def load_corpus(corpus_dir, limit=None):
+    manifest = json.loads((corpus_dir / 'manifest.json').read_text(encoding='utf-8'))
+    documents = manifest['documents'][:limit] if limit else manifest['documents']
+    return [(doc['file'], (corpus_dir / doc['file']).read_bytes(), doc) for doc in documents]
+
+
+def prepare(args, documents):
+    """Build request bodies per endpoint; parsed and extracted inputs come from the services"""
+    urls = {'parsing': args.parsing_url, 'nlp': args.nlp_url, 'embedding': args.embedding_url,
+            'scoring': args.scoring_url}
+    workloads = {}
+    wanted = set(args.endpoints)
+
+    parse_bodies = [multipart([(name, data)], 'file') for name, data, _ in documents]
+    if 'parse' in wanted:
+        workloads['parse'] = Workload('parse', urls['parsing'], '/parse', parse_bodies)
+    if 'parse_batch' in wanted:
+        size = args.batch_size
+        batches = [documents[i:i + size] for i in range(0, len(documents), size)]
+        workloads['parse_batch'] = Workload('parse_batch', urls['parsing'], '/parse/batch',
+                                            [multipart([(n, d) for n, d, _ in batch], 'files') for batch in batches],
+                                            documents_per_request=len(documents) / max(len(batches), 1))
+
+    if not wanted & {'extract', 'embed', 'score'}:
+        return workloads
+
+    parsed, extracted = [], []
+    parser_client, nlp_client = Client(urls['parsing'], args.timeout), Client(urls['nlp'], args.timeout)
+    for (name, _, doc), (body, content_type) in list(zip(documents, parse_bodies))[:args.prepare]:
+        try:
+            status, data, _, _ = parser_client.request('/parse', body, content_type)
+            if status != 200:
+                print(f"  prepare: /parse {name} -> {status}", file=sys.stderr)
+                continue
+            parsed_data = json.loads(data)['parsed_data']
+            parsed.append(parsed_data)
+        except OSError as e:
+            print(f"  prepare: parsing service unavailable ({e})", file=sys.stderr)
+            break
+        if 'score' in wanted:
+            try:
+                status, result = nlp_client.post_json('/extract', {'parsed_data': parsed_data})
+                if status == 200:
+                    extracted.append(result['extracted_data'])
+            except OSError as e:
+                print(f"  prepare: nlp service unavailable ({e})", file=sys.stderr)
+
+    def json_bodies(payloads):
+        return [(json.dumps(p).encode('utf-8'), 'application/json') for p in payloads]
+
+    if 'extract' in wanted and parsed:
+        workloads['extract'] = Workload('extract', urls['nlp'], '/extract',
+                                        json_bodies({'parsed_data': p} for p in parsed))
+    if 'embed' in wanted and parsed:
+        texts = [p['text'] for p in parsed]
+        batches = [[texts[(i + j) % len(texts)] for j in range(args.embed_batch)] for i in range(len(texts))]
+        workloads['embed'] = Workload('embed', urls['embedding'], '/embed',
+                                      json_bodies({'texts': batch} for batch in batches),
+                                      documents_per_request=args.embed_batch)
+    if 'score' in wanted and extracted:
+        workloads['score'] = Workload('score', urls['scoring'], '/score',
+                                      json_bodies({'candidate': c, 'job': JOB} for c in extracted))
+
+    for name in args.endpoints:
+        if name not in workloads:
+            print(f"  skipping {name}: no inputs could be prepared", file=sys.stderr)
+    return workloads
+
+
+def drive(workload, args):
+    latencies, stages, errors, response_bytes = [], {}, [0], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    accept = 'gzip' if args.gzip else None
+
+    def worker():
+        client = Client(workload.base_url, args.timeout, accept)
+        local_latencies, local_stages, local_errors, local_bytes = [], {}, 0, 0
+        while time.perf_counter() < deadline:
+            body, content_type = workload.next_body()
+            start = time.perf_counter()
+            try:
+                status, data, timing, _ = client.request(workload.path, body, content_type)
+            except OSError:
+                local_errors += 1
+                time.sleep(0.1)
+                continue
+            elapsed = time.perf_counter() - start
+            if status >= 400:
+                local_errors += 1
+                continue
+            local_latencies.append(elapsed)
+            local_bytes += len(data)
+            for stage, duration in parse_server_timing(timing).items():
+                local_stages.setdefault(stage, []).append(duration)
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+            response_bytes[0] += local_bytes
+            for stage, values in local_stages.items():
+                stages.setdefault(stage, []).extend(values)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 2)
+    stage_report = {}
+    for stage, values in sorted(stages.items()):
+        values.sort()
+        stage_report[stage] = {'count': len(values), 'p50_ms': round(percentile(values, 50), 2),
+                               'p95_ms': round(percentile(values, 95), 2), 'p99_ms': round(percentile(values, 99), 2)}
+    return {
+        'path': workload.path,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / wall, 2),
+        'documents_per_s': round(len(latencies) * workload.documents_per_request / wall, 2),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1]) if latencies else 0.0,
+        'response_kb': round(response_bytes[0] / 1024 / max(len(latencies), 1), 1),
+        'stages': stage_report
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(report, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+    print(f"\nvs {baseline_path} ({baseline.get('label') or baseline.get('git_revision')}):")
+    for name, row in report['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            continue
+        change = lambda new, prev: f"{(new - prev) / prev * 100:+.1f}%" if prev else 'n/a'
+        print(f"  {name:<12} rps {old['throughput_rps']} -> {row['throughput_rps']} "
+              f"({change(row['throughput_rps'], old['throughput_rps'])})  "
+              f"p95 {old['p95_ms']} -> {row['p95_ms']} ms ({change(row['p95_ms'], old['p95_ms'])})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', required=True, help='Directory written by corpus.py')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='Comma-separated endpoints to drive')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients per endpoint')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds of load per endpoint')
+    parser.add_argument('--limit', type=int, help='Use only the first N corpus documents')
+    parser.add_argument('--prepare', type=int, default=20, help='Documents parsed up front for the JSON endpoints')
+    parser.add_argument('--batch-size', type=int, default=8, help='Files per /parse/batch request')
+    parser.add_argument('--embed-batch', type=int, default=8, help='Texts per /embed request')
+    parser.add_argument('--gzip', action='store_true', help='Send Accept-Encoding: gzip')
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--parsing-url', default=os.getenv('PARSING_URL', 'http://127.0.0.1:5001'))
+    parser.add_argument('--nlp-url', default=os.getenv('NLP_URL', 'http://127.0.0.1:5002'))
+    parser.add_argument('--embedding-url', default=os.getenv('EMBEDDING_URL', 'http://127.0.0.1:5003'))
+    parser.add_argument('--scoring-url', default=os.getenv('SCORING_URL', 'http://127.0.0.1:5004'))
+    parser.add_argument('--label', help='Free-form label stored in the report, e.g. a version')
+    parser.add_argument('--json', help='Write the report to this file')
+    parser.add_argument('--compare', help='Earlier --json report to compare against')
+    args = parser.parse_args()
+
+    args.endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    for name in args.endpoints:
+        if name not in ENDPOINTS:
+            parser.error(f"Unknown endpoint: {name}")
+
+    documents = load_corpus(Path(args.corpus), args.limit)
+    print(f"Corpus: {len(documents)} documents from {args.corpus}", flush=True)
+    workloads = prepare(args, documents)
+
+    results = {}
+    for name in args.endpoints:
+        if name not in workloads:
+            continue
+        row = drive(workloads[name], args)
+        results[name] = row
+        print(f"{name:<12} rps={row['throughput_rps']:<8} docs/s={row['documents_per_s']:<8} "
+              f"p50={row['p50_ms']}ms p95={row['p95_ms']}ms p99={row['p99_ms']}ms errors={row['errors']}", flush=True)
+        for stage, stats in row['stages'].items():
+            print(f"    {stage:<28} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+
+    report = {
+        'label': args.label,
+        'git_revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'config': {'corpus': str(args.corpus), 'documents': len(documents), 'concurrency': args.concurrency,
+                   'duration_s': args.duration, 'batch_size': args.batch_size, 'embed_batch': args.embed_batch,
+                   'gzip': args.gzip},
+        'results': results
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
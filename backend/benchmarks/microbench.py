@@ -0,0 +1,400 @@
+"""
+Microbenchmarks of the services' hot functions, with per-machine baselines
+
+Times individual functions on fixed fixtures generated with corpus.py:
+
+    parsing.detect_sections       DocumentParser._detect_sections
+    parsing.parse_pdf / parse_docx  DocumentParser._parse_pdf / _parse_docx
+    nlp.extract_skills            ResumeExtractor._extract_skills
+    nlp.extract_experience        ResumeExtractor._extract_experience
+    nlp.calculate_duration        ResumeExtractor._calculate_duration
+    scoring.calculate_score       CandidateScorer.calculate_score (one candidate)
+    scoring.calculate_scores_500  CandidateScorer.calculate_scores (500 candidates)
+    embedding.encode_b{1,8,32}    model.encode at several batch sizes
+
+Services are imported in-process. Benchmarks whose service dependencies or
+models are not installed are reported as skipped.
+
+Each benchmark is calibrated so that one sample runs for at least
+--min-time, then --samples samples of the per-call time are taken. A
+baseline is a saved run, one file per machine under --baseline-dir. The
+machine is identified by CPU model, core count, architecture and Python
+version. A benchmark counts as regressed when both of these hold:
+- its median time is more than --tolerance above the baseline median
+- a one-sided Mann-Whitney U test on the samples gives p < --alpha
+Requiring both keeps noise from failing the check on small shifts.
+
+Usage:
+    python microbench.py --save              # record this machine's baseline
+    python microbench.py --check             # exit 1 if a hot path regressed
+    python microbench.py --filter scoring --samples 30 --json micro.json
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import importlib.util
+from pathlib import Path
+from datetime import datetime
+
+BENCH_DIR = Path(__file__).resolve().parent
+SERVICES_DIR = BENCH_DIR.parent / 'services'
+sys.path.insert(0, str(BENCH_DIR))
+from corpus import ResumeGenerator, SECTIONS, render_txt, render_pdf, render_docx  # noqa: E402
+
+JOB = {
+    'title': 'Senior Backend Engineer',
+    'required_skills': ['Python', 'Docker', 'Kubernetes', 'AWS', 'PostgreSQL'],
+    'required_experience_years': 5
+}
+
+
+class Skip(Exception):
+    """A benchmark cannot run on this machine (missing dependency or model)"""
+
+
+# ----------------------------------------------------------------------
+# Fixtures and service loading
+# ----------------------------------------------------------------------
+
+class Fixtures:
+    """Deterministic resumes shared by all benchmarks, written to a scratch directory"""
+
+    def __init__(self, workdir: Path):
+        self.workdir = workdir
+        self.resume = ResumeGenerator(random.Random(1234), list(SECTIONS), 0.5).build(900)
+        self.txt_path = workdir / 'resume.txt'
+        render_txt(self.resume['lines'], self.txt_path)
+        self.text = self.txt_path.read_text(encoding='utf-8')
+        self.sections = self._sections()
+        self._files = {}
+
+    def _sections(self):
+        # Same shape as the parsing service's section list
+        lower, sections = self.text.lower(), []
+        for i, line in enumerate(self.text.split('\n')):
+            if line.strip().lower() in SECTIONS:
+                sections.append({'type': line.strip().lower(), 'header': line.strip(), 'line_number': i,
+                                 'position': lower.find(line.strip().lower())})
+        return sections
+
+    def file(self, fmt: str) -> str:
+        if fmt not in self._files:
+            path = self.workdir / f"resume.{fmt}"
+            try:
+                (render_pdf if fmt == 'pdf' else render_docx)(self.resume['lines'], path)
+            except ImportError as e:
+                raise Skip(f"cannot build {fmt} fixture: {e}")
+            self._files[fmt] = str(path)
+        return self._files[fmt]
+
+    def candidates(self, n: int):
+        rng = random.Random(n)
+        pool = ['Python', 'Java', 'Docker', 'AWS', 'React', 'SQL', 'Kubernetes', 'Go', 'PostgreSQL', 'Terraform']
+        return [{
+            'skills': {'technical': rng.sample(pool, k=rng.randint(2, 6))},
+            'metadata': {'total_experience_years': rng.randint(0, 15)},
+            'education': [{}] * rng.randint(0, 2),
+            'certifications': [{}] * rng.randint(0, 3)
+        } for _ in range(n)]
+
+
+_services = {}
+
+
+def service(name: str):
+    """Import backend/services/<name>/app.py once, as <name>_service"""
+    if name not in _services:
+        service_dir = SERVICES_DIR / name
+        for path in (str(SERVICES_DIR), str(service_dir)):
+            if path not in sys.path:
+                sys.path.insert(0, path)
+        spec = importlib.util.spec_from_file_location(f"{name}_service", service_dir / 'app.py')
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        try:
+            spec.loader.exec_module(module)
+        except ImportError as e:
+            del sys.modules[spec.name]
+            _services[name] = Skip(f"{name} service dependencies not installed: {e}")
+        else:
+            _services[name] = module
+    loaded = _services[name]
+    if isinstance(loaded, Skip):
+        raise loaded
+    return loaded
+
+
+def _nlp_extractor():
+    nlp = service('nlp')
+    if nlp.nlp_model is None:
+        try:
+            nlp.load_models(run_warmup=False)
+        except Exception as e:
+            raise Skip(f"NLP models unavailable: {e}")
+    return nlp.ResumeExtractor()
+
+
+def _embedding_model():
+    embedding = service('embedding')
+    if embedding.model is None:
+        try:
+            embedding.load_model(run_warmup=False)
+        except Exception as e:
+            raise Skip(f"embedding model unavailable: {e}")
+    return embedding.model
+
+
+# ----------------------------------------------------------------------
+# Benchmarks: each setup returns the zero-argument callable to time
+# ----------------------------------------------------------------------
+
+def bench_detect_sections(fx):
+    parser = service('parsing').DocumentParser()
+    return lambda: parser._detect_sections(fx.text)
+
+
+def bench_parse_pdf(fx):
+    parser, path = service('parsing').DocumentParser(), fx.file('pdf')
+    return lambda: parser._parse_pdf(path)
+
+
+def bench_parse_docx(fx):
+    parser, path = service('parsing').DocumentParser(), fx.file('docx')
+    return lambda: parser._parse_docx(path)
+
+
+def bench_extract_skills(fx):
+    extractor = _nlp_extractor()
+    return lambda: extractor._extract_skills(fx.text, fx.sections)
+
+
+def bench_extract_experience(fx):
+    extractor = _nlp_extractor()
+    return lambda: extractor._extract_experience(fx.text, fx.sections)
+
+
+def bench_calculate_duration(fx):
+    extractor = service('nlp').ResumeExtractor()
+    pairs = [('Jan 2016', 'Dec 2018'), ('06/2019', 'Present'), ('2012', '2015'), ('March 2020', 'current')]
+    return lambda: [extractor._calculate_duration(start, end) for start, end in pairs]
+
+
+def bench_calculate_score(fx):
+    scorer, candidate = service('scoring').scorer, fx.candidates(1)[0]
+    return lambda: scorer.calculate_score(candidate, JOB)
+
+
+def bench_calculate_scores(fx):
+    scorer, candidates = service('scoring').scorer, fx.candidates(500)
+    return lambda: scorer.calculate_scores(candidates, JOB)
+
+
+def bench_encode(batch_size):
+    def setup(fx):
+        model = _embedding_model()
+        paragraphs = [p for p in fx.text.split('\n') if len(p.split()) > 5]
+        texts = [paragraphs[i % len(paragraphs)] for i in range(batch_size)]
+        return lambda: model.encode(texts, batch_size=32, show_progress_bar=False)
+    return setup
+
+
+BENCHMARKS = {
+    'parsing.detect_sections': bench_detect_sections,
+    'parsing.parse_pdf': bench_parse_pdf,
+    'parsing.parse_docx': bench_parse_docx,
+    'nlp.extract_skills': bench_extract_skills,
+    'nlp.extract_experience': bench_extract_experience,
+    'nlp.calculate_duration': bench_calculate_duration,
+    'scoring.calculate_score': bench_calculate_score,
+    'scoring.calculate_scores_500': bench_calculate_scores,
+    'embedding.encode_b1': bench_encode(1),
+    'embedding.encode_b8': bench_encode(8),
+    'embedding.encode_b32': bench_encode(32),
+}
+
+
+# ----------------------------------------------------------------------
+# Measurement and comparison
+# ----------------------------------------------------------------------
+
+def measure(fn, samples: int, min_time: float):
+    """Per-call seconds for each sample, after calibrating the loop count"""
+    fn()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        times.append((time.perf_counter() - start) / loops)
+    return loops, times
+
+
+def median(values):
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def summarize(loops, times):
+    ordered = sorted(times)
+    q1, q3 = ordered[len(ordered) // 4], ordered[(3 * len(ordered)) // 4]
+    return {'loops': loops, 'median_s': median(times), 'min_s': ordered[0], 'iqr_s': q3 - q1, 'samples': times}
+
+
+def mann_whitney_greater(new, base):
+    """One-sided p-value that `new` tends to be larger than `base` (normal approximation, tie-corrected)"""
+    n1, n2 = len(new), len(base)
+    if not n1 or not n2:
+        return 1.0
+    combined = sorted([(v, 0) for v in new] + [(v, 1) for v in base])
+    ranks, i, tie_term = [0.0] * len(combined), 0, 0.0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tie_term += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    u = sum(r for r, (_, group) in zip(ranks, combined) if group == 0) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(result, baseline, tolerance, alpha):
+    ratio = result['median_s'] / baseline['median_s'] if baseline['median_s'] else 1.0
+    p_slower = mann_whitney_greater(result['samples'], baseline['samples'])
+    p_faster = mann_whitney_greater(baseline['samples'], result['samples'])
+    if ratio > 1 + tolerance and p_slower < alpha:
+        verdict = 'REGRESSED'
+    elif ratio < 1 - tolerance and p_faster < alpha:
+        verdict = 'improved'
+    else:
+        verdict = 'ok'
+    return {'ratio': round(ratio, 3), 'p_slower': round(p_slower, 5), 'verdict': verdict}
+
+
+def machine_id():
+    cpu = platform.processor() or ''
+    try:
+        for line in Path('/proc/cpuinfo').read_text().splitlines():
+            if line.startswith('model name'):
+                cpu = line.split(':', 1)[1].strip()
+                break
+    except OSError:
+        pass
+    raw = f"{cpu}-{os.cpu_count()}cpu-{platform.machine()}-py{platform.python_version()}"
+    return re.sub(r'[^A-Za-z0-9.]+', '-', raw).strip('-').lower()
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--samples', type=int, default=20)
+    parser.add_argument('--min-time', type=float, default=0.05, help='Minimum seconds per sample')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed median slowdown, e.g. 0.10 = 10%%')
+    parser.add_argument('--alpha', type=float, default=0.01, help='Significance level of the regression test')
+    parser.add_argument('--baseline-dir', default=str(BENCH_DIR / 'baselines'))
+    parser.add_argument('--machine', default=machine_id(), help='Baseline key (default: derived from the CPU)')
+    parser.add_argument('--save', action='store_true', help='Store this run as the baseline for this machine')
+    parser.add_argument('--check', action='store_true', help='Exit 1 on regressions, 2 without a baseline')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    baseline_path = Path(args.baseline_dir).resolve() / f"{args.machine}.json"
+    json_path = Path(args.json).resolve() if args.json else None
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8')) if baseline_path.exists() else None
+    if args.check and baseline is None:
+        print(f"No baseline for {args.machine} at {baseline_path}; run with --save first", file=sys.stderr)
+        sys.exit(2)
+
+    # Services write logs and default data folders relative to the working directory
+    workdir = Path(tempfile.mkdtemp(prefix='microbench-'))
+    for var in ('FEATURE_STORE_FOLDER', 'UPLOAD_FOLDER', 'PARSED_FOLDER', 'VECTOR_STORE_PATH', 'PROFILE_DIR'):
+        os.environ.setdefault(var, str(workdir / var.lower()))
+    os.environ.setdefault('DOCUMENT_STORE_PATH', str(workdir / 'documents.db'))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+
+    results, skipped, regressions = {}, {}, []
+    try:
+        fixtures = Fixtures(workdir)
+        for name, setup in BENCHMARKS.items():
+            if args.filter and args.filter not in name:
+                continue
+            try:
+                fn = setup(fixtures)
+            except Skip as e:
+                skipped[name] = str(e)
+                print(f"{name:<30} skipped: {e}", flush=True)
+                continue
+            results[name] = summarize(*measure(fn, args.samples, args.min_time))
+            line = f"{name:<30} {format_time(results[name]['median_s']):>12} ± {format_time(results[name]['iqr_s'])}"
+            base = (baseline or {}).get('results', {}).get(name)
+            if base:
+                results[name]['comparison'] = comparison = compare(results[name], base, args.tolerance, args.alpha)
+                line += f"   x{comparison['ratio']:<6} p={comparison['p_slower']:<8} {comparison['verdict']}"
+                if comparison['verdict'] == 'REGRESSED':
+                    regressions.append(name)
+            print(line, flush=True)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'machine': args.machine,
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'samples': args.samples,
+        'results': results,
+        'skipped': skipped
+    }
+    if args.save:
+        if baseline is not None:
+            # Keep baselines of benchmarks that were filtered out or skipped this time
+            report['results'] = dict(baseline.get('results', {}), **results)
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Flask dev server vs. gunicorn prefork: throughput and memory under load
+
+Starts a service once with `python app.py` and once per worker count under
+gunicorn with the shared config (preloaded app, forked workers), drives it
+with concurrent clients for a fixed duration, and reports throughput,
+latency percentiles and the total proportional set size (PSS) of the
+server's processes. PSS splits shared pages between the processes sharing
+them, so copy-on-write sharing of preloaded models shows up as a total far
+below workers x single-process RSS.
+
+Usage:
+    python prefork_load.py --service scoring --workers 1,2,4
+    python prefork_load.py --service embedding --concurrency 16 --json prefork.json
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import subprocess
+import threading
+import urllib.request
+from pathlib import Path
+
+SERVICES_DIR = Path(__file__).resolve().parent.parent / 'services'
+
+SAMPLE_TEXT = ("Senior Software Engineer with 7 years of experience in Python, Django and AWS. "
+               "Led a team of five engineers building microservices on Kubernetes and PostgreSQL.")
+
+
+def _scoring_payload(n=200):
+    skills = ['python', 'java', 'docker', 'aws', 'react', 'sql', 'kubernetes', 'go']
+    candidates = [{
+        'skills': {'technical': skills[i % 5:i % 5 + 3]},
+        'metadata': {'total_experience_years': i % 12},
+        'education': [{}] * (i % 2),
+        'certifications': [{}] * (i % 4)
+    } for i in range(n)]
+    return {'job': {'required_skills': ['python', 'docker', 'aws'], 'required_experience_years': 5},
+            'candidates': candidates, 'explain': False}
+
+
+WORKLOADS = {
+    'scoring': {'port': 5004, 'path': '/score/batch', 'payload': _scoring_payload},
+    'embedding': {'port': 5003, 'path': '/embed', 'payload': lambda: {'texts': [SAMPLE_TEXT] * 8}},
+    'nlp': {'port': 5002, 'path': '/extract',
+            'payload': lambda: {'parsed_data': {'text': SAMPLE_TEXT * 4, 'sections': []}}}
+}
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(q / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def process_tree_pss_mb(root_pid):
+    """Sum of PSS over a process and its children (Linux only, else None)"""
+    pids = [root_pid]
+    try:
+        children = Path(f'/proc/{root_pid}/task/{root_pid}/children').read_text().split()
+        pids.extend(int(pid) for pid in children)
+        total_kb = 0
+        for pid in pids:
+            for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines():
+                if line.startswith('Pss:'):
+                    total_kb += int(line.split()[1])
+        return round(total_kb / 1024, 1)
+    except (OSError, ValueError):
+        return None
+
+
+def start_server(service, mode, workers, port):
+    env = dict(os.environ, PORT=str(port), WORKERS=str(workers))
+    cwd = SERVICES_DIR / service
+    if mode == 'dev':
+        cmd = [sys.executable, 'app.py']
+    else:
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', str(SERVICES_DIR / 'common' / 'gunicorn_conf.py'), 'wsgi:app']
+    return subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+
+def wait_healthy(port, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=2):
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def drive(port, path, body, concurrency, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        local = []
+        while time.perf_counter() < deadline:
+            req = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=body,
+                                         headers={'Content-Type': 'application/json'})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=60) as response:
+                    response.read()
+                local.append(time.perf_counter() - start)
+            except OSError:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return latencies, errors[0]
+
+
+def run(service, mode, workers, args):
+    workload = WORKLOADS[service]
+    port = args.port or workload['port']
+    body = json.dumps(workload['payload']()).encode('utf-8')
+
+    proc = start_server(service, mode, workers, port)
+    try:
+        if not wait_healthy(port, args.startup_timeout):
+            raise RuntimeError(f"{service} ({mode}) did not become healthy on port {port}")
+        drive(port, workload['path'], body, args.concurrency, min(args.duration, 3))
+        pss = process_tree_pss_mb(proc.pid)
+        latencies, errors = drive(port, workload['path'], body, args.concurrency, args.duration)
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=30)
+
+    return {
+        'mode': mode,
+        'workers': workers,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / args.duration, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'pss_mb': pss
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--service', choices=sorted(WORKLOADS), default='scoring')
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated gunicorn worker counts')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--duration', type=float, default=15.0, help='Seconds of measured load per run')
+    parser.add_argument('--port', type=int, help='Override the service port')
+    parser.add_argument('--startup-timeout', type=float, default=180.0)
+    parser.add_argument('--skip-dev', action='store_true', help='Only run gunicorn configurations')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    runs = [] if args.skip_dev else [('dev', 1)]
+    runs += [('gunicorn', int(w)) for w in args.workers.split(',')]
+
+    rows = []
+    for mode, workers in runs:
+        row = run(args.service, mode, workers, args)
+        rows.append(row)
+        print(f"{mode:<9} workers={workers:<3} rps={row['throughput_rps']:<9} p50={row['p50_ms']}ms "
+              f"p99={row['p99_ms']}ms pss={row['pss_mb']}MB errors={row['errors']}", flush=True)
+
+    baseline = rows[0]['throughput_rps'] if rows else 0
+    for row in rows:
+        row['speedup'] = round(row['throughput_rps'] / baseline, 2) if baseline else None
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'service': args.service, 'concurrency': args.concurrency,
+                       'duration_s': args.duration, 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+JSON encoding and compression of typical inter-service payloads
+
+Builds payloads shaped like what the services exchange - a /parse
+response with full and per-page text, an /extract request carrying
+parsed_data, an /embed response with 384-dim vectors, and a /score/batch
+response with explanations - and reports for each:
+
+- encode / decode time with the stdlib json module (as Flask's default
+  provider does it, keys sorted) and with common.transport (orjson when
+  installed)
+- body size raw and under gzip and zstd (when zstandard is installed),
+  with compress + decompress time and the time to send the body over a
+  link of --mbps
+
+Usage:
+    python serialization.py
+    python serialization.py --repeat 50 --mbps 100 --json serialization.json
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+SERVICES_DIR = Path(__file__).resolve().parent.parent / 'services'
+sys.path.insert(0, str(SERVICES_DIR))
+from common import transport  # noqa: E402
+
+WORDS = ("python engineer led team built services data cloud kubernetes design api scalable "
+         "developed managed project pipeline analytics machine learning platform delivery").split()
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def parse_response(rng, pages=4):
+    page_texts = [_text(rng, 600) for _ in range(pages)]
+    text = '\n\n'.join(page_texts)
+    return {
+        'success': True,
+        'file_hash': '%064x' % rng.getrandbits(256),
+        'parsed_data': {
+            'text': text,
+            'char_count': len(text),
+            'word_count': len(text.split()),
+            'pages': [{'page': i + 1, 'text': t} for i, t in enumerate(page_texts)],
+            'sections': [{'title': title, 'content': _text(rng, 120), 'start_index': i * 900}
+                         for i, title in enumerate(['summary', 'experience', 'education', 'skills'])],
+            'metadata': {'pages': pages, 'title': '', 'author': ''},
+            'parsing_method': 'pymupdf',
+            'ocr_used': False
+        }
+    }
+
+
+def extract_request(rng):
+    return {'parsed_data': parse_response(rng)['parsed_data']}
+
+
+def embed_response(rng, texts=32, dim=384):
+    return {'embeddings': [[rng.uniform(-0.2, 0.2) for _ in range(dim)] for _ in range(texts)],
+            'model': 'sentence-transformers/all-MiniLM-L6-v2', 'dimension': dim}
+
+
+def score_response(rng, candidates=500):
+    keys = ['skills', 'experience', 'domain', 'education', 'certifications', 'recency']
+    return {'success': True, 'scores': [{
+        'overallScore': round(rng.random(), 4),
+        'subscores': {k: round(rng.random(), 4) for k in keys},
+        'explanations': [{'criterion': 'skills', 'evidence': ['Skills match analysis']},
+                         {'criterion': 'experience', 'evidence': [f"{rng.randint(0, 20)} years experience"]}],
+        'modelVersion': 'scoring-v1.1.0',
+        'timestamp': '2024-01-01T00:00:00'
+    } for _ in range(candidates)]}
+
+
+PAYLOADS = {
+    'parse_response': parse_response,
+    'extract_request': extract_request,
+    'embed_response': embed_response,
+    'score_batch_response': score_response,
+}
+
+
+def best_ms(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 3)
+
+
+def measure(name, payload, args):
+    stdlib_body = json.dumps(payload, sort_keys=True).encode('utf-8')
+    fast_body = transport.dumps(payload, sort_keys=True)
+    row = {
+        'payload': name,
+        'raw_bytes': len(fast_body),
+        'stdlib_encode_ms': best_ms(lambda: json.dumps(payload, sort_keys=True).encode('utf-8'), args.repeat),
+        'fast_encode_ms': best_ms(lambda: transport.dumps(payload, sort_keys=True), args.repeat),
+        'stdlib_decode_ms': best_ms(lambda: json.loads(stdlib_body), args.repeat),
+        'fast_decode_ms': best_ms(lambda: transport.loads(fast_body), args.repeat),
+        'raw_transfer_ms': round(len(fast_body) * 8 / (args.mbps * 1000), 3),
+        'encodings': {}
+    }
+    for encoding in transport.RESPONSE_ENCODINGS:
+        compressed = transport.compress(fast_body, encoding)
+        assert transport.decompress(compressed, encoding) == fast_body
+        row['encodings'][encoding] = {
+            'bytes': len(compressed),
+            'ratio': round(len(fast_body) / len(compressed), 2),
+            'compress_ms': best_ms(lambda: transport.compress(fast_body, encoding), args.repeat),
+            'decompress_ms': best_ms(lambda: transport.decompress(compressed, encoding), args.repeat),
+            'transfer_ms': round(len(compressed) * 8 / (args.mbps * 1000), 3)
+        }
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed repetitions per measurement (best is kept)')
+    parser.add_argument('--mbps', type=float, default=1000.0, help='Link speed for the transfer time estimate')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if transport.orjson is not None else 'no (stdlib fallback)'}, "
+          f"encodings: {', '.join(transport.RESPONSE_ENCODINGS)}, link: {args.mbps} Mbit/s")
+    rows = []
+    for name, build in PAYLOADS.items():
+        row = measure(name, build(random.Random(args.seed)), args)
+        rows.append(row)
+        print(f"\n{name}: {row['raw_bytes'] / 1024:.1f} KiB, transfer {row['raw_transfer_ms']} ms")
+        print(f"  encode  stdlib {row['stdlib_encode_ms']:>8} ms   fast {row['fast_encode_ms']:>8} ms")
+        print(f"  decode  stdlib {row['stdlib_decode_ms']:>8} ms   fast {row['fast_decode_ms']:>8} ms")
+        for encoding, result in row['encodings'].items():
+            print(f"  {encoding:<6}  {result['bytes'] / 1024:8.1f} KiB  x{result['ratio']:<5}  "
+                  f"compress {result['compress_ms']} ms  decompress {result['decompress_ms']} ms  "
+                  f"transfer {result['transfer_ms']} ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'orjson': transport.orjson is not None, 'mbps': args.mbps, 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Worker x thread sweep for the model-serving services
+
+For every (workers, intra-op threads) combination this starts that many
+worker processes, each loading the model with the given thread count and
+warming it up, then drives them concurrently for a fixed duration and
+reports aggregate throughput and latency percentiles. Use it to pick
+WORKERS / INTRA_OP_THREADS for a host.
+
+Usage:
+    python thread_sweep.py --service embedding --workers 1,2,4 --threads 1,2,4
+    python thread_sweep.py --service nlp --duration 20 --json sweep.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+
+SERVICES_DIR = Path(__file__).resolve().parent.parent / 'services'
+
+SAMPLE_TEXTS = [
+    "Senior Software Engineer with 7 years of experience in Python, Django and AWS.",
+    "Led a team of five engineers building microservices on Kubernetes and PostgreSQL.",
+    "Bachelor of Science in Computer Science, University of California, 2016.",
+    "Skills: JavaScript, React, Node.js, Docker, CI/CD, REST APIs, Agile, Scrum",
+    "Designed ETL pipelines moving 2 TB/day from SAP into a Snowflake warehouse.",
+    "Certifications: AWS Certified Solutions Architect, Certified Kubernetes Administrator",
+]
+
+
+def _load_workload(service: str, batch_size: int):
+    """Return a zero-argument callable performing one representative request"""
+    if service == 'embedding':
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer('all-MiniLM-L6-v2')
+        batch = (SAMPLE_TEXTS * (batch_size // len(SAMPLE_TEXTS) + 1))[:batch_size]
+        return lambda: model.encode(batch, batch_size=batch_size, show_progress_bar=False)
+
+    if service == 'nlp':
+        import spacy
+        nlp_model = spacy.load("en_core_web_sm")
+        text = ' '.join(SAMPLE_TEXTS * 4)
+        return lambda: nlp_model(text)
+
+    raise ValueError(f"Unknown service: {service}")
+
+
+def _worker(service, threads, batch_size, duration, start_barrier, results):
+    sys.path.insert(0, str(SERVICES_DIR))
+    from common.runtime import configure_cpu_threads, apply_torch_threads
+
+    configure_cpu_threads(threads, 1)
+    apply_torch_threads()
+
+    run_once = _load_workload(service, batch_size)
+    for _ in range(3):
+        run_once()
+
+    start_barrier.wait()
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        run_once()
+        latencies.append(time.perf_counter() - start)
+    results.put(latencies)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(q / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_combination(service, workers, threads, batch_size, duration):
+    ctx = mp.get_context('spawn')
+    start_barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(service, threads, batch_size, duration, start_barrier, results))
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+
+    latencies = []
+    for _ in procs:
+        latencies.extend(results.get())
+    for proc in procs:
+        proc.join()
+
+    latencies.sort()
+    items = len(latencies) * (batch_size if service == 'embedding' else 1)
+    return {
+        'workers': workers,
+        'threads': threads,
+        'total_threads': workers * threads,
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / duration, 2),
+        'throughput_items_per_s': round(items / duration, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--service', choices=['embedding', 'nlp'], default='embedding')
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated worker counts')
+    parser.add_argument('--threads', default='1,2,4', help='Comma-separated intra-op thread counts')
+    parser.add_argument('--batch-size', type=int, default=8, help='Texts per encode call (embedding only)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per combination')
+    parser.add_argument('--max-oversubscription', type=float, default=2.0,
+                        help='Skip combinations using more than this many threads per core')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(SERVICES_DIR))
+    from common.runtime import available_cpus
+    cpus = available_cpus()
+
+    rows = []
+    for workers in [int(w) for w in args.workers.split(',')]:
+        for threads in [int(t) for t in args.threads.split(',')]:
+            if workers * threads > cpus * args.max_oversubscription:
+                continue
+            row = run_combination(args.service, workers, threads, args.batch_size, args.duration)
+            rows.append(row)
+            print(f"workers={workers:<3} threads={threads:<3} rps={row['throughput_rps']:<9} "
+                  f"p50={row['p50_ms']}ms p99={row['p99_ms']}ms", flush=True)
+
+    best = max(rows, key=lambda r: r['throughput_rps']) if rows else None
+    report = {'service': args.service, 'cpus': cpus, 'batch_size': args.batch_size,
+              'duration_s': args.duration, 'results': rows, 'best': best}
+    if best:
+        print(f"Best throughput: WORKERS={best['workers']} INTRA_OP_THREADS={best['threads']}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
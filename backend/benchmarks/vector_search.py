@@ -0,0 +1,164 @@
+"""
+Vector search benchmark - int8 quantized search vs exact float32 search
+
+Builds two stores over the same vectors (float32 and int8 + float16 re-rank
+rows), runs the same queries against both and reports recall@k of the
+quantized search against the exact float32 results, latency percentiles and
+bytes scanned per vector.
+
+A third int8 store is filled the way the embedding service fills it, in
+small appends, so the int8 scales start out calibrated on the first batch
+only. It reports the recall that gives and how often clipping made the
+store recalibrate.
+
+Usage:
+    python vector_search.py --rows 200000 --dim 384 --queries 200 --k 10
+    python vector_search.py --append-batch 100
+    python vector_search.py --vectors embeddings.npy --json results.json
+"""
+
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'services' / 'embedding'))
+from vector_store import VectorStore  # noqa: E402
+
+
+def synthetic_embeddings(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Clustered unit vectors, closer to real sentence embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def recall(truth, approx) -> float:
+    truth_ids = {i for i, _ in truth}
+    return len(truth_ids & {i for i, _ in approx}) / max(len(truth_ids), 1)
+
+
+def wait_for_compaction(store: VectorStore, timeout: float = 600):
+    deadline = time.monotonic() + timeout
+    while store.stats()['compacting'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def run(args):
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    else:
+        vectors = synthetic_embeddings(args.rows, args.dim, args.clusters, args.seed)
+
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.integers(0, len(vectors), args.queries)
+    queries = vectors[picks] + 0.3 * rng.standard_normal((args.queries, vectors.shape[1])).astype(np.float32)
+
+    workdir = Path(tempfile.mkdtemp(prefix='vector-bench-'))
+    try:
+        ids = [str(i) for i in range(len(vectors))]
+        exact_store = VectorStore(workdir / 'float32', dim=vectors.shape[1], dtype='float32')
+        int8_store = VectorStore(workdir / 'int8', dim=vectors.shape[1], dtype='float16', quantization='int8')
+        for start in range(0, len(vectors), 50000):
+            exact_store.add(ids[start:start + 50000], vectors[start:start + 50000])
+            int8_store.add(ids[start:start + 50000], vectors[start:start + 50000])
+
+        # Warm the page cache so both sides are measured from memory
+        exact_store.search(queries[0], args.k)
+        int8_store.search(queries[0], args.k)
+
+        # Incremental appends: scales calibrated on the first small batch,
+        # recalibrated by a compaction whenever clipping gets too high
+        incremental_store = VectorStore(workdir / 'int8-incremental', dim=vectors.shape[1], dtype='float16',
+                                        quantization='int8')
+        append_start = time.perf_counter()
+        for start in range(0, len(vectors), args.append_batch):
+            incremental_store.add(ids[start:start + args.append_batch], vectors[start:start + args.append_batch])
+            wait_for_compaction(incremental_store)
+        append_seconds = time.perf_counter() - append_start
+        incremental_stats = incremental_store.stats()
+
+        exact_latency, int8_latency, recalls, incremental_recalls = [], [], [], []
+        for query in queries:
+            start = time.perf_counter()
+            truth = exact_store.search(query, args.k)
+            exact_latency.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            approx = int8_store.search(query, args.k, rerank_factor=args.rerank_factor)
+            int8_latency.append(time.perf_counter() - start)
+
+            recalls.append(recall(truth, approx))
+            incremental_recalls.append(
+                recall(truth, incremental_store.search(query, args.k, rerank_factor=args.rerank_factor)))
+
+        dim = vectors.shape[1]
+        results = {
+            'rows': len(vectors),
+            'dim': dim,
+            'k': args.k,
+            'rerank_factor': args.rerank_factor,
+            'queries': args.queries,
+            'recall_at_k': round(float(np.mean(recalls)), 4),
+            'min_recall_at_k': round(float(np.min(recalls)), 4),
+            'float32': {
+                'p50_ms': percentile_ms(exact_latency, 50),
+                'p95_ms': percentile_ms(exact_latency, 95),
+                'scan_bytes_per_vector': dim * 4
+            },
+            'int8': {
+                'p50_ms': percentile_ms(int8_latency, 50),
+                'p95_ms': percentile_ms(int8_latency, 95),
+                'scan_bytes_per_vector': dim
+            },
+            'int8_incremental': {
+                'append_batch': args.append_batch,
+                'recall_at_k': round(float(np.mean(incremental_recalls)), 4),
+                'min_recall_at_k': round(float(np.min(incremental_recalls)), 4),
+                'recalibrations': incremental_stats['generation'],
+                'clipped_values': incremental_stats['clipped_values'],
+                'append_rows_per_s': round(len(vectors) / append_seconds, 1)
+            }
+        }
+        results['speedup_p50'] = round(results['float32']['p50_ms'] / max(results['int8']['p50_ms'], 1e-9), 2)
+        return results
+
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--clusters', type=int, default=64)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--rerank-factor', type=int, default=8)
+    parser.add_argument('--append-batch', type=int, default=1000,
+                        help='Rows per append when filling the incremental int8 store')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--vectors', help='Optional .npy file of real embeddings to use instead of synthetic data')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
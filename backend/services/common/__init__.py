@@ -0,0 +1 @@
+"""Helpers shared by the Python services (parsing, NLP, embedding, scoring)"""
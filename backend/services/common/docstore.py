@@ -0,0 +1,201 @@
+"""
+Shared local document store
+
+Services on the same host (or sharing a volume) exchange document
+references instead of payloads: the parsing service stores its output
+under the file's SHA256 hash, and the NLP, embedding and scoring services
+accept that hash as `document_ref` and read the document from local disk.
+
+Documents live in one SQLite file in WAL mode, so any number of readers in
+other processes can read while one process writes. Each artifact is keyed
+by (file_hash, kind), e.g. kind 'parsed' or 'extracted'.
+
+Artifacts also record their provenance: the version of the stage that
+produced them, a hash of that stage's inputs and a hash of their own data
+(see common.provenance).
+
+A very long 'text' field can be written in chunks (put(text_chunks=...)),
+so the writer never holds the whole text. The chunks go to a side table,
+and get() joins them back into the document.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+DOCUMENT_STORE_PATH = os.getenv('DOCUMENT_STORE_PATH', './documents/documents.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    file_hash  TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    data       TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    version    TEXT,
+    input_hash TEXT,
+    data_hash  TEXT,
+    PRIMARY KEY (file_hash, kind)
+)
+"""
+
+_TEXT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS document_text (
+    file_hash TEXT NOT NULL,
+    kind      TEXT NOT NULL,
+    seq       INTEGER NOT NULL,
+    text      TEXT NOT NULL,
+    PRIMARY KEY (file_hash, kind, seq)
+) WITHOUT ROWID
+"""
+
+# Set on documents whose 'text' lives in document_text
+_CHUNKED_TEXT = '_text_chunked'
+
+# Columns added after the first release, migrated in place on open
+_PROVENANCE_COLUMNS = ('version', 'input_hash', 'data_hash')
+
+
+class DocumentNotFound(KeyError):
+    """Raised when a document reference does not resolve"""
+
+    def __init__(self, file_hash: str, kind: str):
+        super().__init__(f"No {kind} document for reference {file_hash}")
+        self.file_hash = file_hash
+        self.kind = kind
+
+    def __str__(self):
+        return self.args[0]
+
+
+class DocumentStore:
+    """(file_hash, kind) -> JSON document, in a shared SQLite file"""
+
+    def __init__(self, path: str = DOCUMENT_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(_SCHEMA)
+            conn.execute(_TEXT_SCHEMA)
+            existing = {row[1] for row in conn.execute('PRAGMA table_info(documents)')}
+            for column in _PROVENANCE_COLUMNS:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE documents ADD COLUMN {column} TEXT")
+            if 'data_hash' not in existing:
+                # Version and input hash of older artifacts are unknown; their data hash is not
+                conn.create_function('sha1', 1, lambda data: hashlib.sha1(data.encode('utf-8')).hexdigest())
+                conn.execute('UPDATE documents SET data_hash = sha1(data)')
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def put(self, file_hash: str, kind: str, document: Dict[str, Any],
+            version: Optional[str] = None, input_hash: Optional[str] = None,
+            text_chunks: Optional[Iterable[str]] = None):
+        """
+        Store an artifact, replacing any earlier one
+
+        With text_chunks, the document's 'text' is written from that
+        iterable one chunk at a time instead of from the document.
+        """
+        if text_chunks is not None:
+            document = {key: value for key, value in document.items() if key != 'text'}
+            document[_CHUNKED_TEXT] = True
+        payload = json.dumps(document, ensure_ascii=False)
+        digest = hashlib.sha1(payload.encode('utf-8'))
+        with self._connection() as conn:
+            conn.execute('DELETE FROM document_text WHERE file_hash = ? AND kind = ?', (file_hash, kind))
+            if text_chunks is not None:
+                for seq, chunk in enumerate(text_chunks):
+                    digest.update(chunk.encode('utf-8'))
+                    conn.execute('INSERT INTO document_text (file_hash, kind, seq, text) VALUES (?, ?, ?, ?)',
+                                 (file_hash, kind, seq, chunk))
+            conn.execute(
+                'INSERT OR REPLACE INTO documents (file_hash, kind, data, created_at, version, input_hash, data_hash) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (file_hash, kind, payload, datetime.utcnow().isoformat(), version, input_hash, digest.hexdigest())
+            )
+
+    def get(self, file_hash: str, kind: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The artifact, or None; with a version, also None when it was produced by another version"""
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT data, version FROM documents WHERE file_hash = ? AND kind = ?', (file_hash, kind)
+        ).fetchone()
+        if row is None or (version is not None and row[1] != version):
+            return None
+        document = json.loads(row[0])
+        if document.pop(_CHUNKED_TEXT, False):
+            document['text'] = ''.join(chunk for chunk, in conn.execute(
+                'SELECT text FROM document_text WHERE file_hash = ? AND kind = ? ORDER BY seq', (file_hash, kind)))
+        return document
+
+    def resolve(self, file_hash: str, kind: str) -> Dict[str, Any]:
+        """Like get(), but raises DocumentNotFound for unknown references"""
+        document = self.get(file_hash, kind)
+        if document is None:
+            raise DocumentNotFound(file_hash, kind)
+        return document
+
+    def data_hashes(self, file_hash: str, kinds: Iterable[str]) -> Dict[str, str]:
+        """kind -> data hash of the document's artifacts among kinds"""
+        kinds = list(kinds)
+        if not kinds:
+            return {}
+        rows = self._connection().execute(
+            f"SELECT kind, data_hash FROM documents WHERE file_hash = ? AND kind IN ({','.join('?' * len(kinds))})",
+            [file_hash] + kinds
+        )
+        return dict(rows.fetchall())
+
+    def provenance_of(self, file_hash: str, kind: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """(version, input_hash) of one artifact, or None if it does not exist"""
+        row = self._connection().execute(
+            'SELECT version, input_hash FROM documents WHERE file_hash = ? AND kind = ?', (file_hash, kind)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def provenance(self, kinds: Iterable[str]) -> Iterator[Tuple[str, str, Optional[str], Optional[str], Optional[str]]]:
+        """(file_hash, kind, version, input_hash, data_hash) of every artifact of these kinds, by file hash"""
+        kinds = list(kinds)
+        yield from self._connection().execute(
+            f"SELECT file_hash, kind, version, input_hash, data_hash FROM documents "
+            f"WHERE kind IN ({','.join('?' * len(kinds))}) ORDER BY file_hash",
+            kinds
+        )
+
+    def delete(self, file_hash: str, kind: Optional[str] = None) -> int:
+        with self._connection() as conn:
+            if kind is None:
+                conn.execute('DELETE FROM document_text WHERE file_hash = ?', (file_hash,))
+                cursor = conn.execute('DELETE FROM documents WHERE file_hash = ?', (file_hash,))
+            else:
+                conn.execute('DELETE FROM document_text WHERE file_hash = ? AND kind = ?', (file_hash, kind))
+                cursor = conn.execute('DELETE FROM documents WHERE file_hash = ? AND kind = ?', (file_hash, kind))
+            return cursor.rowcount
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    """Process-wide store at DOCUMENT_STORE_PATH, opened on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DocumentStore()
+    return _store
@@ -0,0 +1,72 @@
+"""
+Gunicorn configuration shared by the Python services
+
+Every service runs as `gunicorn -c common/gunicorn_conf.py wsgi:app`. With
+preload_app the service's wsgi module - and therefore its models - is
+imported once in the master before any worker is forked, so model weights
+are shared copy-on-write between workers instead of loaded N times.
+
+Warmup does not run in the master: it would start the torch / OpenMP
+thread pools there, and those do not survive fork. Each worker warms up
+after it is forked (see post_worker_init), via the wsgi module's optional
+`worker_init()`.
+
+Environment:
+    PORT                 - listen port (default 8000)
+    WORKERS              - worker processes (also used to split CPU threads)
+    THREADS              - threads per worker (default 1, sync workers)
+    MAX_REQUESTS         - recycle a worker after this many requests (0 = never)
+    MAX_REQUESTS_JITTER  - random spread so workers do not recycle together
+    TIMEOUT              - seconds before a silent worker is killed
+    GRACEFUL_TIMEOUT     - seconds workers get to finish on reload/shutdown
+
+Signals:
+    HUP   - graceful reload: new workers are forked from the preloaded master
+            (picks up config changes; code changes need a restart or USR2)
+    USR2  - start a new master with re-imported code next to the old one,
+            then WINCH/QUIT the old master for a zero-downtime upgrade
+    TTIN / TTOU - add / remove one worker
+"""
+
+import gc
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = max(int(os.getenv('WORKERS', 1)), 1)
+threads = max(int(os.getenv('THREADS', 1)), 1)
+preload_app = True
+
+max_requests = int(os.getenv('MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', 100))
+timeout = int(os.getenv('TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+accesslog = '-' if os.getenv('ACCESS_LOG', 'false').lower() == 'true' else None
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    # Objects allocated while preloading live for the whole process. Moving
+    # them out of the collector's generations keeps gc passes in the workers
+    # from touching (and so copying) the pages they sit on.
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Preloaded app frozen; forking {workers} worker(s) x {threads} thread(s)")
+
+
+def post_fork(server, worker):
+    # Torch keeps its pool sizes across fork but not the pool threads
+    if 'torch' in sys.modules:
+        from common.runtime import apply_torch_threads
+        apply_torch_threads()
+
+
+def post_worker_init(worker):
+    wsgi = sys.modules.get('wsgi')
+    init = getattr(wsgi, 'worker_init', None)
+    if init is not None:
+        init()
+        worker.log.info(f"Worker {worker.pid} initialized")
@@ -0,0 +1,474 @@
+"""
+Prometheus-style metrics for the Python services
+
+A small in-process registry of counters, gauges and histograms, rendered
+in the Prometheus text exposition format on GET /metrics. init_app() adds
+per-endpoint request counters, latency histograms and an in-flight gauge;
+services time their internal stages with `stage()`:
+
+    with stage('ocr_page'):
+        text = pytesseract.image_to_string(image)
+
+Recording a sample is a dict lookup, a bisect and a few additions under a
+per-metric lock, so it is cheap enough for per-page and per-extractor use.
+
+Under gunicorn every worker has its own registry. When METRICS_DIR is set,
+each worker periodically writes a snapshot there and /metrics (served by
+whichever worker gets the scrape) merges the snapshots of all live
+workers: counters and histograms are summed, gauges combined per their
+`multiprocess_mode`. When a worker exits (max_requests recycling, a crash),
+its counters and histograms are folded into metrics.aggregate.json before
+its snapshot is removed, so summed counters never go backwards.
+"""
+
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+from contextvars import ContextVar
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process assumed
+    fcntl = None
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+SNAPSHOT_INTERVAL = float(os.getenv('METRICS_SNAPSHOT_INTERVAL', 5))
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[str, ...]
+
+# Per-request stage totals, set while a request is being timed (Server-Timing)
+request_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar('request_timings', default=None)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self) -> Dict[LabelKey, object]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down
+
+    multiprocess_mode says how workers' values combine: 'sum' (in-flight
+    requests, queue depths), 'max' (load times) or 'min'.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), multiprocess_mode: str = 'sum'):
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], Optional[float]], **labels):
+        """Read the value from fn at scrape time (cache sizes, hit rates)"""
+        with self._lock:
+            self._functions[self._key(labels)] = fn
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                value = fn()
+            except Exception:
+                value = None
+            if value is not None:
+                values[key] = float(value)
+        return values
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[LabelKey, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            return {key: [list(counts), total] for key, (counts, total) in self._values.items()}
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if existing.kind != metric.kind:
+                    raise ValueError(f"Metric {metric.name} already registered as a {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = {}
+        for metric in metrics:
+            entry = {
+                'kind': metric.kind,
+                'help': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'samples': [[list(key), value] for key, value in metric.samples().items()]
+            }
+            if isinstance(metric, Histogram):
+                entry['buckets'] = list(metric.buckets)
+            if isinstance(metric, Gauge):
+                entry['mode'] = metric.multiprocess_mode
+            snapshot[metric.name] = entry
+        return snapshot
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = (), multiprocess_mode: str = 'sum') -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, multiprocess_mode))
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+STAGE_SECONDS = histogram('stage_duration_seconds', 'Time spent in internal processing stages', ['stage'])
+MODEL_LOAD_SECONDS = gauge('model_load_seconds', 'Time taken to load each model', ['model'], multiprocess_mode='max')
+CACHE_REQUESTS = counter('cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result'])
+
+REQUESTS = counter('http_requests_total', 'HTTP requests by endpoint, method and status', ['endpoint', 'method', 'status'])
+REQUEST_SECONDS = histogram('http_request_duration_seconds', 'HTTP request latency by endpoint', ['endpoint', 'method'])
+IN_FLIGHT = gauge('http_requests_in_flight', 'Requests currently being handled')
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block (or, as a decorator, a function) into stage_duration_seconds{stage=name}"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = request_timings.get()
+        if timings is not None:
+            totals = timings.setdefault(name, [0.0, 0])
+            totals[0] += elapsed
+            totals[1] += 1
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0):
+    if hits:
+        CACHE_REQUESTS.inc(hits, cache=cache, result='hit')
+    if misses:
+        CACHE_REQUESTS.inc(misses, cache=cache, result='miss')
+
+
+# ----------------------------------------------------------------------
+# Multi-process snapshots
+# ----------------------------------------------------------------------
+
+_writer_started = False
+_writer_lock = threading.Lock()
+
+
+AGGREGATE_FILE = 'metrics.aggregate.json'
+# Folded snapshot names remembered in the aggregate, so a fold interrupted
+# before the snapshot was removed is not counted twice
+FOLDED_HISTORY = 1000
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"metrics.{pid}.json")
+
+
+def write_snapshot():
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(REGISTRY.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _writer_loop():
+    while True:
+        time.sleep(SNAPSHOT_INTERVAL)
+        try:
+            write_snapshot()
+        except OSError:
+            pass
+
+
+def _ensure_writer():
+    # Started lazily from the first request so that it runs in the worker,
+    # not in a preloading master that forks afterwards
+    global _writer_started
+    if _writer_started or not METRICS_DIR:
+        return
+    with _writer_lock:
+        if _writer_started:
+            return
+        threading.Thread(target=_writer_loop, name='metrics-snapshot', daemon=True).start()
+        atexit.register(write_snapshot)
+        _writer_started = True
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_json(path: str, default=None):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _fold_dead(filename: str):
+    """
+    Add a dead worker's counters and histograms to the aggregate, then drop its snapshot
+
+    Gauges describe a live process and are discarded with it. Runs under
+    a lock file since every worker serving /metrics may find the same
+    dead snapshot.
+    """
+    path = os.path.join(METRICS_DIR, filename)
+    aggregate_path = os.path.join(METRICS_DIR, AGGREGATE_FILE)
+    with open(os.path.join(METRICS_DIR, 'aggregate.lock'), 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        if not os.path.exists(path):
+            return
+        aggregate = _read_json(aggregate_path, {'metrics': {}, 'folded': []})
+        if filename not in aggregate['folded']:
+            snapshot = _read_json(path, {})
+            _merge(aggregate['metrics'], {name: entry for name, entry in snapshot.items()
+                                          if entry['kind'] in ('counter', 'histogram')})
+            aggregate['folded'] = (aggregate['folded'] + [filename])[-FOLDED_HISTORY:]
+            tmp_path = f"{aggregate_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(aggregate, f)
+            os.replace(tmp_path, aggregate_path)
+        os.remove(path)
+
+
+def _collect() -> Dict[str, Dict]:
+    """This process's metrics merged with the snapshots of other live workers and exited ones"""
+    merged = REGISTRY.snapshot()
+    if not METRICS_DIR or not os.path.isdir(METRICS_DIR):
+        return merged
+
+    own_pid = os.getpid()
+    for filename in os.listdir(METRICS_DIR):
+        if not (filename.startswith('metrics.') and filename.endswith('.json')) or filename == AGGREGATE_FILE:
+            continue
+        try:
+            pid = int(filename.split('.')[1])
+        except ValueError:
+            continue
+        if pid == own_pid:
+            continue
+        if not _pid_alive(pid):
+            try:
+                _fold_dead(filename)
+            except OSError:
+                pass
+            continue
+        other = _read_json(os.path.join(METRICS_DIR, filename))
+        if other is not None:
+            _merge(merged, other)
+
+    aggregate = _read_json(os.path.join(METRICS_DIR, AGGREGATE_FILE))
+    if aggregate is not None:
+        _merge(merged, aggregate['metrics'])
+    return merged
+
+
+def _merge(into: Dict[str, Dict], other: Dict[str, Dict]):
+    for name, entry in other.items():
+        target = into.get(name)
+        if target is None:
+            into[name] = entry
+            continue
+        if target['kind'] != entry['kind']:
+            continue
+        values = {tuple(key): value for key, value in target['samples']}
+        for key, value in entry['samples']:
+            key = tuple(key)
+            current = values.get(key)
+            if current is None:
+                values[key] = value
+            elif entry['kind'] == 'histogram':
+                if len(current[0]) == len(value[0]):
+                    values[key] = [[a + b for a, b in zip(current[0], value[0])], current[1] + value[1]]
+            elif entry['kind'] == 'gauge' and target.get('mode') == 'max':
+                values[key] = max(current, value)
+            elif entry['kind'] == 'gauge' and target.get('mode') == 'min':
+                values[key] = min(current, value)
+            else:
+                values[key] = current + value
+        target['samples'] = [[list(key), value] for key, value in values.items()]
+
+
+# ----------------------------------------------------------------------
+# Exposition
+# ----------------------------------------------------------------------
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name, entry in sorted(_collect().items()):
+        lines.append(f"# HELP {name} {entry['help']}")
+        lines.append(f"# TYPE {name} {entry['kind']}")
+        labelnames = entry['labelnames']
+        for key, value in sorted(entry['samples'], key=lambda sample: sample[0]):
+            if entry['kind'] == 'histogram':
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(list(entry['buckets']) + [float('inf')], counts):
+                    cumulative += count
+                    le = ('le', _format_value(bound))
+                    lines.append(f"{name}_bucket{_labels(labelnames, key, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labelnames, key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_labels(labelnames, key)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(labelnames, key)} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app, service: str):
+    """
+    Instrument a Flask app: request metrics for every endpoint and GET /metrics
+    """
+    from flask import Response, request, g
+
+    gauge('service_info', 'Service identity', ['service'], multiprocess_mode='max').set(1, service=service)
+
+    @app.before_request
+    def _start_timer():
+        _ensure_writer()
+        g._metrics_start = time.perf_counter()
+        g._metrics_in_flight = True
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def _record(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+            REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+        return response
+
+    @app.teardown_request
+    def _done(exc):
+        if g.pop('_metrics_in_flight', False):
+            IN_FLIGHT.dec()
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    return app
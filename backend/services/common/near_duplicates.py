@@ -0,0 +1,244 @@
+"""
+Near-duplicate detection over parsed resume text
+
+The same CV exported twice (PDF and DOCX, or re-saved with a new date)
+has a different SHA-256 but almost the same text. Documents are compared
+by the Jaccard similarity of their word 5-shingles, estimated from
+128-value MinHash signatures. The signatures are split into 16 bands of 8
+values for locality-sensitive hashing, so a lookup only compares against
+documents that share at least one band bucket. With 16 x 8 bands, pairs
+above ~0.7 similarity almost always share a bucket and pairs below ~0.5
+almost never do. Candidates are then checked against the actual
+threshold (NEAR_DUPLICATE_THRESHOLD, default 0.9) using their signatures.
+
+Only the first document of a group is indexed. Later variants resolve to
+it, and the services reuse its extraction and embedding from the
+document store (see the 'duplicate_of' artifact).
+
+The index is a SQLite file next to the document store (override with
+NEAR_DUPLICATE_INDEX_PATH). Lookups go through
+the (band, bucket) primary key, so their cost depends on the number of
+matching buckets, not on the corpus size.
+"""
+
+import os
+import re
+import zlib
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from common.docstore import DOCUMENT_STORE_PATH
+
+NEAR_DUPLICATE_INDEX_PATH = os.getenv(
+    'NEAR_DUPLICATE_INDEX_PATH', os.path.join(os.path.dirname(DOCUMENT_STORE_PATH), 'near_duplicates.db'))
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', 0.9))
+NEAR_DUPLICATE_ENABLED = os.getenv('NEAR_DUPLICATE_ENABLED', 'true').lower() == 'true'
+
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MIN_SHINGLES = 20  # shorter texts are too small to compare reliably
+# Shingles hashed per block: bounds the (block, NUM_PERM) uint64 working
+# matrix at 4 MB however long the text is
+SIGNATURE_BLOCK_ROWS = 4096
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_TOKEN = re.compile(r'\w+')
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS signatures (
+        file_hash  TEXT PRIMARY KEY,
+        signature  BLOB NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bands (
+        band      INTEGER NOT NULL,
+        bucket    INTEGER NOT NULL,
+        file_hash TEXT NOT NULL,
+        PRIMARY KEY (band, bucket, file_hash)
+    ) WITHOUT ROWID
+    """
+)
+
+
+class NearDuplicate(NamedTuple):
+    file_hash: str
+    similarity: float
+
+
+def shingles(text: str, k: int = SHINGLE_WORDS) -> np.ndarray:
+    """Distinct 32-bit hashes of the k-word shingles of normalized text"""
+    tokens = _TOKEN.findall(text.lower())
+    if len(tokens) < k:
+        return np.empty(0, dtype=np.uint64)
+    hashes = {zlib.crc32(' '.join(tokens[i:i + k]).encode('utf-8')) for i in range(len(tokens) - k + 1)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+class MinHasher:
+    """MinHash signatures from universal hashes (a * x + b) mod p, p = 2^61 - 1"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 61, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 61, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_hashes: np.ndarray, block_rows: int = SIGNATURE_BLOCK_ROWS) -> np.ndarray:
+        """
+        Per-permutation minimum hash of the shingles
+
+        Shingles are hashed block_rows at a time into one reused buffer and
+        folded into a running minimum, so memory does not grow with the
+        number of shingles.
+        """
+        shingle_hashes = np.asarray(shingle_hashes, dtype=np.uint64)
+        minimum = np.full(len(self.a), _MAX_HASH, dtype=np.uint64)
+        buffer = np.empty((min(block_rows, len(shingle_hashes)), len(self.a)), dtype=np.uint64)
+        # uint64 products wrap; like other MinHash implementations we accept
+        # that, it only perturbs the hash family
+        with np.errstate(over='ignore'):
+            for start in range(0, len(shingle_hashes), block_rows):
+                block = shingle_hashes[start:start + block_rows]
+                hashed = buffer[:len(block)]
+                np.multiply(block[:, None], self.a, out=hashed)
+                np.add(hashed, self.b, out=hashed)
+                np.remainder(hashed, _MERSENNE_PRIME, out=hashed)
+                np.bitwise_and(hashed, _MAX_HASH, out=hashed)
+                np.minimum(minimum, hashed.min(axis=0), out=minimum)
+        return minimum.astype(np.uint32)
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """One signed 64-bit bucket key per band"""
+    return [int.from_bytes(hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+                           'little', signed=True)
+            for band in range(BANDS)]
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index of canonical documents, in a SQLite file"""
+
+    def __init__(self, path: str = NEAR_DUPLICATE_INDEX_PATH, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.hasher = MinHasher()
+        self._local = threading.local()
+        with self._connection() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def signature(self, text: Union[str, Iterable[str]]) -> Optional[np.ndarray]:
+        """
+        MinHash signature of a text, or None if it is too short
+
+        The text may be given as consecutive chunks that split it between
+        words. Only one chunk is in memory at a time: MinHash of a union is
+        the element-wise minimum of the parts' signatures, and the last
+        words of each chunk are carried over for the shingles that span
+        the boundary.
+        """
+        if isinstance(text, str):
+            hashes = shingles(text)
+            return self.hasher.signature(hashes) if len(hashes) >= MIN_SHINGLES else None
+
+        signature, count, carry = None, 0, []
+        for chunk in text:
+            words = carry + _TOKEN.findall(chunk.lower())
+            carry = words[-(SHINGLE_WORDS - 1):]
+            hashes = shingles(' '.join(words))
+            if not len(hashes):
+                continue
+            count += len(hashes)
+            part = self.hasher.signature(hashes)
+            signature = part if signature is None else np.minimum(signature, part)
+        return signature if count >= MIN_SHINGLES else None
+
+    def find(self, signature: np.ndarray, exclude: Optional[str] = None) -> Optional[NearDuplicate]:
+        """Most similar indexed document at or above the threshold"""
+        buckets = band_buckets(signature)
+        placeholders = ','.join('(?, ?)' for _ in buckets)
+        params = [value for band, bucket in enumerate(buckets) for value in (band, bucket)]
+        conn = self._connection()
+        candidates = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT b.file_hash FROM bands b JOIN (VALUES {placeholders}) v "
+            f"ON b.band = v.column1 AND b.bucket = v.column2", params)]
+        candidates = [c for c in candidates if c != exclude]
+        if not candidates:
+            return None
+
+        rows = conn.execute(
+            f"SELECT file_hash, signature FROM signatures WHERE file_hash IN ({','.join('?' * len(candidates))})",
+            candidates).fetchall()
+        best = None
+        for file_hash, blob in rows:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                best = NearDuplicate(file_hash, round(similarity, 4))
+        return best
+
+    def add(self, file_hash: str, signature: np.ndarray):
+        with self._connection() as conn:
+            conn.execute('INSERT OR IGNORE INTO signatures (file_hash, signature, created_at) VALUES (?, ?, ?)',
+                         (file_hash, signature.astype(np.uint32).tobytes(), datetime.utcnow().isoformat()))
+            conn.executemany('INSERT OR IGNORE INTO bands (band, bucket, file_hash) VALUES (?, ?, ?)',
+                             [(band, bucket, file_hash) for band, bucket in enumerate(band_buckets(signature))])
+
+    def remove(self, file_hash: str):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM signatures WHERE file_hash = ?', (file_hash,))
+            conn.execute('DELETE FROM bands WHERE file_hash = ?', (file_hash,))
+
+    def check(self, file_hash: str, text: Union[str, Iterable[str]]) -> Optional[NearDuplicate]:
+        """
+        Return the canonical near-duplicate of a document, or index it as a new canonical
+
+        text is a string or an iterable of chunks (see signature()).
+        Re-checking an already indexed document returns None (it is its own canonical).
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        match = self.find(signature, exclude=file_hash)
+        if match is None:
+            self.add(file_hash, signature)
+        return match
+
+    def stats(self) -> Dict[str, int]:
+        return {'documents': self._connection().execute('SELECT COUNT(*) FROM signatures').fetchone()[0]}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """Process-wide index at NEAR_DUPLICATE_INDEX_PATH; None when NEAR_DUPLICATE_ENABLED is false"""
+    global _index
+    if not NEAR_DUPLICATE_ENABLED:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NearDuplicateIndex()
+    return _index
@@ -0,0 +1,375 @@
+"""
+On-demand request profiling and Server-Timing for the Python services
+
+Every response carries a `Server-Timing` header with the request's
+`stage()` totals (parse_document, extract, encode, calculate_score, ...),
+so slow requests can be broken down from the browser devtools or curl -v.
+
+A single request is profiled by sending `X-Profile: 1` (or `?profile=1`)
+together with the admin token (see below):
+
+    1 / cprofile   deterministic cProfile of the request
+    sample         stack sampling every PROFILE_SAMPLE_INTERVAL seconds;
+                   far lower overhead, output in collapsed-stack format
+                   for flamegraph tools
+
+The profile is stored under an id returned in `X-Profile-Id`; JSON object
+responses also get a `_profile` key with a short summary of the hottest
+functions. Stored profiles are listed on GET /profiles and downloaded
+from GET /profiles/<id>/download.
+
+GET/PUT /admin/profiling reads or sets `sample_rate`: the fraction of all
+requests profiled automatically (sampling mode by default, no summary in
+the body). The setting lives in PROFILE_DIR, so every worker and every
+service sharing that directory picks it up.
+
+Profiles expose source paths, timings and request paths, and cProfile
+slows a request down, so the /profiles endpoints, PUT /admin/profiling
+and the per-request trigger all require the `X-Admin-Token` header to
+match PROFILING_ADMIN_TOKEN. Without the token, a profiling request is
+served unprofiled with `X-Profile-Skipped: forbidden`. If the token is
+unset, none of them are available.
+
+For streamed responses only the handler up to the first byte is profiled.
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import pstats
+import random
+import cProfile
+import threading
+from pathlib import Path
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from common.metrics import request_timings
+
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', './profiles'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 200))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))
+PROFILING_ADMIN_TOKEN = os.getenv('PROFILING_ADMIN_TOKEN')
+
+MODES = ('cprofile', 'sample')
+SUMMARY_ROWS = 15
+SERVER_TIMING_MAX = 20
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def summary(self, rows: int = SUMMARY_ROWS) -> List[Dict[str, Any]]:
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            names = stack.split(';')
+            own[names[-1]] += count
+            for name in set(names):
+                inclusive[name] += count
+        total = self.samples or 1
+        return [{
+            'function': name,
+            'self_pct': round(100 * own[name] / total, 1),
+            'total_pct': round(100 * inclusive[name] / total, 1)
+        } for name, _ in own.most_common(rows)]
+
+    def dump(self, path: Path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _cprofile_summary(profiler: cProfile.Profile, rows: int = SUMMARY_ROWS) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:rows]
+    return [{
+        'function': f"{func} ({os.path.basename(filename)}:{line})",
+        'calls': calls,
+        'tottime_ms': round(tottime * 1000, 2),
+        'cumtime_ms': round(cumtime * 1000, 2)
+    } for (filename, line, func), (_, calls, tottime, cumtime, _) in top]
+
+
+def server_timing(timings: Dict[str, List[float]], total: float) -> str:
+    """Server-Timing header value: the slowest stages plus the request total"""
+    entries = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:SERVER_TIMING_MAX]
+    parts = []
+    for name, (elapsed, count) in entries:
+        desc = f';desc="x{count}"' if count > 1 else ''
+        parts.append(f"{name};dur={elapsed * 1000:.1f}{desc}")
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(parts)
+
+
+class ProfileStore:
+    """Profiles as files in PROFILE_DIR: <id>.json metadata plus the raw profile"""
+
+    def __init__(self, folder: Path = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.folder = Path(folder)
+        self.keep = keep
+        self._settings = {'sample_rate': PROFILE_SAMPLE_RATE, 'mode': 'sample'}
+        self._settings_mtime = None
+        self._settings_checked = 0.0
+
+    def save(self, service: str, mode: str, profile, meta: Dict[str, Any]) -> str:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{service}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        if mode == 'cprofile':
+            raw = self.folder / f"{profile_id}.prof"
+            profile.dump_stats(str(raw))
+        else:
+            raw = self.folder / f"{profile_id}.collapsed"
+            profile.dump(raw)
+        meta = dict(meta, id=profile_id, service=service, mode=mode, file=raw.name,
+                    created_at=datetime.utcnow().isoformat())
+        with open(self.folder / f"{profile_id}.json", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        self._prune()
+        return profile_id
+
+    def _metadata_files(self) -> List[Path]:
+        """Profile metadata files, newest first"""
+        if not self.folder.exists():
+            return []
+        metas = [p for p in self.folder.glob('*.json') if p.name != 'settings.json']
+        return sorted(metas, key=lambda p: p.stat().st_mtime, reverse=True)
+
+    def _prune(self):
+        for path in self._metadata_files()[self.keep:]:
+            for sibling in self.folder.glob(f"{path.stem}.*"):
+                sibling.unlink(missing_ok=True)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        path = self.folder / f"{Path(profile_id).name}.json"
+        if path.name == 'settings.json' or not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        listed = []
+        for path in self._metadata_files()[:limit]:
+            with open(path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            meta.pop('summary', None)
+            listed.append(meta)
+        return listed
+
+    def settings(self) -> Dict[str, Any]:
+        """Current admin settings; the file is re-checked at most once a second"""
+        now = time.monotonic()
+        if now - self._settings_checked >= 1.0:
+            self._settings_checked = now
+            path = self.folder / 'settings.json'
+            try:
+                mtime = path.stat().st_mtime
+                if mtime != self._settings_mtime:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        self._settings = dict(self._settings, **json.load(f))
+                    self._settings_mtime = mtime
+            except (OSError, ValueError):
+                pass
+        return self._settings
+
+    def update_settings(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        settings = dict(self.settings())
+        if 'sample_rate' in changes:
+            rate = float(changes['sample_rate'])
+            if not 0 <= rate <= 1:
+                raise ValueError('sample_rate must be between 0 and 1')
+            settings['sample_rate'] = rate
+        if 'mode' in changes:
+            if changes['mode'] not in MODES:
+                raise ValueError(f"mode must be one of {', '.join(MODES)}")
+            settings['mode'] = changes['mode']
+        self.folder.mkdir(parents=True, exist_ok=True)
+        tmp = self.folder / f"settings.json.{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(settings, f)
+        os.replace(tmp, self.folder / 'settings.json')
+        self._settings, self._settings_checked = settings, 0.0
+        return settings
+
+
+def _is_admin(request) -> bool:
+    token = request.headers.get('X-Admin-Token')
+    return bool(PROFILING_ADMIN_TOKEN and token) and hmac.compare_digest(token, PROFILING_ADMIN_TOKEN)
+
+
+def _requested_mode(request) -> Optional[str]:
+    value = request.headers.get('X-Profile') or request.args.get('profile')
+    if not value or value.lower() in ('0', 'false', 'no'):
+        return None
+    value = value.lower()
+    return value if value in MODES else 'cprofile'
+
+
+def init_app(app, service: str, store: ProfileStore = None):
+    """Add Server-Timing, opt-in / sampled profiling and the profile endpoints to a Flask app"""
+    from flask import request, jsonify, send_file, g
+
+    store = store or ProfileStore()
+    # Only one deterministic profiler can be active per process
+    cprofile_lock = threading.Lock()
+
+    @app.before_request
+    def _start_profiling():
+        g._profiling_start = time.perf_counter()
+        g._profiling_timings = request_timings.set({})
+        if request.path.startswith(('/profiles', '/admin/profiling', '/metrics', '/health')):
+            return
+
+        mode, explicit = _requested_mode(request), True
+        if mode is not None and not _is_admin(request):
+            g._profile_skipped = 'forbidden'
+            mode = None
+        if mode is None:
+            settings = store.settings()
+            if not settings.get('sample_rate') or random.random() >= settings['sample_rate']:
+                return
+            mode, explicit = settings.get('mode', 'sample'), False
+
+        if mode == 'cprofile':
+            if not cprofile_lock.acquire(blocking=False):
+                g._profile_skipped = 'busy'
+                return
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident()).start()
+        g._profile = (mode, profiler, explicit)
+
+    def _stop():
+        active = g.pop('_profile', None)
+        if active is None:
+            return None
+        mode, profiler, explicit = active
+        if mode == 'cprofile':
+            profiler.disable()
+            cprofile_lock.release()
+        else:
+            profiler.stop()
+        return active
+
+    @app.after_request
+    def _finish_profiling(response):
+        active = _stop()
+        start = g.pop('_profiling_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        timings = request_timings.get() or {}
+        response.headers['Server-Timing'] = server_timing(timings, elapsed)
+
+        if '_profile_skipped' in g:
+            response.headers['X-Profile-Skipped'] = g.pop('_profile_skipped')
+        if active is None:
+            return response
+
+        mode, profiler, explicit = active
+        try:
+            summary = _cprofile_summary(profiler) if mode == 'cprofile' else profiler.summary()
+            profile_id = store.save(service, mode, profiler, {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+                'sampled': not explicit,
+                'stages_ms': {name: round(total * 1000, 2) for name, (total, _) in timings.items()},
+                'summary': summary
+            })
+        except Exception as e:
+            app.logger.warning(f"Could not store profile: {str(e)}")
+            return response
+        response.headers['X-Profile-Id'] = profile_id
+
+        if explicit and response.is_json and not response.is_streamed:
+            body = response.get_json(silent=True)
+            if isinstance(body, dict):
+                body['_profile'] = {'id': profile_id, 'mode': mode,
+                                    'duration_ms': round(elapsed * 1000, 2), 'summary': summary}
+                response.set_data(json.dumps(body))
+        return response
+
+    @app.teardown_request
+    def _teardown_profiling(exc):
+        # after_request is skipped when a handler raises
+        _stop()
+        token = g.pop('_profiling_timings', None)
+        if token is not None:
+            request_timings.reset(token)
+
+    def _forbidden():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    @app.route('/profiles', methods=['GET'])
+    def list_profiles():
+        if not _is_admin(request):
+            return _forbidden()
+        return jsonify({'profiles': store.list(int(request.args.get('limit', 50)))})
+
+    @app.route('/profiles/<profile_id>', methods=['GET'])
+    def get_profile(profile_id):
+        if not _is_admin(request):
+            return _forbidden()
+        meta = store.get(profile_id)
+        if meta is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return jsonify(meta)
+
+    @app.route('/profiles/<profile_id>/download', methods=['GET'])
+    def download_profile(profile_id):
+        if not _is_admin(request):
+            return _forbidden()
+        meta = store.get(profile_id)
+        if meta is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return send_file(str((store.folder / meta['file']).resolve()), as_attachment=True,
+                         download_name=meta['file'])
+
+    @app.route('/admin/profiling', methods=['GET', 'PUT'])
+    def profiling_settings():
+        if request.method == 'GET':
+            return jsonify(store.settings())
+        if not _is_admin(request):
+            return _forbidden()
+        try:
+            return jsonify(store.update_settings(request.json or {}))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+
+    return app
@@ -0,0 +1,79 @@
+"""
+Response field projection
+
+Endpoints accept a `fields` parameter (query string or JSON body) listing
+the keys a caller wants back, as a comma-separated string or a list.
+Dotted paths select nested keys; a path through a list applies to every
+element, e.g. `fields=overallScore,subscores.skills`.
+
+Services use `wants()` to skip computing keys nobody asked for and
+`project()` to trim whatever was computed.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+
+def parse_fields(value: Union[str, Iterable[str], None]) -> Optional[List[str]]:
+    """Normalize a `fields` parameter; None means every field"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    fields = [str(field).strip() for field in value if str(field).strip()]
+    return fields or None
+
+
+def request_fields(request, body: Optional[Dict[str, Any]] = None) -> Optional[List[str]]:
+    """`fields` from the query string, falling back to the JSON body or form"""
+    if 'fields' in request.args:
+        return parse_fields(request.args.get('fields'))
+    if body and 'fields' in body:
+        return parse_fields(body.get('fields'))
+    if request.form and 'fields' in request.form:
+        return parse_fields(request.form.get('fields'))
+    return None
+
+
+def wants(fields: Optional[List[str]], key: str) -> bool:
+    """Whether a top-level key is part of the projection"""
+    return fields is None or any(field == key or field.startswith(key + '.') for field in fields)
+
+
+def _field_tree(fields: List[str]) -> Dict[str, Any]:
+    # None marks a leaf: keep that key's whole value
+    tree: Dict[str, Any] = {}
+    for field in fields:
+        node = tree
+        parts = field.split('.')
+        for i, part in enumerate(parts):
+            if part in node and node[part] is None:
+                break
+            if i == len(parts) - 1:
+                node[part] = None
+            else:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def _project(value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def project(value: Any, fields: Optional[List[str]], keep: Iterable[str] = ()) -> Any:
+    """
+    Trim a response to the requested fields
+
+    Args:
+        value: Dict (or list of dicts) to project
+        fields: Parsed field paths; None returns value unchanged
+        keep: Top-level keys always kept (e.g. 'success')
+    """
+    if fields is None:
+        return value
+    return _project(value, _field_tree(list(fields) + list(keep)))
@@ -0,0 +1,76 @@
+"""
+Stage versions and artifact provenance
+
+Each per-document stage writes one artifact kind to the document store
+and records, next to it, the stage version that produced it and a hash of
+the artifacts it was computed from. An artifact is stale when either no
+longer matches: the stage was bumped, or an input was recomputed with a
+different result. pipeline/reprocess.py recomputes exactly the stale
+artifacts, so bumping one version below only touches that stage and the
+stages that consume its output.
+
+Bump a version whenever a change alters a stage's output (a new skills
+ontology, extraction rules, a different embedding model).
+"""
+
+import os
+import hashlib
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+PARSER_VERSION = 'parsing-v1.0.0'
+EXTRACTION_VERSION = 'nlp-v1.0.0'
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+
+
+def embedding_kind(pooling, align_sections, return_sections):
+    """Document store kind of a document embedding computed with these options"""
+    return f"embedding:{pooling}:{int(bool(align_sections))}:{int(bool(return_sections))}"
+
+
+class StageSpec(NamedTuple):
+    name: str
+    kind: str
+    inputs: Tuple[str, ...]
+    version: str
+
+
+# In dependency order. Parsing is the root: its input is the uploaded file,
+# which is not kept by hash, so parsed artifacts are only refreshed by a
+# new upload or import.
+STAGES: Dict[str, StageSpec] = {
+    'parse': StageSpec('parse', 'parsed', (), PARSER_VERSION),
+    'extract': StageSpec('extract', 'extracted', ('parsed',), EXTRACTION_VERSION),
+    'embed': StageSpec('embed', embedding_kind('mean', True, False), ('parsed',), EMBEDDING_MODEL),
+}
+
+
+def combine_hashes(data_hashes: Dict[str, str], inputs: Tuple[str, ...]) -> Optional[str]:
+    """Input hash of a stage from its inputs' data hashes; None if one is missing"""
+    if any(not data_hashes.get(kind) for kind in inputs):
+        return None
+    digest = hashlib.sha1()
+    for kind in inputs:
+        digest.update(f"{kind}:{data_hashes[kind]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def input_hash(store, file_hash: str, stage: str) -> Optional[str]:
+    """Input hash of a stage for a document, from the artifacts currently in the store"""
+    inputs = STAGES[stage].inputs
+    return combine_hashes(store.data_hashes(file_hash, inputs), inputs)
+
+
+def put_artifact(store, file_hash: str, stage: str, document: Dict, inputs_from_store: bool = True,
+                 text_chunks: Optional[Iterable[str]] = None):
+    """
+    Store a stage's output with its provenance
+
+    inputs_from_store=False when the stage ran on inputs passed inline by a
+    client; they may differ from the stored ones, so no input hash is
+    recorded and the artifact counts as stale. text_chunks is passed on to
+    store.put() for documents whose text is written in chunks.
+    """
+    spec = STAGES[stage]
+    store.put(file_hash, spec.kind, document, version=spec.version,
+              input_hash=input_hash(store, file_hash, stage) if inputs_from_store else None,
+              text_chunks=text_chunks)
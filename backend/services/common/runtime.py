@@ -0,0 +1,104 @@
+"""
+CPU thread topology and model warmup for the model-serving services
+
+Torch and the BLAS libraries size their thread pools from the core count
+of the host, so N worker processes on one host each start N-core pools and
+oversubscribe the CPU. configure_cpu_threads() pins the pool sizes from the
+environment and must run before numpy, torch or spaCy are imported, which is
+why this module imports none of them at module level.
+
+Environment:
+    INTRA_OP_THREADS  - threads used inside one op (matmul, attention)
+    INTER_OP_THREADS  - threads running independent ops concurrently
+    WORKERS           - worker processes per host; when INTRA_OP_THREADS is
+                        unset the available cores are split between them
+"""
+
+import os
+import time
+from typing import Callable, Dict, Any, Iterable, Optional
+
+from loguru import logger
+
+_THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS'
+)
+
+_configured: Dict[str, int] = {}
+
+
+def available_cpus() -> int:
+    """Cores this process may run on (respects taskset / container cpusets)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def configure_cpu_threads(intra_op: Optional[int] = None, inter_op: Optional[int] = None) -> Dict[str, int]:
+    """
+    Size the BLAS/OpenMP pools for this worker process
+
+    Explicit arguments win over INTRA_OP_THREADS / INTER_OP_THREADS, which
+    win over an even split of the available cores between WORKERS.
+    """
+    workers = max(int(os.getenv('WORKERS', 1)), 1)
+    if intra_op is None:
+        intra_op = int(os.getenv('INTRA_OP_THREADS', 0)) or max(available_cpus() // workers, 1)
+    if inter_op is None:
+        inter_op = int(os.getenv('INTER_OP_THREADS', 0)) or 1
+
+    for var in _THREAD_ENV_VARS:
+        os.environ[var] = str(intra_op)
+    # HF tokenizers spawn their own pool per process; workers already give parallelism
+    if workers > 1:
+        os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+    _configured.update({'intra_op': intra_op, 'inter_op': inter_op, 'workers': workers})
+    return dict(_configured)
+
+
+def apply_torch_threads():
+    """Apply the configured pool sizes to torch once it has been imported"""
+    if not _configured:
+        configure_cpu_threads()
+
+    import torch
+
+    torch.set_num_threads(_configured['intra_op'])
+    try:
+        torch.set_num_interop_threads(_configured['inter_op'])
+    except RuntimeError:
+        # Can only be set before the first inter-op parallel region runs
+        logger.debug("Torch inter-op thread count already fixed for this process")
+
+    logger.info(f"CPU threads: intra-op={torch.get_num_threads()} inter-op={torch.get_num_interop_threads()} "
+                f"workers={_configured['workers']} cpus={available_cpus()}")
+
+
+def thread_config() -> Dict[str, int]:
+    return dict(_configured)
+
+
+def warmup(name: str, fn: Callable[[Any], Any], inputs: Iterable[Any], rounds: int = 2) -> Dict[str, Any]:
+    """
+    Run representative inputs through a freshly loaded model
+
+    The first calls pay for lazy initialization (kernel selection, allocator
+    growth, tokenizer caches); doing it at startup keeps that cost off the
+    first real request.
+    """
+    inputs = list(inputs)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for item in inputs:
+            fn(item)
+        timings.append(round((time.perf_counter() - start) * 1000, 1))
+
+    logger.info(f"Warmup {name}: {len(inputs)} inputs x {rounds} rounds, ms per round {timings}")
+    return {'name': name, 'rounds_ms': timings}
@@ -0,0 +1,199 @@
+"""
+JSON encoding and body compression shared by the Python services
+
+init_app() makes three changes to a Flask app:
+
+- jsonify() / request.get_json() go through orjson when it is installed.
+  It is several times faster than the stdlib encoder on large payloads,
+  such as resume text and embedding vectors, and serializes numpy arrays
+  and scalars directly. Without orjson the stock provider stays in place.
+- Request bodies sent with `Content-Encoding: gzip`, `deflate` or `zstd`
+  are decompressed before Flask reads them, up to MAX_REQUEST_BODY_MB.
+- Responses of at least COMPRESS_MIN_BYTES in a text or JSON type are
+  compressed when the client's Accept-Encoding allows it. zstd is used
+  when the zstandard package is installed, otherwise gzip. Streamed
+  responses (NDJSON) and files are sent as they are.
+
+Call it before the metrics and profiling hooks. Flask runs after_request
+hooks in reverse registration order, so compression then runs last, after
+the profiling summary has been added to the body.
+
+Clients use dumps() and compress() to send compressed JSON, and
+decompress() to read a compressed response.
+"""
+
+import io
+import os
+import gzip
+import zlib
+import json
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 1))
+ZSTD_LEVEL = int(os.getenv('ZSTD_LEVEL', 3))
+MAX_REQUEST_BODY_BYTES = int(float(os.getenv('MAX_REQUEST_BODY_MB', 100)) * 1024 * 1024)
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html', 'text/csv')
+RESPONSE_ENCODINGS = ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+
+
+class BodyTooLarge(ValueError):
+    """A compressed body inflates past the configured limit"""
+
+
+class UnsupportedEncoding(ValueError):
+    """A Content-Encoding this service cannot decode"""
+
+
+DECODE_ERRORS = (ValueError, OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def _default(obj: Any) -> Any:
+    # numpy arrays and scalars that orjson does not take natively (or the stdlib encoder)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, with orjson when available"""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, default=_default, ensure_ascii=False, sort_keys=sort_keys).encode('utf-8')
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding in ('gzip', 'x-gzip'):
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == 'deflate':
+        return zlib.compress(data, GZIP_LEVEL)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: Optional[str], limit: int = MAX_REQUEST_BODY_BYTES) -> bytes:
+    """Inflate a body, refusing to produce more than limit bytes"""
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+        return data
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise UnsupportedEncoding('zstd is not supported by this service')
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+            out = reader.read(limit + 1)
+    elif encoding in ('gzip', 'x-gzip', 'deflate'):
+        wbits = 16 + zlib.MAX_WBITS if encoding != 'deflate' else zlib.MAX_WBITS
+        inflater = zlib.decompressobj(wbits)
+        out = inflater.decompress(data, limit + 1)
+    else:
+        raise UnsupportedEncoding(f"Unsupported Content-Encoding: {encoding}")
+    if len(out) > limit:
+        raise BodyTooLarge(f"Decompressed body exceeds {limit} bytes")
+    return out
+
+
+if orjson is not None:
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        """Flask JSON provider backed by orjson"""
+
+        def dumps(self, obj: Any, **kwargs) -> str:
+            if kwargs:
+                return super().dumps(obj, **kwargs)
+            return dumps(obj, self.sort_keys).decode('utf-8')
+
+        def loads(self, s, **kwargs) -> Any:
+            if kwargs:
+                return super().loads(s, **kwargs)
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(dumps(obj, self.sort_keys), mimetype=self.mimetype)
+else:
+    OrjsonProvider = None
+
+
+class DecompressingMiddleware:
+    """WSGI middleware that inflates compressed request bodies before the app reads them"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding and encoding != 'identity':
+            length = environ.get('CONTENT_LENGTH')
+            stream = environ['wsgi.input']
+            try:
+                # Without a length the server hands us a chunked body to read to the end
+                body = decompress(stream.read(int(length)) if length else stream.read(), encoding)
+            except BodyTooLarge as e:
+                return self._error(start_response, '413 Request Entity Too Large', str(e))
+            except UnsupportedEncoding as e:
+                return self._error(start_response, '415 Unsupported Media Type', str(e))
+            except DECODE_ERRORS as e:
+                return self._error(start_response, '400 Bad Request', f"Could not decode request body: {str(e)}")
+            environ['wsgi.input'] = io.BytesIO(body)
+            environ['CONTENT_LENGTH'] = str(len(body))
+            del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+
+    @staticmethod
+    def _error(start_response, status: str, message: str):
+        body = json.dumps({'error': message}).encode('utf-8')
+        start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+        return [body]
+
+
+def init_app(app):
+    """Install the orjson provider, request decompression and response compression on a Flask app"""
+    from flask import request
+
+    if OrjsonProvider is not None:
+        app.json = OrjsonProvider(app)
+    app.wsgi_app = DecompressingMiddleware(app.wsgi_app)
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.is_streamed or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(RESPONSE_ENCODINGS)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    return app
@@ -1,21 +1,101 @@
 """Embedding Service - Generate and store embeddings"""
 import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.runtime import configure_cpu_threads, apply_torch_threads, warmup
+from common.docstore import get_document_store, DocumentNotFound
+from common.provenance import EMBEDDING_MODEL, embedding_kind, input_hash
+from common.metrics import init_app as init_metrics, stage, gauge, MODEL_LOAD_SECONDS
+from common.profiling import init_app as init_profiling
+from common.transport import init_app as init_transport
+
+# Thread pools must be sized before torch / numpy are imported
+configure_cpu_threads()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from sentence_transformers import SentenceTransformer
 from loguru import logger
 import numpy as np
 
+from vector_store import VectorStore
+from chunking import embed_documents
+
 app = Flask(__name__)
 CORS(app)
+init_transport(app)
+init_metrics(app, 'embedding')
+init_profiling(app, 'embedding')
+
+VECTOR_STORE_PATH = os.getenv('VECTOR_STORE_PATH', './vectors')
+VECTOR_STORE_DTYPE = os.getenv('VECTOR_STORE_DTYPE', 'float32')
+VECTOR_STORE_QUANTIZATION = os.getenv('VECTOR_STORE_QUANTIZATION', 'none')
 
 model = None
+vector_store = None
 
-def load_model():
+WARMUP_TEXTS = [
+    "Senior Software Engineer with 7 years of experience in Python, Django and AWS.",
+    "Led a team of five engineers building microservices on Kubernetes and PostgreSQL.",
+    "Bachelor of Science in Computer Science, University of California, 2016.",
+    "Skills: JavaScript, React, Node.js, Docker, CI/CD, REST APIs, Agile",
+]
+
+def load_model(run_warmup: bool = True):
     global model
+    apply_torch_threads()
     logger.info("Loading sentence transformer model...")
-    model = SentenceTransformer('all-MiniLM-L6-v2')  # CPU-friendly
+    start = time.perf_counter()
+    model = SentenceTransformer(EMBEDDING_MODEL)  # all-MiniLM-L6-v2 by default, CPU-friendly
+    MODEL_LOAD_SECONDS.set(time.perf_counter() - start, model=EMBEDDING_MODEL)
     logger.info("Model loaded successfully")
+    if run_warmup and os.getenv('WARMUP', 'true').lower() == 'true':
+        warmup_model()
+
+def warmup_model():
+    """Exercise the batch sizes and sequence lengths real requests use"""
+    long_text = '\n'.join(WARMUP_TEXTS * 40)
+    warmup('encode', model.encode, [WARMUP_TEXTS[:1], WARMUP_TEXTS, WARMUP_TEXTS * 8])
+    warmup('embed_document', lambda doc: embed_documents(model, [doc]), [{'text': long_text}], rounds=1)
+
+def get_vector_store():
+    global vector_store
+    if vector_store is None:
+        dim = model.get_sentence_embedding_dimension() if model else 384
+        vector_store = VectorStore(VECTOR_STORE_PATH, dim=dim, dtype=VECTOR_STORE_DTYPE,
+                                   quantization=VECTOR_STORE_QUANTIZATION)
+    return vector_store
+
+def _vector_store_stat(key):
+    return lambda: vector_store.stats()[key] if vector_store is not None else None
+
+# Every worker sees the same on-disk store, so combine with max, not sum
+_VECTOR_ROWS = gauge('vector_store_rows', 'Rows in the vector store by state', ['state'], multiprocess_mode='max')
+_VECTOR_ROWS.set_function(_vector_store_stat('live'), state='live')
+_VECTOR_ROWS.set_function(_vector_store_stat('deleted'), state='deleted')
+gauge('vector_store_compacting', 'Whether a compaction is running', multiprocess_mode='max').set_function(
+    _vector_store_stat('compacting'))
+
+def resolve_document(document):
+    """Replace a {'document_ref'} with the parsed text and sections it points to"""
+    if 'document_ref' not in document or 'text' in document:
+        return document
+    parsed = get_document_store().resolve(document['document_ref'], 'parsed')
+    return dict(document, id=document.get('id', document['document_ref']),
+                text=parsed.get('text', ''), sections=parsed.get('sections'))
+
+def reuse_near_duplicate(document, kind):
+    """Stored embedding of the document a {'document_ref'} is a near-duplicate of, if any"""
+    if 'document_ref' not in document or 'text' in document:
+        return None
+    store = get_document_store()
+    duplicate = store.get(document['document_ref'], 'duplicate_of')
+    canonical = store.get(duplicate['document_ref'], kind, version=EMBEDDING_MODEL) if duplicate else None
+    if canonical is None:
+        return None
+    return dict(canonical, id=document.get('id', document['document_ref']), near_duplicate=duplicate)
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -23,14 +103,137 @@ def health():
 
 @app.route('/embed', methods=['POST'])
 def embed_text():
+    """
+    Embed one {'text'} or a batch of {'texts': [...]} in a single encode call
+    
+    {'document_ref'} embeds the text of a document in the shared store.
+    """
     try:
         data = request.json
-        text = data.get('text', '')
-        embeddings = model.encode([text])
+        texts = data.get('texts')
+        if texts is not None:
+            with stage('encode'):
+                embeddings = model.encode(texts, batch_size=32, show_progress_bar=False)
+            return jsonify({'embeddings': embeddings.tolist()})
+        text = resolve_document(data).get('text', '')
+        with stage('encode'):
+            embeddings = model.encode([text])
         return jsonify({'embedding': embeddings[0].tolist()})
+    except DocumentNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/embed/document', methods=['POST'])
+def embed_document():
+    """
+    Embed full documents past the model's max sequence length
+
+    Accepts a single {'text', 'sections'} document or {'documents': [...]};
+    all chunks of all documents are encoded in one batch. Any document may
+    be given as {'document_ref': file_hash} instead.
+
+    Embeddings of referenced documents are kept in the document store, and a
+    near-duplicate of an already embedded document reuses its embedding
+    (the result then carries 'near_duplicate').
+    """
+    try:
+        data = request.json
+        documents = data.get('documents')
+        single = documents is None
+        if single:
+            if 'document_ref' in data:
+                documents = [{'document_ref': data['document_ref']}]
+            else:
+                documents = [{'text': data.get('text', ''), 'sections': data.get('sections')}]
+
+        options = {
+            'pooling': data.get('pooling', 'mean'),
+            'align_sections': data.get('align_sections', True),
+            'return_sections': data.get('return_sections', False)
+        }
+        kind = embedding_kind(**options)
+        results = [reuse_near_duplicate(document, kind) for document in documents]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            embedded = embed_documents(model, [resolve_document(documents[i]) for i in missing], **options)
+            for i, result in zip(missing, embedded):
+                results[i] = result
+                if 'document_ref' in documents[i] and 'text' not in documents[i]:
+                    store, ref = get_document_store(), documents[i]['document_ref']
+                    store.put(ref, kind, result, version=EMBEDDING_MODEL, input_hash=input_hash(store, ref, 'embed'))
+        if single:
+            return jsonify(results[0])
+        return jsonify({'embeddings': results})
+    except DocumentNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
+        logger.error(f"Document embedding error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/vectors', methods=['POST'])
+def upsert_vectors():
+    """Store vectors by id; each item carries either 'embedding' or 'text'"""
+    try:
+        items = request.json.get('items', [])
+        if not items:
+            return jsonify({'error': 'No items provided'}), 400
+
+        to_encode = [i for i, item in enumerate(items) if 'embedding' not in item]
+        vectors = [item.get('embedding') for item in items]
+        if to_encode:
+            with stage('encode'):
+                encoded = model.encode([items[i].get('text', '') for i in to_encode])
+            for i, vector in zip(to_encode, encoded):
+                vectors[i] = vector
+
+        with stage('vector_store_add'):
+            stored = get_vector_store().add([item['id'] for item in items], np.asarray(vectors, dtype=np.float32))
+        return jsonify({'success': True, 'stored': stored})
+    except Exception as e:
+        logger.error(f"Vector upsert error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/vectors/<vector_id>', methods=['DELETE'])
+def delete_vector(vector_id):
+    try:
+        deleted = get_vector_store().delete([vector_id])
+        if not deleted:
+            return jsonify({'error': 'Vector not found'}), 404
+        return jsonify({'success': True, 'deleted': deleted})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/vectors/search', methods=['POST'])
+def search_vectors():
+    try:
+        data = request.json
+        query = data.get('embedding')
+        if query is None:
+            with stage('encode'):
+                query = model.encode([data.get('text', '')])[0]
+        with stage('vector_search'):
+            results = get_vector_store().search(query, k=int(data.get('k', 10)), exact=bool(data.get('exact', False)))
+        return jsonify({'results': [{'id': i, 'score': s} for i, s in results]})
+    except Exception as e:
+        logger.error(f"Vector search error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/vectors/compact', methods=['POST'])
+def compact_vectors():
+    try:
+        started = get_vector_store().compact(background=True)
+        return jsonify({'success': True, 'started': started})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/vectors/stats', methods=['GET'])
+def vector_stats():
+    return jsonify(get_vector_store().stats())
+
 if __name__ == '__main__':
     load_model()
+    get_vector_store()
     app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5003)))
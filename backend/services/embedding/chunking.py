@@ -0,0 +1,159 @@
+"""
+Long-document embedding for the embedding service
+
+The sentence transformer truncates input at its max sequence length, so a
+multi-page resume is split into token-bounded chunks (optionally aligned to
+the parsing service's detected sections), every chunk of every document is
+encoded in one batched model.encode call, and chunk vectors are pooled back
+into one vector per document and, on request, per section.
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from common.metrics import stage
+
+POOLING_MODES = ('mean', 'weighted')
+PREAMBLE_SECTION = 'header'
+
+
+def split_sections(text: str, sections: Optional[List[Dict[str, Any]]]) -> List[Tuple[str, str]]:
+    """
+    Split text at the section positions reported by the parsing service
+
+    Text before the first detected header is kept as a 'header' section
+    (name, contact details). Without sections the whole text is one span.
+    """
+    if not sections:
+        return [(PREAMBLE_SECTION, text)]
+
+    starts = sorted(
+        (s['position'], s['type']) for s in sections
+        if isinstance(s.get('position'), int) and 0 <= s['position'] < len(text)
+    )
+    spans = []
+    if not starts or starts[0][0] > 0:
+        spans.append((PREAMBLE_SECTION, text[:starts[0][0] if starts else len(text)]))
+
+    for i, (position, section_type) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(text)
+        if end > position:
+            spans.append((section_type, text[position:end]))
+
+    return [(section_type, span) for section_type, span in spans if span.strip()]
+
+
+def chunk_text(text: str, tokenizer, max_tokens: int) -> List[Tuple[str, int]]:
+    """
+    Split text into pieces of at most max_tokens word-piece tokens
+
+    Returns (chunk_text, token_count) pairs. Chunks are cut on token offsets
+    from the fast tokenizer so no text is dropped between chunks.
+    """
+    if not text.strip():
+        return []
+
+    try:
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = encoding['offset_mapping']
+    except (NotImplementedError, TypeError, KeyError):
+        # Slow tokenizers have no offset mapping; approximate on whitespace
+        return _chunk_words(text, max_tokens)
+
+    chunks = []
+    for start in range(0, len(offsets), max_tokens):
+        window = offsets[start:start + max_tokens]
+        char_start = window[0][0]
+        char_end = offsets[start + max_tokens][0] if start + max_tokens < len(offsets) else len(text)
+        chunk = text[char_start:char_end].strip()
+        if chunk:
+            chunks.append((chunk, len(window)))
+    return chunks
+
+
+def _chunk_words(text: str, max_tokens: int) -> List[Tuple[str, int]]:
+    # Word pieces outnumber words; keep a margin so chunks still fit
+    words_per_chunk = max(max_tokens * 2 // 3, 1)
+    words = text.split()
+    return [
+        (' '.join(words[i:i + words_per_chunk]), len(words[i:i + words_per_chunk]))
+        for i in range(0, len(words), words_per_chunk)
+    ]
+
+
+def embed_documents(model, documents: List[Dict[str, Any]], pooling: str = 'mean',
+                    align_sections: bool = True, return_sections: bool = False,
+                    batch_size: int = 32) -> List[Dict[str, Any]]:
+    """
+    Embed whole documents with a single batched forward pass
+
+    Args:
+        model: Loaded SentenceTransformer
+        documents: [{'id': ..., 'text': ..., 'sections': [...]}]
+        pooling: 'mean' of chunk vectors, or 'weighted' by chunk token count
+        align_sections: Never let a chunk straddle two resume sections
+        return_sections: Also return one pooled vector per section type
+
+    Returns:
+        One result per document with its pooled embedding
+    """
+    if pooling not in POOLING_MODES:
+        raise ValueError(f"Unsupported pooling: {pooling}. Supported: {', '.join(POOLING_MODES)}")
+
+    # Leave room for the [CLS] and [SEP] tokens the model adds
+    max_tokens = max(model.max_seq_length - 2, 1)
+
+    chunk_texts, chunk_docs, chunk_sections, chunk_tokens = [], [], [], []
+    with stage('chunk'):
+        for doc_index, document in enumerate(documents):
+            text = document.get('text', '') or ''
+            spans = split_sections(text, document.get('sections') if align_sections else None)
+            for section_type, span in spans:
+                for chunk, n_tokens in chunk_text(span, model.tokenizer, max_tokens):
+                    chunk_texts.append(chunk)
+                    chunk_docs.append(doc_index)
+                    chunk_sections.append(section_type)
+                    chunk_tokens.append(n_tokens)
+
+    dim = model.get_sentence_embedding_dimension()
+    if chunk_texts:
+        with stage('encode'):
+            vectors = model.encode(chunk_texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+        vectors = np.asarray(vectors, dtype=np.float32)
+    else:
+        vectors = np.empty((0, dim), dtype=np.float32)
+
+    logger.info(f"Embedded {len(documents)} documents as {len(chunk_texts)} chunks in one batch")
+
+    doc_index = np.asarray(chunk_docs, dtype=np.int64)
+    weights = np.asarray(chunk_tokens, dtype=np.float32) if pooling == 'weighted' else np.ones(len(chunk_texts), dtype=np.float32)
+    pooled = _pool(vectors, weights, doc_index, len(documents))
+    counts = np.bincount(doc_index, minlength=len(documents))
+
+    results = []
+    for i, document in enumerate(documents):
+        result = {
+            'id': document.get('id'),
+            'embedding': pooled[i].tolist(),
+            'chunk_count': int(counts[i])
+        }
+        if return_sections:
+            result['sections'] = {}
+            rows = np.flatnonzero(doc_index == i)
+            for section_type in dict.fromkeys(chunk_sections[r] for r in rows):
+                section_rows = np.asarray([r for r in rows if chunk_sections[r] == section_type])
+                vector = _pool(vectors[section_rows], weights[section_rows], np.zeros(len(section_rows), dtype=np.int64), 1)[0]
+                result['sections'][section_type] = vector.tolist()
+        results.append(result)
+
+    return results
+
+
+def _pool(vectors: np.ndarray, weights: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """Weighted average of rows per group, L2-normalized like single-pass embeddings"""
+    pooled = np.zeros((n_groups, vectors.shape[1]), dtype=np.float32)
+    np.add.at(pooled, groups, vectors * weights[:, None])
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return pooled / np.maximum(norms, 1e-12)
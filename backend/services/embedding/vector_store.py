@@ -0,0 +1,625 @@
+"""
+Persistent vector store for the embedding service
+
+Vectors live in a flat row-major matrix file that is opened with np.memmap,
+so startup cost does not grow with the number of stored resumes and every
+worker process on a host shares the same pages through the OS page cache.
+
+Directory layout (one generation is live at a time):
+    meta.json            - committed state: dim, dtype, generation, row count
+                           and byte lengths of the append-only side files
+    vectors.<gen>.bin    - (count, dim) matrix, float32 or float16
+    ids.<gen>.txt        - one vector id per row, newline separated
+    deleted.<gen>.txt    - row numbers that have been deleted or replaced
+    codes.<gen>.bin      - (count, dim) int8 matrix, only for int8 stores
+    scales.<gen>.npy     - per-dimension int8 quantization scales
+
+With int8 quantization, search scans the int8 codes (a quarter of the
+float32 bytes) and re-ranks the best candidates against the float rows,
+which are then only touched for a few rows per query.
+
+Appends write rows and ids past the committed length, fsync them and only
+then atomically replace meta.json. A crash before that point leaves bytes
+beyond the committed lengths, which are ignored on open and overwritten by
+the next append. The writing process extends its own in-memory state by the
+appended rows; other processes re-map the store when meta.json changes.
+Writers always re-read meta.json under the writer lock before appending, so
+a commit from another process is never mistaken for free space.
+
+The mapped arrays, ids and tombstones are published together as one
+immutable _State; searches take a single reference to it and never see a
+matrix from one commit with the ids or tombstones of another.
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, Iterable
+
+import numpy as np
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single writer process assumed
+    fcntl = None
+
+
+META_FILE = 'meta.json'
+SUPPORTED_DTYPES = ('float32', 'float16')
+SUPPORTED_QUANTIZATION = ('none', 'int8')
+SEARCH_CHUNK_ROWS = 65536
+QUANTIZED_BLOCK_ROWS = 1024
+INT8_MAX = 127
+# Headroom left above the observed per-dimension range when calibrating
+# scales, so later appends are rarely clipped before the next compaction
+SCALE_HEADROOM = 1.25
+# Fraction of int8 values clipped since the last calibration above which an
+# append schedules a compaction to recalibrate the scales
+RECALIBRATE_CLIP_FRACTION = 0.001
+DEFAULT_RERANK_FACTOR = 8
+
+
+class _State(NamedTuple):
+    """One committed view of the store; replaced as a whole, never mutated"""
+    meta: Dict[str, Any]
+    matrix: np.ndarray
+    codes: Optional[np.ndarray]
+    scales: Optional[np.ndarray]
+    ids: List[str]
+    alive: np.ndarray
+    id_to_row: Dict[str, int]
+    # (inode, size, mtime) of the meta.json this state was read from; every
+    # commit replaces the file, so the inode changes even within one mtime tick
+    stamp: Tuple[int, int, int]
+
+
+class VectorStore:
+    """Append-only, memory-mapped store of normalized embedding vectors"""
+
+    def __init__(self, path: str, dim: int = 384, dtype: str = 'float32',
+                 quantization: str = 'none', readonly: bool = False):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        if quantization not in SUPPORTED_QUANTIZATION:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+
+        self.path = Path(path)
+        self.readonly = readonly
+        self._lock = threading.RLock()
+        self._compaction_thread = None
+        self._state: Optional[_State] = None
+
+        if not (self.path / META_FILE).exists():
+            if readonly:
+                raise FileNotFoundError(f"No vector store found at {self.path}")
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._write_meta({
+                'version': 1,
+                'dim': dim,
+                'dtype': dtype,
+                'quantization': quantization,
+                'generation': 0,
+                'count': 0,
+                'ids_bytes': 0,
+                'deleted_bytes': 0
+            })
+
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Opening / refreshing
+    # ------------------------------------------------------------------
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self._state.meta
+
+    def _file(self, kind: str, generation: Optional[int] = None) -> Path:
+        gen = self.meta['generation'] if generation is None else generation
+        suffix = {'vectors': 'bin', 'codes': 'bin', 'scales': 'npy'}.get(kind, 'txt')
+        return self.path / f"{kind}.{gen}.{suffix}"
+
+    def _read_meta(self) -> Dict[str, Any]:
+        with open(self.path / META_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self, meta: Dict[str, Any]):
+        tmp_path = self.path / (META_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path / META_FILE)
+
+    def _meta_stamp(self) -> Tuple[int, int, int]:
+        st = os.stat(self.path / META_FILE)
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _load(self):
+        """Map the committed state of the current generation"""
+        # Stamp before reading: a commit in between only causes one extra reload
+        stamp = self._meta_stamp()
+        meta = self._read_meta()
+
+        self.dim = meta['dim']
+        self.dtype = np.dtype(meta['dtype'])
+        self.quantization = meta.get('quantization', 'none')
+        generation = meta['generation']
+        count = meta['count']
+
+        matrix, codes = self._map_rows(count, generation)
+        scales = None
+        if self.quantization == 'int8' and self._file('scales', generation).exists():
+            scales = np.load(self._file('scales', generation))
+
+        ids = self._read_lines(self._file('ids', generation), meta['ids_bytes'])
+        alive = np.ones(count, dtype=bool)
+        for row in self._read_lines(self._file('deleted', generation), meta['deleted_bytes']):
+            alive[int(row)] = False
+
+        id_to_row = {}
+        for row, vector_id in enumerate(ids):
+            if alive[row]:
+                id_to_row[vector_id] = row
+
+        self._state = _State(meta, matrix, codes, scales, ids, alive, id_to_row, stamp)
+        logger.info(f"Opened vector store {self.path}: {len(id_to_row)} live vectors "
+                    f"(generation {generation})")
+
+    @staticmethod
+    def _read_lines(file_path: Path, committed_bytes: int) -> List[str]:
+        if not committed_bytes:
+            return []
+        with open(file_path, 'rb') as f:
+            data = f.read(committed_bytes)
+        return data.decode('utf-8').split('\n')[:-1]
+
+    def refresh(self) -> bool:
+        """Re-map the store if another process committed since we opened it"""
+        try:
+            stamp = self._meta_stamp()
+        except FileNotFoundError:
+            return False
+        if stamp == self._state.stamp:
+            return False
+        with self._lock:
+            self._load()
+        return True
+
+    def _sync(self):
+        """
+        Catch up with commits from other processes; call with the writer lock
+
+        Compares the committed meta itself rather than the file stamp, so a
+        writer never appends at a stale count over rows it has not seen.
+        """
+        if self._read_meta() != self._state.meta:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._state.id_to_row)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _writer_lock(self):
+        return _FileLock(self.path / 'writer.lock')
+
+    def _compaction_lock(self):
+        # Held for the whole compaction, so a second worker skips instead of
+        # rewriting the same generation in parallel
+        return _FileLock(self.path / 'compaction.lock', blocking=False)
+
+    def _map_rows(self, count: int, generation: Optional[int] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(vectors, int8 codes or None) of a generation, mapped with count rows"""
+        codes = None
+        if not count:
+            matrix = np.empty((0, self.dim), dtype=self.dtype)
+            if self.quantization == 'int8':
+                codes = np.empty((0, self.dim), dtype=np.int8)
+            return matrix, codes
+        matrix = np.memmap(self._file('vectors', generation), dtype=self.dtype, mode='r', shape=(count, self.dim))
+        if self.quantization == 'int8':
+            codes = np.memmap(self._file('codes', generation), dtype=np.int8, mode='r', shape=(count, self.dim))
+        return matrix, codes
+
+    def add(self, ids: Iterable[str], vectors) -> int:
+        """
+        Append vectors, replacing any existing vectors with the same ids
+
+        Returns the number of rows committed
+        """
+        if self.readonly:
+            raise PermissionError("Vector store opened read-only")
+
+        ids = [str(i) for i in ids]
+        for vector_id in ids:
+            if '\n' in vector_id:
+                raise ValueError("Vector ids must not contain newlines")
+
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dim {self.dim}, got {vectors.shape[1]}")
+        if not ids:
+            return 0
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = (vectors / np.maximum(norms, 1e-12)).astype(self.dtype)
+
+        with self._lock, self._writer_lock():
+            self._sync()
+            state = self._state
+            meta = dict(state.meta)
+            start = meta['count']
+
+            replaced = [state.id_to_row[i] for i in ids if i in state.id_to_row]
+            # A later duplicate inside the same batch replaces an earlier one
+            last_row = {}
+            for offset, vector_id in enumerate(ids):
+                if vector_id in last_row:
+                    replaced.append(start + last_row[vector_id])
+                last_row[vector_id] = offset
+
+            self._append_bytes(self._file('vectors'), start * self.dim * self.dtype.itemsize, vectors.tobytes())
+            scales = state.scales
+            if self.quantization == 'int8':
+                if scales is None:
+                    scales = self._calibrate(vectors)
+                    self._save_scales(scales, self._file('scales'))
+                codes, clipped = self._quantize(vectors, scales)
+                self._append_bytes(self._file('codes'), start * self.dim, codes.tobytes())
+                meta['clipped'] = meta.get('clipped', 0) + clipped
+            meta['ids_bytes'] = self._append_bytes(
+                self._file('ids'), meta['ids_bytes'], ''.join(f"{i}\n" for i in ids).encode('utf-8'))
+            if replaced:
+                meta['deleted_bytes'] = self._append_bytes(
+                    self._file('deleted'), meta['deleted_bytes'], ''.join(f"{r}\n" for r in replaced).encode('utf-8'))
+
+            meta['count'] = start + len(ids)
+            self._write_meta(meta)
+
+            # Extend the in-memory state by the appended rows only
+            matrix, codes = self._map_rows(meta['count'])
+            alive = np.ones(meta['count'], dtype=bool)
+            alive[:start] = state.alive
+            alive[replaced] = False
+            id_to_row = dict(state.id_to_row)
+            for offset, vector_id in enumerate(ids):
+                id_to_row[vector_id] = start + offset
+            self._state = _State(meta, matrix, codes, scales, state.ids + ids, alive, id_to_row, self._meta_stamp())
+
+        if self._needs_recalibration() and self.compact(background=True):
+            logger.info(f"Vector store int8 clipping above {RECALIBRATE_CLIP_FRACTION:.2%} of values, "
+                        f"recalibrating scales")
+
+        return len(ids)
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Tombstone vectors by id; space is reclaimed by compact()"""
+        if self.readonly:
+            raise PermissionError("Vector store opened read-only")
+
+        ids = [str(i) for i in ids]
+        with self._lock, self._writer_lock():
+            self._sync()
+            state = self._state
+            rows = [state.id_to_row[i] for i in ids if i in state.id_to_row]
+            if not rows:
+                return 0
+
+            meta = dict(state.meta)
+            meta['deleted_bytes'] = self._append_bytes(
+                self._file('deleted'), meta['deleted_bytes'], ''.join(f"{r}\n" for r in rows).encode('utf-8'))
+            self._write_meta(meta)
+
+            alive = state.alive.copy()
+            alive[rows] = False
+            id_to_row = dict(state.id_to_row)
+            for vector_id in ids:
+                id_to_row.pop(vector_id, None)
+            self._state = state._replace(meta=meta, alive=alive, id_to_row=id_to_row, stamp=self._meta_stamp())
+
+        return len(rows)
+
+    # ------------------------------------------------------------------
+    # Quantization
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _calibrate(vectors: np.ndarray) -> np.ndarray:
+        """Per-dimension symmetric scales mapping the observed range onto int8"""
+        max_abs = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0) * SCALE_HEADROOM
+        return (np.maximum(max_abs, 1e-6) / INT8_MAX).astype(np.float32)
+
+    def _save_scales(self, scales: np.ndarray, file_path: Path):
+        tmp_path = file_path.with_suffix('.tmp.npy')
+        np.save(tmp_path, scales)
+        os.replace(tmp_path, file_path)
+
+    @staticmethod
+    def _quantize(vectors: np.ndarray, scales: np.ndarray) -> Tuple[np.ndarray, int]:
+        """int8 codes of vectors and the number of values clipped to the int8 range"""
+        codes = np.rint(np.asarray(vectors, dtype=np.float32) / scales)
+        clipped = int(np.count_nonzero(np.abs(codes) > INT8_MAX))
+        return np.clip(codes, -INT8_MAX, INT8_MAX).astype(np.int8), clipped
+
+    def _needs_recalibration(self) -> bool:
+        """
+        Whether appends since the last calibration clipped too many values
+
+        Scales are calibrated on the first batch and on every compaction;
+        later batches outside that range are clipped, which costs recall
+        until the next compaction recalibrates against all live rows.
+        """
+        if self.quantization != 'int8' or not self.meta['count']:
+            return False
+        clipped = self.meta.get('clipped', 0)
+        return clipped > RECALIBRATE_CLIP_FRACTION * self.meta['count'] * self.dim
+
+    @staticmethod
+    def _quantized_scores(state: _State, query: np.ndarray, rows: int) -> np.ndarray:
+        """
+        Approximate cosine scores from the int8 codes
+
+        The per-dimension scales are folded into the query once, so each
+        row score is a plain dot product against the raw int8 codes. Codes
+        are widened in cache-sized blocks: numpy has no int8 BLAS kernel, and
+        widening in L2 keeps the scan bound by the int8 bytes read from memory.
+        """
+        folded = (query * state.scales).astype(np.float32)
+        codes = state.codes[:rows]
+        scores = np.empty(rows, dtype=np.float32)
+        for start in range(0, rows, QUANTIZED_BLOCK_ROWS):
+            block = codes[start:start + QUANTIZED_BLOCK_ROWS]
+            np.matmul(block.astype(np.float32), folded, out=scores[start:start + len(block)])
+        return scores
+
+    @staticmethod
+    def _append_bytes(file_path: Path, offset: int, data: bytes) -> int:
+        """Write data at the committed offset, dropping any uncommitted tail"""
+        with open(file_path, 'r+b' if file_path.exists() else 'w+b') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return offset + len(data)
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def compact(self, background: bool = True) -> bool:
+        """
+        Rewrite live rows into a new generation, dropping tombstoned rows
+
+        int8 stores are always rewritten, even without tombstones, so the
+        codes are re-quantized with scales recalibrated on every live row.
+        Rows are copied outside the writer lock; only rows appended or
+        deleted while copying are reconciled under the lock before the new
+        generation is committed.
+        """
+        if self.readonly:
+            raise PermissionError("Vector store opened read-only")
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            return False
+
+        if background:
+            self._compaction_thread = threading.Thread(target=self._compact, name='vector-store-compaction', daemon=True)
+            self._compaction_thread.start()
+        else:
+            self._compact()
+        return True
+
+    def _compact(self):
+        try:
+            with self._compaction_lock():
+                self._compact_locked()
+        except BlockingIOError:
+            logger.info("Vector store compaction skipped: already running in another process")
+        except Exception as e:
+            logger.error(f"Vector store compaction failed: {str(e)}")
+
+    def _compact_locked(self):
+        with self._lock:
+            self.refresh()
+            snapshot = self._state
+            snap_count = snapshot.meta['count']
+            snap_matrix = snapshot.matrix
+            snap_ids = snapshot.ids
+            snap_rows = np.flatnonzero(snapshot.alive)
+
+        quantized = self.quantization == 'int8'
+        if len(snap_rows) == snap_count and not quantized:
+            logger.info("Vector store compaction skipped: no deleted rows")
+            return
+
+        new_gen = snapshot.meta['generation'] + 1
+        new_vectors = self._file('vectors', new_gen)
+        new_ids = self._file('ids', new_gen)
+        new_codes = self._file('codes', new_gen)
+
+        # Recalibrate int8 scales against every live row
+        new_scales = None
+        if quantized and len(snap_rows):
+            max_abs = np.zeros(self.dim, dtype=np.float32)
+            for start in range(0, len(snap_rows), SEARCH_CHUNK_ROWS):
+                chunk = np.asarray(snap_matrix[snap_rows[start:start + SEARCH_CHUNK_ROWS]], dtype=np.float32)
+                max_abs = np.maximum(max_abs, np.abs(chunk).max(axis=0))
+            new_scales = self._calibrate(max_abs[None, :])
+
+        with open(new_vectors, 'wb') as f, open(new_codes if quantized else os.devnull, 'wb') as codes_f:
+            for start in range(0, len(snap_rows), SEARCH_CHUNK_ROWS):
+                chunk = np.ascontiguousarray(snap_matrix[snap_rows[start:start + SEARCH_CHUNK_ROWS]])
+                f.write(chunk.tobytes())
+                if quantized:
+                    codes_f.write(self._quantize(chunk, new_scales)[0].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+            if quantized:
+                codes_f.flush()
+                os.fsync(codes_f.fileno())
+        with open(new_ids, 'wb') as f:
+            f.write(''.join(f"{snap_ids[r]}\n" for r in snap_rows).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self._lock, self._writer_lock():
+            self._sync()
+            state = self._state
+            meta = dict(state.meta)
+
+            # Rows deleted while we were copying
+            remap = {int(old): new for new, old in enumerate(snap_rows)}
+            late_deletes = [remap[int(r)] for r in snap_rows if not state.alive[r]]
+
+            # Rows appended while we were copying
+            tail_rows = [r for r in range(snap_count, meta['count']) if state.alive[r]]
+            count = len(snap_rows)
+            vectors_bytes = count * self.dim * self.dtype.itemsize
+            ids_bytes = os.path.getsize(new_ids)
+            clipped = 0
+            if tail_rows:
+                tail = np.ascontiguousarray(state.matrix[tail_rows])
+                vectors_bytes = self._append_bytes(new_vectors, vectors_bytes, tail.tobytes())
+                if quantized:
+                    if new_scales is None:
+                        new_scales = self._calibrate(tail)
+                    codes, clipped = self._quantize(tail, new_scales)
+                    self._append_bytes(new_codes, len(snap_rows) * self.dim, codes.tobytes())
+                ids_bytes = self._append_bytes(new_ids, ids_bytes, ''.join(f"{state.ids[r]}\n" for r in tail_rows).encode('utf-8'))
+                count += len(tail_rows)
+
+            deleted_bytes = self._append_bytes(
+                self._file('deleted', new_gen), 0, ''.join(f"{r}\n" for r in late_deletes).encode('utf-8'))
+            if new_scales is not None:
+                self._save_scales(new_scales, self._file('scales', new_gen))
+
+            old_gen = meta['generation']
+            meta.update({
+                'generation': new_gen,
+                'count': count,
+                'ids_bytes': ids_bytes,
+                'deleted_bytes': deleted_bytes,
+                'clipped': clipped
+            })
+            self._write_meta(meta)
+            self._load()
+
+            for kind in ('vectors', 'ids', 'deleted', 'codes', 'scales'):
+                try:
+                    self._file(kind, old_gen).unlink(missing_ok=True)
+                except OSError:
+                    # Still mapped by a reader on a platform that forbids unlinking
+                    logger.debug(f"Could not remove old {kind} file for generation {old_gen}")
+
+        logger.info(f"Vector store compacted to generation {new_gen}: {count} rows")
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get(self, vector_id: str) -> Optional[np.ndarray]:
+        self.refresh()
+        state = self._state
+        row = state.id_to_row.get(str(vector_id))
+        if row is None:
+            return None
+        return np.asarray(state.matrix[row], dtype=np.float32)
+
+    def search(self, query, k: int = 10, exact: bool = False,
+               rerank_factor: int = DEFAULT_RERANK_FACTOR) -> List[Tuple[str, float]]:
+        """
+        Cosine search over all live vectors
+
+        int8 stores scan the quantized codes and re-rank the best
+        k * rerank_factor candidates with exact float scores; pass
+        exact=True to force a full float scan.
+        """
+        self.refresh()
+        state = self._state
+        alive, ids, matrix = state.alive, state.ids, state.matrix
+        rows = len(alive)
+        if not rows or k <= 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        if self.quantization == 'int8' and state.scales is not None and not exact:
+            approx = self._quantized_scores(state, query, rows)
+            approx[~alive] = -np.inf
+            n_candidates = min(max(k * rerank_factor, k), int(alive.sum()))
+            if n_candidates <= 0:
+                return []
+            candidates = np.sort(np.argpartition(-approx, n_candidates - 1)[:n_candidates])
+            exact_scores = np.full(rows, -np.inf, dtype=np.float32)
+            exact_scores[candidates] = np.asarray(matrix[candidates], dtype=np.float32) @ query
+            return self._top_k(exact_scores, ids, k)
+
+        scores = np.empty(rows, dtype=np.float32)
+        for start in range(0, rows, SEARCH_CHUNK_ROWS):
+            chunk = np.asarray(matrix[start:start + SEARCH_CHUNK_ROWS], dtype=np.float32)
+            scores[start:start + len(chunk)] = chunk @ query
+        scores[~alive] = -np.inf
+
+        return self._top_k(scores, ids, k)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, ids: List[str], k: int) -> List[Tuple[str, float]]:
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def stats(self) -> Dict[str, Any]:
+        self.refresh()
+        state = self._state
+        return {
+            'path': str(self.path),
+            'dim': self.dim,
+            'dtype': str(self.dtype),
+            'quantization': self.quantization,
+            'generation': state.meta['generation'],
+            'rows': state.meta['count'],
+            'live': len(state.id_to_row),
+            'deleted': int(state.meta['count'] - len(state.id_to_row)),
+            'clipped_values': state.meta.get('clipped', 0),
+            'compacting': bool(self._compaction_thread and self._compaction_thread.is_alive())
+        }
+
+
+class _FileLock:
+    """
+    Inter-process lock (no-op where fcntl is unavailable)
+
+    With blocking=False, entering raises BlockingIOError if another process
+    holds the lock.
+    """
+
+    def __init__(self, path: Path, blocking: bool = True):
+        self.path = path
+        self.blocking = blocking
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fd = open(self.path, 'a')
+            try:
+                fcntl.flock(self._fd.fileno(), fcntl.LOCK_EX if self.blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._fd.close()
+                self._fd = None
+                raise
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd.fileno(), fcntl.LOCK_UN)
+            self._fd.close()
+            self._fd = None
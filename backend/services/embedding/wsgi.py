@@ -0,0 +1,19 @@
+"""
+WSGI entrypoint: gunicorn -c common/gunicorn_conf.py wsgi:app
+
+Importing this module loads the model. With preload_app that happens once
+in the gunicorn master, and the forked workers share the weights
+copy-on-write.
+"""
+import os
+
+from app import app, load_model, warmup_model, get_vector_store
+
+load_model(run_warmup=False)
+
+
+def worker_init():
+    """Called in each worker after fork (thread pools and file handles are per process)"""
+    if os.getenv('WARMUP', 'true').lower() == 'true':
+        warmup_model()
+    get_vector_store()
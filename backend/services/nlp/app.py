@@ -5,11 +5,25 @@ Performs Named Entity Recognition, skill extraction, and experience timeline ana
 
 import os
 import re
+import sys
 import json
+import time
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from collections import defaultdict
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.runtime import configure_cpu_threads, apply_torch_threads, warmup
+from common.projection import request_fields, project, wants
+from common.docstore import get_document_store, DocumentNotFound
+from common.provenance import EXTRACTION_VERSION, put_artifact
+from common.metrics import init_app as init_metrics, stage, MODEL_LOAD_SECONDS
+from common.profiling import init_app as init_profiling
+from common.transport import init_app as init_transport
+
+# Thread pools must be sized before torch / spaCy are imported
+configure_cpu_threads()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import spacy
@@ -21,6 +35,9 @@ from loguru import logger
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
+init_transport(app)
+init_metrics(app, 'nlp')
+init_profiling(app, 'nlp')
 
 # Configure logger
 logger.add("nlp_service.log", rotation="10 MB", retention="30 days", level="INFO")
@@ -30,28 +47,68 @@ nlp_model = None
 ner_pipeline = None
 
 
-def load_models():
+WARMUP_RESUME = {
+    'text': (
+        "Jane Smith\njane.smith@example.com | +1 415 555 0100 | San Francisco, CA\n"
+        "Summary\nBackend engineer with 6 years of experience building Python services.\n"
+        "Experience\nSenior Software Engineer at Acme Corp | Jan 2020 - Present\n"
+        "- Built REST APIs with Flask and PostgreSQL on AWS\n"
+        "Software Engineer - Initech (2016 - 2019)\n"
+        "- Migrated services to Docker and Kubernetes\n"
+        "Education\nBachelor of Science in Computer Science, Stanford University, 2016\n"
+        "Skills\nPython, JavaScript, React, Docker, Kubernetes, Redis, Git\n"
+        "Certifications\nAWS Certified Solutions Architect 2021\n"
+    ),
+    'sections': []
+}
+
+
+def load_models(run_warmup: bool = True):
     """Load NLP models (CPU-optimized)"""
     global nlp_model, ner_pipeline
     
     try:
+        apply_torch_threads()
+        
         logger.info("Loading spaCy model...")
         # Load spaCy model for general NLP tasks
+        start = time.perf_counter()
         nlp_model = spacy.load("en_core_web_sm")
+        MODEL_LOAD_SECONDS.set(time.perf_counter() - start, model='spacy_en_core_web_sm')
         
         logger.info("Loading transformer NER model...")
         # Load transformer model for better NER (CPU-optimized)
+        start = time.perf_counter()
         tokenizer = AutoTokenizer.from_pretrained("dslim/bert-base-NER")
         model = AutoModelForTokenClassification.from_pretrained("dslim/bert-base-NER")
         ner_pipeline = pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple")
+        MODEL_LOAD_SECONDS.set(time.perf_counter() - start, model='bert_base_ner')
         
         logger.info("Models loaded successfully")
         
+        if run_warmup and os.getenv('WARMUP', 'true').lower() == 'true':
+            warmup_models()
+        
     except Exception as e:
         logger.error(f"Error loading models: {str(e)}")
         raise
 
 
+def warmup_models():
+    """Run a representative resume through every model and extractor"""
+    text = WARMUP_RESUME['text']
+    warmup('spacy', nlp_model, [text[:500], text[:1000]])
+    warmup('ner_pipeline', ner_pipeline, [text[:500]])
+    
+    # Section positions as the parsing service would report them
+    sections = []
+    for section_type in ['summary', 'experience', 'education', 'skills', 'certifications']:
+        header = section_type.capitalize()
+        sections.append({'type': section_type, 'header': header, 'position': text.find(header)})
+    parsed_data = dict(WARMUP_RESUME, sections=sections)
+    warmup('extract', ResumeExtractor().extract, [parsed_data], rounds=1)
+
+
 class ResumeExtractor:
     """Main class for extracting structured information from resumes"""
     
@@ -66,12 +123,15 @@ class ResumeExtractor:
             'certifications': self._extract_certifications
         }
     
-    def extract(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+    @stage('extract')
+    def extract(self, parsed_data: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Main extraction method
         
         Args:
             parsed_data: Output from parsing service
+            fields: Profile keys to extract (see common.projection); the
+                extractors behind keys that are not requested never run
             
         Returns:
             Structured candidate profile
@@ -81,28 +141,41 @@ class ResumeExtractor:
         
         logger.info(f"Extracting information from {len(text)} characters")
         
-        result = {
-            'contact_info': self._extract_contact_info(text),
-            'summary': self._extract_summary(text, sections),
-            'experience': self._extract_experience(text, sections),
-            'education': self._extract_education(text, sections),
-            'skills': self._extract_skills(text, sections),
-            'certifications': self._extract_certifications(text, sections),
-            'languages': self._extract_languages(text, sections),
-            'metadata': {
-                'total_experience_years': 0,
-                'seniority_level': 'Unknown',
-                'industries': [],
-                'job_titles': []
-            },
-            'extracted_at': datetime.utcnow().isoformat(),
-            'model_version': 'nlp-v1.0.0'
+        extractors = {
+            'contact_info': lambda: self._extract_contact_info(text),
+            'summary': lambda: self._extract_summary(text, sections),
+            'experience': lambda: self._extract_experience(text, sections),
+            'education': lambda: self._extract_education(text, sections),
+            'skills': lambda: self._extract_skills(text, sections),
+            'certifications': lambda: self._extract_certifications(text, sections),
+            'languages': lambda: self._extract_languages(text, sections)
         }
         
-        # Calculate derived metrics
-        result['metadata'] = self._calculate_metadata(result)
+        result = {}
+        for key, extractor in extractors.items():
+            # Metadata is derived from the experience entries
+            if wants(fields, key) or (key == 'experience' and wants(fields, 'metadata')):
+                with stage(f"extract_{key}"):
+                    result[key] = extractor()
         
-        return result
+        if wants(fields, 'metadata'):
+            with stage('extract_metadata'):
+                result['metadata'] = self._calculate_metadata(result)
+        result['extracted_at'] = datetime.utcnow().isoformat()
+        result['model_version'] = EXTRACTION_VERSION
+        
+        return project(result, fields, keep=('extracted_at', 'model_version'))
+    
+    def extract_from_duplicate(self, parsed_data: Dict[str, Any], canonical: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Profile of a near-duplicate resume, reusing the canonical document's profile
+        
+        Only the contact details are extracted again, since they are what
+        differs between otherwise near-identical documents.
+        """
+        with stage('extract_contact_info'):
+            contact_info = self._extract_contact_info(parsed_data.get('text', ''))
+        return {**canonical, 'contact_info': contact_info, 'extracted_at': datetime.utcnow().isoformat()}
     
     def _extract_contact_info(self, text: str) -> Dict[str, Any]:
         """Extract contact information"""
@@ -146,7 +219,8 @@ class ResumeExtractor:
         
         # Extract name using NER
         if nlp_model:
-            doc = nlp_model(text[:500])  # Use first 500 chars
+            with stage('spacy'):
+                doc = nlp_model(text[:500])  # Use first 500 chars
             for ent in doc.ents:
                 if ent.label_ == "PERSON" and not contact['name']:
                     contact['name'] = ent.text
@@ -154,7 +228,8 @@ class ResumeExtractor:
         
         # Extract location
         if nlp_model:
-            doc = nlp_model(text[:1000])
+            with stage('spacy'):
+                doc = nlp_model(text[:1000])
             locations = [ent.text for ent in doc.ents if ent.label_ in ["GPE", "LOC"]]
             if locations:
                 contact['location'] = locations[0]
@@ -818,31 +893,53 @@ def extract_entities():
     Extract structured information from parsed resume
     
     Request:
-        - parsed_data: Output from parsing service
+        - parsed_data: Output from parsing service, or
+        - document_ref: Its file hash in the shared document store
+        - fields: Optional profile keys to extract, e.g. "skills,metadata"
         
     Response:
         - extracted_data: Structured candidate profile
+        - document_ref: Set when the full profile was stored for a reference
+        - near_duplicate: Set when the profile was reused from an earlier,
+          near-identical document (see the parsing service)
     """
     try:
         data = request.get_json()
         
-        if not data or 'parsed_data' not in data:
-            return jsonify({'error': 'No parsed_data provided'}), 400
+        if not data or ('parsed_data' not in data and 'document_ref' not in data):
+            return jsonify({'error': 'No parsed_data or document_ref provided'}), 400
         
-        parsed_data = data['parsed_data']
+        store = get_document_store()
+        document_ref = data.get('document_ref')
+        parsed_data = data['parsed_data'] if 'parsed_data' in data else store.resolve(document_ref, 'parsed')
+        fields = request_fields(request, data)
         
         # Extract information
-        extractor = ResumeExtractor()
-        extracted_data = extractor.extract(parsed_data)
+        with stage('load_skills_ontology'):
+            extractor = ResumeExtractor()
         
-        logger.info(f"Extraction complete: Found {len(extracted_data['experience'])} experiences, "
-                   f"{sum(len(skills) for skills in extracted_data['skills'].values())} skills")
+        duplicate = store.get(document_ref, 'duplicate_of') if document_ref and fields is None else None
+        canonical = store.get(duplicate['document_ref'], 'extracted', version=EXTRACTION_VERSION) if duplicate else None
+        if canonical is not None:
+            extracted_data = extractor.extract_from_duplicate(parsed_data, canonical)
+        else:
+            extracted_data = extractor.extract(parsed_data, fields)
         
-        return jsonify({
-            'success': True,
-            'extracted_data': extracted_data
-        }), 200
+        logger.info(f"Extraction complete: Found {len(extracted_data.get('experience', []))} experiences, "
+                   f"{sum(len(skills) for skills in extracted_data.get('skills', {}).values())} skills")
+        
+        response = {'success': True, 'extracted_data': extracted_data}
+        if canonical is not None:
+            response['near_duplicate'] = duplicate
+        if document_ref and fields is None:
+            # Scoring can then be handed the reference instead of the profile
+            put_artifact(store, document_ref, 'extract', extracted_data, inputs_from_store='parsed_data' not in data)
+            response['document_ref'] = document_ref
+        
+        return jsonify(response), 200
         
+    except DocumentNotFound as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
     except Exception as e:
         logger.error(f"Error in extract_entities: {str(e)}")
         return jsonify({
@@ -0,0 +1,18 @@
+"""
+WSGI entrypoint: gunicorn -c common/gunicorn_conf.py wsgi:app
+
+Importing this module loads the spaCy and transformer models. With
+preload_app that happens once in the gunicorn master, and the forked
+workers share them copy-on-write.
+"""
+import os
+
+from app import app, load_models, warmup_models
+
+load_models(run_warmup=False)
+
+
+def worker_init():
+    """Called in each worker after fork (thread pools are per process)"""
+    if os.getenv('WARMUP', 'true').lower() == 'true':
+        warmup_models()
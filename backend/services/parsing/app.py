@@ -5,13 +5,15 @@ Extracts text and structure from PDF, DOCX, and TXT files
 
 import os
 import io
+import sys
 import json
 import hashlib
+import tempfile
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterable, Iterator, IO, Union
 from datetime import datetime
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from loguru import logger
@@ -22,15 +24,60 @@ import docx
 import pytesseract
 from PIL import Image
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.projection import request_fields, project
+from common.docstore import get_document_store, DOCUMENT_STORE_PATH
+from common.near_duplicates import get_near_duplicate_index
+from common.provenance import put_artifact
+from common.metrics import init_app as init_metrics, stage, counter, gauge, record_cache
+from common.profiling import init_app as init_profiling
+from common.transport import init_app as init_transport, dumps
+
+from ocr_cache import OCRCache
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
+init_transport(app)
+init_metrics(app, 'parsing')
+init_profiling(app, 'parsing')
+
+DOCUMENTS_PARSED = counter('documents_parsed_total', 'Documents parsed by format and method',
+                           ['format', 'method', 'ocr'])
+PAGES_CLASSIFIED = counter('pdf_pages_classified_total', 'PDF pages by pre-classification', ['kind'])
+NEAR_DUPLICATES = counter('near_duplicates_total', 'Parsed documents matched to an earlier near-identical document')
 
 # Configuration
 UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', './uploads')
 PARSED_FOLDER = os.getenv('PARSED_FOLDER', './parsed')
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt', 'rtf'}
+OCR_ZOOM = 2  # 2x zoom for better quality
+OCR_LANG = 'eng'
+OCR_CACHE_ENABLED = os.getenv('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+OCR_CACHE_PATH = os.getenv('OCR_CACHE_PATH', os.path.join(os.path.dirname(DOCUMENT_STORE_PATH), 'ocr_cache.db'))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv('OCR_CACHE_MAX_ENTRIES', 100000))
+# Streamed text stays in memory up to this size, then spills to a temp file
+STREAM_SPOOL_BYTES = int(os.getenv('PARSE_STREAM_SPOOL_MB', 4)) * 1024 * 1024
+# Text read back from the spool per chunk: stored as one document_text row
+STREAM_CHUNK_CHARS = int(os.getenv('PARSE_STREAM_CHUNK_CHARS', 1024 * 1024))
+# Text per near-duplicate fingerprinting step; its tokens and shingle set
+# are what this bounds, the MinHash itself is blockwise (SIGNATURE_BLOCK_ROWS)
+STREAM_FINGERPRINT_CHARS = int(os.getenv('PARSE_STREAM_FINGERPRINT_CHARS', 64 * 1024))
+
+# Common section headers (case-insensitive patterns)
+SECTION_PATTERNS = {
+    'contact': ['contact', 'contact information', 'personal information', 'personal details'],
+    'summary': ['summary', 'profile', 'objective', 'about me', 'professional summary'],
+    'experience': ['experience', 'work experience', 'employment', 'work history', 'professional experience'],
+    'education': ['education', 'academic', 'qualifications'],
+    'skills': ['skills', 'technical skills', 'competencies', 'expertise', 'core competencies'],
+    'certifications': ['certifications', 'certificates', 'licenses', 'professional certifications'],
+    'projects': ['projects', 'key projects', 'notable projects'],
+    'awards': ['awards', 'honors', 'achievements', 'recognition'],
+    'publications': ['publications', 'papers', 'research'],
+    'languages': ['languages', 'language skills']
+}
 
 # Create directories
 Path(UPLOAD_FOLDER).mkdir(parents=True, exist_ok=True)
@@ -39,6 +86,63 @@ Path(PARSED_FOLDER).mkdir(parents=True, exist_ok=True)
 # Configure logger
 logger.add("parsing_service.log", rotation="10 MB", retention="30 days", level="INFO")
 
+ocr_cache = OCRCache(OCR_CACHE_PATH, OCR_CACHE_MAX_ENTRIES) if OCR_CACHE_ENABLED else None
+if ocr_cache is not None:
+    gauge('ocr_cache_entries', 'Pages in the OCR cache', multiprocess_mode='max').set_function(
+        lambda: ocr_cache.stats()['entries'])
+
+_ocr_engine = None
+
+
+def ocr_engine() -> str:
+    """Tesseract version and OCR settings, the prefix of every OCR cache key"""
+    global _ocr_engine
+    if _ocr_engine is None:
+        try:
+            version = str(pytesseract.get_tesseract_version())
+        except Exception:
+            version = 'unknown'
+        _ocr_engine = f"tesseract-{version}:{OCR_LANG}:{OCR_ZOOM}x"
+    return _ocr_engine
+
+
+class SectionDetector:
+    """
+    Section detection over text that arrives one page at a time
+    
+    Pages are numbered as if joined with a blank line, the way _parse_pdf
+    joins them, so line numbers match the whole-text detector. Positions
+    are each header's own offset in the joined text.
+    """
+    
+    def __init__(self):
+        self.sections: List[Dict[str, Any]] = []
+        self._line = 0
+        self._offset = 0
+    
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Detect the sections of the next page; returns the new ones"""
+        found = []
+        offset = self._offset
+        lines = text.split('\n')
+        for i, line in enumerate(lines):
+            line_lower = line.lower().strip()
+            if line_lower and len(line_lower) < 50:  # Likely a header
+                for section_type, patterns in SECTION_PATTERNS.items():
+                    if any(pattern in line_lower for pattern in patterns):
+                        found.append({
+                            'type': section_type,
+                            'header': line.strip(),
+                            'line_number': self._line + i,
+                            'position': offset + len(line) - len(line.lstrip())
+                        })
+            offset += len(line) + 1
+        # The blank line between pages
+        self._line += len(lines) + 1
+        self._offset += len(text) + 2
+        self.sections.extend(found)
+        return found
+
 
 class DocumentParser:
     """Main document parsing class"""
@@ -46,6 +150,7 @@ class DocumentParser:
     def __init__(self):
         self.supported_formats = ['pdf', 'docx', 'txt', 'rtf']
     
+    @stage('parse_document')
     def parse_document(self, file_path: str, file_format: str) -> Dict[str, Any]:
         """
         Parse document based on format
@@ -61,13 +166,19 @@ class DocumentParser:
             logger.info(f"Parsing document: {file_path} (format: {file_format})")
             
             if file_format == 'pdf':
-                return self._parse_pdf(file_path)
+                result = self._parse_pdf(file_path)
             elif file_format == 'docx':
-                return self._parse_docx(file_path)
+                with stage('parse_docx'):
+                    result = self._parse_docx(file_path)
             elif file_format in ['txt', 'rtf']:
-                return self._parse_text(file_path)
+                with stage('parse_text'):
+                    result = self._parse_text(file_path)
             else:
                 raise ValueError(f"Unsupported file format: {file_format}")
+            
+            DOCUMENTS_PARSED.inc(format=file_format, method=result['parsing_method'],
+                                 ocr=str(result['ocr_used']).lower())
+            return result
                 
         except Exception as e:
             logger.error(f"Error parsing document {file_path}: {str(e)}")
@@ -86,35 +197,15 @@ class DocumentParser:
         
         try:
             # Try PyMuPDF first (faster)
-            doc = fitz.open(file_path)
-            result['metadata'] = {
-                'pages': doc.page_count,
-                'title': doc.metadata.get('title', ''),
-                'author': doc.metadata.get('author', ''),
-                'subject': doc.metadata.get('subject', ''),
-                'keywords': doc.metadata.get('keywords', ''),
-                'creator': doc.metadata.get('creator', ''),
-                'producer': doc.metadata.get('producer', ''),
-                'creation_date': doc.metadata.get('creationDate', ''),
-            }
+            with stage('pdf_open'):
+                doc = fitz.open(file_path)
+            result['metadata'] = self._pdf_metadata(doc)
             
             full_text = []
-            for page_num in range(doc.page_count):
-                page = doc[page_num]
-                page_text = page.get_text()
-                
-                # If no text found, try OCR
-                if len(page_text.strip()) < 50:
-                    logger.info(f"Low text content on page {page_num}, attempting OCR")
-                    page_text = self._ocr_page(page)
-                    result['ocr_used'] = True
-                
-                full_text.append(page_text)
-                result['pages'].append({
-                    'page_number': page_num + 1,
-                    'text': page_text,
-                    'char_count': len(page_text)
-                })
+            for page in self.iter_pdf_pages(doc):
+                result['ocr_used'] = result['ocr_used'] or page.pop('ocr_used')
+                full_text.append(page['text'])
+                result['pages'].append(page)
             
             result['text'] = '\n\n'.join(full_text)
             doc.close()
@@ -122,7 +213,8 @@ class DocumentParser:
             # If text extraction failed, try pdfminer as fallback
             if len(result['text'].strip()) < 100:
                 logger.info("Low text extraction, trying pdfminer fallback")
-                result['text'] = pdf_extract_text(file_path, laparams=LAParams())
+                with stage('pdf_pdfminer_fallback'):
+                    result['text'] = pdf_extract_text(file_path, laparams=LAParams())
                 result['parsing_method'] = 'pdfminer'
             
             # Detect sections
@@ -135,6 +227,119 @@ class DocumentParser:
             logger.error(f"Error parsing PDF: {str(e)}")
             raise
     
+    def _pdf_metadata(self, doc) -> Dict[str, Any]:
+        return {
+            'pages': doc.page_count,
+            'title': doc.metadata.get('title', ''),
+            'author': doc.metadata.get('author', ''),
+            'subject': doc.metadata.get('subject', ''),
+            'keywords': doc.metadata.get('keywords', ''),
+            'creator': doc.metadata.get('creator', ''),
+            'producer': doc.metadata.get('producer', ''),
+            'creation_date': doc.metadata.get('creationDate', ''),
+        }
+    
+    def iter_pdf_pages(self, doc) -> Iterator[Dict[str, Any]]:
+        """
+        Yield {'page_number', 'text', 'char_count', 'ocr_used'} for each page of an open PDF
+        
+        Pages are loaded one at a time and dropped before the next one is.
+        Scanned pages skip the text pass and go straight to OCR.
+        """
+        for page_num in range(doc.page_count):
+            page = doc[page_num]
+            ocr_used = False
+            if self._classify_page(page) == 'scanned':
+                page_text = self._ocr_page(page, scanned=True)
+                ocr_used = True
+            else:
+                with stage('pdf_page_text'):
+                    page_text = page.get_text()
+                
+                # If no text found, try OCR
+                if len(page_text.strip()) < 50:
+                    logger.info(f"Low text content on page {page_num}, attempting OCR")
+                    page_text = self._ocr_page(page)
+                    ocr_used = True
+            del page
+            
+            yield {
+                'page_number': page_num + 1,
+                'text': page_text,
+                'char_count': len(page_text),
+                'ocr_used': ocr_used
+            }
+    
+    def stream_document(self, file_path: str, file_format: str, text_sink: IO[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Parse a document page by page with bounded memory
+        
+        Yields a {'type': 'metadata'} record, one {'type': 'page'} record per
+        page carrying the sections that start on it, and a final
+        {'type': 'done'} record with the document-level fields. The text is
+        written to text_sink as it is produced, pages joined with a blank
+        line as in parse_document, instead of being collected. For PDFs,
+        MuPDF's resource cache is emptied after every page, so memory does
+        not grow with the page count.
+        
+        Formats other than PDF are parsed whole and reported as one page.
+        """
+        if file_format != 'pdf':
+            result = self.parse_document(file_path, file_format)
+            text_sink.write(result['text'])
+            yield {'type': 'metadata', 'metadata': result['metadata']}
+            yield {'type': 'page', 'page_number': 1, 'text': result['text'], 'char_count': len(result['text']),
+                   'ocr_used': result['ocr_used'], 'sections': result['sections']}
+            yield {'type': 'done', 'metadata': result['metadata'], 'sections': result['sections'],
+                   'parsing_method': result['parsing_method'], 'ocr_used': result['ocr_used'],
+                   'page_count': 1, 'char_count': len(result['text']), 'word_count': len(result['text'].split())}
+            return
+        
+        with stage('pdf_open'):
+            doc = fitz.open(file_path)
+        try:
+            metadata = self._pdf_metadata(doc)
+            yield {'type': 'metadata', 'metadata': metadata}
+            
+            detector = SectionDetector()
+            ocr_used = False
+            char_count = word_count = stripped_count = 0
+            for page in self.iter_pdf_pages(doc):
+                fitz.TOOLS.store_shrink(100)
+                if page['page_number'] > 1:
+                    text_sink.write('\n\n')
+                    char_count += 2
+                text_sink.write(page['text'])
+                char_count += page['char_count']
+                word_count += len(page['text'].split())
+                stripped_count += len(page['text'].strip())
+                ocr_used = ocr_used or page['ocr_used']
+                with stage('detect_sections'):
+                    page['sections'] = detector.feed(page['text'])
+                yield dict(page, type='page')
+        finally:
+            doc.close()
+        
+        sections, parsing_method = detector.sections, 'text'
+        # Same fallback as _parse_pdf; the joined text can only be this short
+        # if the pages' stripped text is
+        if stripped_count < 100:
+            text_sink.seek(0)
+            if len(text_sink.read().strip()) < 100:
+                logger.info("Low text extraction, trying pdfminer fallback")
+                with stage('pdf_pdfminer_fallback'):
+                    text = pdf_extract_text(file_path, laparams=LAParams())
+                text_sink.seek(0)
+                text_sink.truncate()
+                text_sink.write(text)
+                sections, parsing_method = self._detect_sections(text), 'pdfminer'
+                char_count, word_count = len(text), len(text.split())
+        
+        DOCUMENTS_PARSED.inc(format='pdf', method=parsing_method, ocr=str(ocr_used).lower())
+        yield {'type': 'done', 'metadata': metadata, 'sections': sections, 'parsing_method': parsing_method,
+               'ocr_used': ocr_used, 'page_count': metadata['pages'], 'char_count': char_count,
+               'word_count': word_count}
+    
     def _parse_docx(self, file_path: str) -> Dict[str, Any]:
         """Parse DOCX document"""
         result = {
@@ -231,17 +436,74 @@ class DocumentParser:
             logger.error(f"Error parsing text file: {str(e)}")
             raise
     
-    def _ocr_page(self, page) -> str:
-        """Perform OCR on a PDF page"""
+    def _classify_page(self, page) -> str:
+        """
+        'scanned' or 'text', from the page's font and image inventory
+        
+        Listing a page's fonts and images only reads its resource
+        dictionary; nothing is extracted or rendered. A page that has
+        images but no fonts cannot carry extractable text. Every other
+        page, including scans with an OCR text layer, takes the text pass.
+        """
+        with stage('pdf_page_classify'):
+            kind = 'scanned' if page.get_images() and not page.get_fonts() else 'text'
+        PAGES_CLASSIFIED.inc(kind=kind)
+        return kind
+    
+    def _page_stream_hash(self, page) -> str:
+        """Hash of what a scanned page draws: geometry, content stream and raw image streams"""
+        doc = page.parent
+        digest = hashlib.sha256(f"{page.rotation}:{tuple(page.rect)}".encode('utf-8'))
+        digest.update(page.read_contents())
+        for image in page.get_images(full=True):
+            for xref in image[:2]:  # the image and its soft mask, if any
+                if xref:
+                    digest.update(doc.xref_object(xref, compressed=True).encode('utf-8'))
+                    digest.update(doc.xref_stream_raw(xref) or b'')
+        return digest.hexdigest()
+    
+    def _ocr_page(self, page, scanned: bool = False) -> str:
+        """
+        Perform OCR on a PDF page, through the OCR cache
+        
+        Scanned pages are looked up by their streams before being rendered,
+        other pages by their rendered pixels.
+        """
         try:
+            key = None
+            if ocr_cache is not None and scanned:
+                with stage('ocr_cache_lookup'):
+                    key = f"{ocr_engine()}:streams:{self._page_stream_hash(page)}"
+                    text = ocr_cache.get(key)
+                if text is not None:
+                    record_cache('ocr', hits=1)
+                    return text
+            
             # Convert page to image
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom for better quality
-            img_data = pix.tobytes("png")
+            with stage('ocr_render'):
+                pix = page.get_pixmap(matrix=fitz.Matrix(OCR_ZOOM, OCR_ZOOM))
+            
+            if ocr_cache is not None and key is None:
+                with stage('ocr_cache_lookup'):
+                    pixels = hashlib.sha256(f"{pix.width}x{pix.height}x{pix.n}:".encode('utf-8'))
+                    pixels.update(pix.samples_mv if hasattr(pix, 'samples_mv') else pix.samples)
+                    key = f"{ocr_engine()}:pixels:{pixels.hexdigest()}"
+                    text = ocr_cache.get(key)
+                if text is not None:
+                    record_cache('ocr', hits=1)
+                    return text
+            
+            with stage('ocr_render'):
+                img_data = pix.tobytes("png")
             
             # OCR using Tesseract
-            image = Image.open(io.BytesIO(img_data))
-            text = pytesseract.image_to_string(image, lang='eng')
+            with stage('ocr_page'):
+                image = Image.open(io.BytesIO(img_data))
+                text = pytesseract.image_to_string(image, lang=OCR_LANG)
             
+            if ocr_cache is not None:
+                record_cache('ocr', misses=1)
+                ocr_cache.put(key, text)
             return text
             
         except Exception as e:
@@ -254,26 +516,16 @@ class DocumentParser:
         
         Returns list of detected sections with their positions
         """
+        with stage('detect_sections'):
+            return self._find_sections(text)
+    
+    def _find_sections(self, text: str) -> List[Dict[str, Any]]:
         sections = []
         
-        # Common section headers (case-insensitive patterns)
-        section_patterns = {
-            'contact': ['contact', 'contact information', 'personal information', 'personal details'],
-            'summary': ['summary', 'profile', 'objective', 'about me', 'professional summary'],
-            'experience': ['experience', 'work experience', 'employment', 'work history', 'professional experience'],
-            'education': ['education', 'academic', 'qualifications'],
-            'skills': ['skills', 'technical skills', 'competencies', 'expertise', 'core competencies'],
-            'certifications': ['certifications', 'certificates', 'licenses', 'professional certifications'],
-            'projects': ['projects', 'key projects', 'notable projects'],
-            'awards': ['awards', 'honors', 'achievements', 'recognition'],
-            'publications': ['publications', 'papers', 'research'],
-            'languages': ['languages', 'language skills']
-        }
-        
         text_lower = text.lower()
         lines = text.split('\n')
         
-        for section_type, patterns in section_patterns.items():
+        for section_type, patterns in SECTION_PATTERNS.items():
             for i, line in enumerate(lines):
                 line_lower = line.lower().strip()
                 
@@ -294,6 +546,7 @@ class DocumentParser:
         return sections
 
 
+@stage('file_hash')
 def calculate_file_hash(file_path: str) -> str:
     """Calculate SHA256 hash of file"""
     sha256_hash = hashlib.sha256()
@@ -303,6 +556,47 @@ def calculate_file_hash(file_path: str) -> str:
     return sha256_hash.hexdigest()
 
 
+def iter_text_chunks(text_file: IO[str], size: int = STREAM_CHUNK_CHARS) -> Iterator[str]:
+    """Read a text file from the start in chunks of about size characters, split between words"""
+    text_file.seek(0)
+    carry = ''
+    while True:
+        block = text_file.read(size)
+        if not block:
+            break
+        block = carry + block
+        cut = max(block.rfind(' '), block.rfind('\n')) + 1
+        if cut:
+            block, carry = block[:cut], block[cut:]
+        else:
+            carry = ''
+        yield block
+    if carry:
+        yield carry
+
+
+@stage('near_duplicate')
+def link_near_duplicate(file_hash: str, text: Union[str, Iterable[str]]) -> Optional[Dict[str, Any]]:
+    """
+    Link a document to an earlier near-identical one (MinHash/LSH)
+
+    text may be given in chunks (see NearDuplicateIndex.signature). The
+    link is stored as the 'duplicate_of' artifact, so the NLP and embedding
+    services can reuse the earlier document's results.
+    """
+    index = get_near_duplicate_index()
+    if index is None:
+        return None
+    match = index.check(file_hash, text)
+    if match is None:
+        return None
+    duplicate = {'document_ref': match.file_hash, 'similarity': match.similarity}
+    get_document_store().put(file_hash, 'duplicate_of', duplicate)
+    NEAR_DUPLICATES.inc()
+    logger.info(f"{file_hash[:12]} is a near-duplicate of {match.file_hash[:12]} (similarity {match.similarity})")
+    return duplicate
+
+
 def allowed_file(filename: str) -> bool:
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -326,10 +620,16 @@ def parse_resume():
     Request:
         - file: Resume file (PDF, DOCX, TXT)
         - metadata: Optional JSON metadata
+        - fields: Optional response keys to return, e.g.
+          "file_hash,parsed_data.sections" (query string or form field)
         
     Response:
         - parsed_data: Extracted text and structure
         - file_hash: SHA256 hash of the file
+        - document_ref: Reference to the parsed document in the shared
+          document store, accepted by /extract and /embed
+        - near_duplicate: {document_ref, similarity} of an earlier,
+          near-identical resume whose results are reused, or null
         - metadata: File metadata
     """
     try:
@@ -379,10 +679,15 @@ def parse_resume():
         with open(parsed_path, 'w', encoding='utf-8') as f:
             json.dump(parsed_data, f, indent=2, ensure_ascii=False)
         
+        # Downstream services can now be passed the hash instead of the text
+        put_artifact(get_document_store(), file_hash, 'parse', parsed_data)
+        near_duplicate = link_near_duplicate(file_hash, parsed_data['text'])
+        
         # Prepare response
         response = {
             'success': True,
             'file_hash': file_hash,
+            'document_ref': file_hash,
             'original_filename': filename,
             'file_format': file_extension.upper(),
             'file_size': os.path.getsize(file_path),
@@ -399,12 +704,13 @@ def parse_resume():
                 'raw_file_path': file_path,
                 'parsed_file_path': parsed_path
             },
+            'near_duplicate': near_duplicate,
             'processed_at': datetime.utcnow().isoformat(),
             'metadata': metadata
         }
         
         logger.info(f"Successfully parsed document: {filename} (hash: {file_hash[:12]})")
-        return jsonify(response), 200
+        return jsonify(project(response, request_fields(request), keep=('success',))), 200
         
     except Exception as e:
         logger.error(f"Error in parse_resume: {str(e)}")
@@ -414,6 +720,100 @@ def parse_resume():
         }), 500
 
 
+@app.route('/parse/stream', methods=['POST'])
+def parse_stream():
+    """
+    Parse an uploaded resume page by page and stream the result as NDJSON
+    
+    Meant for very large PDFs (portfolios with 100+ pages): pages are
+    extracted, OCRed and section-scanned one at a time, and each page is
+    written out as soon as it is done, so memory does not grow with the
+    page count. The response does not repeat the full text; it is stored
+    in the document store under document_ref, with per-page character
+    counts instead of per-page copies of the text. The text is spooled to
+    a temporary file, then stored and fingerprinted from it chunk by
+    chunk, so it is never held in memory whole.
+    
+    Request: as for /parse (file, metadata)
+    
+    Response lines:
+        - {"type": "metadata"}: Document metadata
+        - {"type": "page"}: page_number, text, char_count, ocr_used and the
+          sections that start on the page
+        - {"type": "done"}: file_hash, document_ref, sections, counts,
+          parsing_method, near_duplicate
+        - {"type": "error"}: If parsing fails after streaming has started
+    
+    The records are also written to a .jsonl file in the parsed folder as
+    they are produced.
+    """
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'error': 'No file provided'}), 400
+    
+    file = request.files['file']
+    if not allowed_file(file.filename):
+        return jsonify({
+            'error': f'File type not allowed. Supported: {", ".join(ALLOWED_EXTENSIONS)}'
+        }), 400
+    
+    metadata = {}
+    if 'metadata' in request.form:
+        try:
+            metadata = json.loads(request.form['metadata'])
+        except json.JSONDecodeError:
+            logger.warning("Invalid metadata JSON provided")
+    
+    filename = secure_filename(file.filename)
+    file_extension = filename.rsplit('.', 1)[1].lower()
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    file_path = os.path.join(UPLOAD_FOLDER, f"{timestamp}_{filename}")
+    file.save(file_path)
+    file_hash = calculate_file_hash(file_path)
+    parsed_path = os.path.join(PARSED_FOLDER, f"{timestamp}_{file_hash[:12]}_parsed.jsonl")
+    
+    def generate():
+        pages = []
+        try:
+            with tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_BYTES, mode='w+', encoding='utf-8') as text_sink, \
+                    open(parsed_path, 'wb') as out:
+                for record in DocumentParser().stream_document(file_path, file_extension, text_sink):
+                    if record['type'] == 'page':
+                        pages.append({'page_number': record['page_number'], 'char_count': record['char_count']})
+                    elif record['type'] == 'done':
+                        parsed_data = {
+                            'pages': pages,
+                            'metadata': record['metadata'],
+                            'sections': record['sections'],
+                            'parsing_method': record['parsing_method'],
+                            'ocr_used': record['ocr_used']
+                        }
+                        put_artifact(get_document_store(), file_hash, 'parse', parsed_data,
+                                     text_chunks=iter_text_chunks(text_sink))
+                        record.update({
+                            'success': True,
+                            'file_hash': file_hash,
+                            'document_ref': file_hash,
+                            'original_filename': filename,
+                            'file_format': file_extension.upper(),
+                            'file_size': os.path.getsize(file_path),
+                            'near_duplicate': link_near_duplicate(
+                                file_hash, iter_text_chunks(text_sink, STREAM_FINGERPRINT_CHARS)),
+                            'storage': {'raw_file_path': file_path, 'parsed_file_path': parsed_path},
+                            'processed_at': datetime.utcnow().isoformat(),
+                            'request_metadata': metadata
+                        })
+                    line = dumps(record) + b'\n'
+                    out.write(line)
+                    yield line
+            logger.info(f"Streamed {len(pages)} pages of {filename} (hash: {file_hash[:12]})")
+        except Exception as e:
+            logger.error(f"Error in parse_stream: {str(e)}")
+            yield dumps({'type': 'error', 'success': False, 'error': str(e)}) + b'\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+
 @app.route('/parse/batch', methods=['POST'])
 def parse_batch():
     """
@@ -451,10 +851,14 @@ def parse_batch():
                     
                     parser = DocumentParser()
                     parsed_data = parser.parse_document(file_path, file_extension)
+                    put_artifact(get_document_store(), file_hash, 'parse', parsed_data)
+                    near_duplicate = link_near_duplicate(file_hash, parsed_data['text'])
                     
                     results.append({
                         'filename': filename,
                         'file_hash': file_hash,
+                        'document_ref': file_hash,
+                        'near_duplicate': near_duplicate,
                         'status': 'success',
                         'char_count': len(parsed_data['text']),
                         'sections_found': len(parsed_data['sections'])
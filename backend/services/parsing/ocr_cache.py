@@ -0,0 +1,105 @@
+"""
+Persistent OCR result cache
+
+Scanned resumes often repeat whole pages: company templates, cover sheets,
+reference pages. Tesseract takes on the order of a second per page, so
+OCR text is cached by a hash of what the page shows:
+
+- for scanned pages, the page's content stream and the raw bytes of the
+  image streams it draws, so a repeat page is recognized without being
+  rendered at all;
+- for other pages that need OCR, the rendered pixels.
+
+Keys are prefixed with the OCR engine version, language and render zoom,
+so a Tesseract upgrade or a settings change starts a fresh cache.
+
+The cache is a SQLite file next to the document store. It holds at most
+max_entries pages and drops the least recently used ones beyond that.
+The cache object is created at import, in the preloading gunicorn master.
+Connections are therefore opened lazily per thread and process, and a
+forked worker never uses a connection it inherited.
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_pages (
+    key       TEXT PRIMARY KEY,
+    text      TEXT NOT NULL,
+    hits      INTEGER NOT NULL DEFAULT 0,
+    last_used TEXT NOT NULL
+)
+"""
+_LAST_USED_INDEX = 'CREATE INDEX IF NOT EXISTS ocr_pages_last_used ON ocr_pages (last_used)'
+
+PRUNE_EVERY = 256  # puts between size checks
+
+
+class OCRCache:
+    """page key -> OCR text, in a SQLite file shared by all workers"""
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._puts = 0
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(_SCHEMA)
+                conn.execute(_LAST_USED_INDEX)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        # Keyed by pid too: a connection inherited across fork must not be used
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._connect()
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connection()
+        row = conn.execute('SELECT text FROM ocr_pages WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute('UPDATE ocr_pages SET hits = hits + 1, last_used = ? WHERE key = ?',
+                         (datetime.utcnow().isoformat(), key))
+        return row[0]
+
+    def put(self, key: str, text: str):
+        with self._connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO ocr_pages (key, text, hits, last_used) VALUES (?, ?, 0, ?)',
+                         (key, text, datetime.utcnow().isoformat()))
+        self._puts += 1
+        if self._puts % PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop the least recently used pages beyond max_entries"""
+        with self._connection() as conn:
+            excess = conn.execute('SELECT COUNT(*) FROM ocr_pages').fetchone()[0] - self.max_entries
+            if excess <= 0:
+                return 0
+            conn.execute('DELETE FROM ocr_pages WHERE key IN '
+                         '(SELECT key FROM ocr_pages ORDER BY last_used LIMIT ?)', (excess,))
+            return excess
+
+    def stats(self) -> Dict[str, int]:
+        entries, hits = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM ocr_pages').fetchone()
+        return {'entries': entries, 'hits': hits, 'max_entries': self.max_entries}
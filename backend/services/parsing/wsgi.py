@@ -0,0 +1,2 @@
+"""WSGI entrypoint: gunicorn -c common/gunicorn_conf.py wsgi:app"""
+from app import app
@@ -0,0 +1,207 @@
+"""
+Ingest Pipeline Service
+Runs parse -> extract -> embed -> score for one upload inside a single process
+
+The parsing, NLP, embedding and scoring services are imported as modules,
+so the parsed text, extracted profile and embedding pass between stages as
+Python objects instead of being JSON-serialized for an HTTP hop each. The
+standalone services are unchanged; this is an optional deployment that
+replaces four round trips through the gateway with one.
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict
+
+from services import load_service
+from common.runtime import configure_cpu_threads
+from common.docstore import get_document_store
+from common.provenance import STAGES, EXTRACTION_VERSION, put_artifact
+from common.metrics import init_app as init_metrics, stage
+from common.profiling import init_app as init_profiling
+from common.transport import init_app as init_transport
+
+# Thread pools must be sized before the NLP / embedding stacks import torch
+configure_cpu_threads()
+
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+from werkzeug.utils import secure_filename
+from loguru import logger
+
+
+parsing = load_service('parsing')
+nlp = load_service('nlp')
+embedding = load_service('embedding')
+scoring = load_service('scoring')
+
+app = Flask(__name__)
+CORS(app)
+init_transport(app)
+init_metrics(app, 'pipeline')
+init_profiling(app, 'pipeline')
+
+logger.add("pipeline_service.log", rotation="10 MB", retention="30 days", level="INFO")
+
+extractor = None
+
+
+def load_models(run_warmup: bool = True):
+    """Load the NLP and embedding models into this process"""
+    global extractor
+    nlp.load_models(run_warmup)
+    embedding.load_model(run_warmup)
+    extractor = nlp.ResumeExtractor()
+    # Domain scoring embeds jobs and centroid descriptors with the model
+    # loaded above instead of calling an embedding service over HTTP
+    scoring.scorer.domain.encoder = lambda texts: embedding.model.encode(
+        texts, batch_size=32, show_progress_bar=False)
+
+
+@contextmanager
+def timed(timings: Dict[str, float], name: str):
+    start = time.perf_counter()
+    try:
+        with stage(f"ingest_{name}"):
+            yield
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def _form_json(name: str):
+    if name not in request.form:
+        return None
+    try:
+        return json.loads(request.form[name])
+    except json.JSONDecodeError:
+        raise ValueError(f"Invalid JSON in form field '{name}'")
+
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    return jsonify({
+        'status': 'healthy',
+        'service': 'pipeline-service',
+        'models_loaded': extractor is not None and embedding.model is not None,
+        'timestamp': datetime.utcnow().isoformat()
+    })
+
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """
+    Parse, extract, embed and optionally score one resume
+
+    Request (multipart):
+        - file: Resume file (PDF, DOCX, TXT)
+        - job: Optional JSON job requirements; when given the resume is scored
+        - weights: Optional JSON subscore weights
+        - job_id, candidate_id: Optional ids for the subscore cache
+
+    Response:
+        - parsed_data, extracted_data, embedding: Output of each stage
+        - near_duplicate: Earlier near-identical resume whose profile and
+          embedding were reused, or null
+        - score: Score against the job, if one was given
+        - timings_ms: Wall time per stage
+    """
+    timings = {}
+    start = time.perf_counter()
+    try:
+        if 'file' not in request.files or request.files['file'].filename == '':
+            return jsonify({'error': 'No file provided'}), 400
+
+        file = request.files['file']
+        if not parsing.allowed_file(file.filename):
+            return jsonify({
+                'error': f'File type not allowed. Supported: {", ".join(parsing.ALLOWED_EXTENSIONS)}'
+            }), 400
+
+        try:
+            job = _form_json('job')
+            weights = _form_json('weights')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        with timed(timings, 'save'):
+            filename = secure_filename(file.filename)
+            file_extension = filename.rsplit('.', 1)[1].lower()
+            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+            file_path = os.path.join(parsing.UPLOAD_FOLDER, f"{timestamp}_{filename}")
+            file.save(file_path)
+            file_hash = parsing.calculate_file_hash(file_path)
+
+        with timed(timings, 'parse'):
+            parsed_data = parsing.DocumentParser().parse_document(file_path, file_extension)
+            put_artifact(get_document_store(), file_hash, 'parse', parsed_data)
+            near_duplicate = parsing.link_near_duplicate(file_hash, parsed_data['text'])
+
+        # A near-duplicate reuses the earlier document's profile and embedding
+        with timed(timings, 'extract'):
+            canonical = (get_document_store().get(near_duplicate['document_ref'], 'extracted', version=EXTRACTION_VERSION)
+                         if near_duplicate else None)
+            if canonical is not None:
+                extracted_data = extractor.extract_from_duplicate(parsed_data, canonical)
+            else:
+                extracted_data = extractor.extract(parsed_data)
+            put_artifact(get_document_store(), file_hash, 'extract', extracted_data)
+
+        with timed(timings, 'embed'):
+            embedded = (embedding.reuse_near_duplicate({'document_ref': file_hash}, STAGES['embed'].kind)
+                        if near_duplicate else None)
+            if embedded is None:
+                document = {'id': file_hash, 'text': parsed_data['text'], 'sections': parsed_data['sections']}
+                embedded = embedding.embed_documents(embedding.model, [document])[0]
+                put_artifact(get_document_store(), file_hash, 'embed', embedded)
+
+        score = None
+        if job is not None:
+            with timed(timings, 'score'):
+                candidate = dict(extracted_data, embedding=embedded['embedding'])
+                score = scoring.scorer.calculate_score(candidate, job, weights,
+                                                       request.form.get('candidate_id'), request.form.get('job_id'))
+
+        timings['total'] = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(f"Ingested {filename} (hash: {file_hash[:12]}) in {timings['total']} ms: {timings}")
+
+        return jsonify({
+            'success': True,
+            'file_hash': file_hash,
+            'document_ref': file_hash,
+            'original_filename': filename,
+            'file_format': file_extension.upper(),
+            'parsed_data': {
+                'text': parsed_data['text'],
+                'char_count': len(parsed_data['text']),
+                'word_count': len(parsed_data['text'].split()),
+                'sections': parsed_data['sections'],
+                'metadata': parsed_data['metadata'],
+                'parsing_method': parsed_data['parsing_method'],
+                'ocr_used': parsed_data['ocr_used']
+            },
+            'near_duplicate': near_duplicate,
+            'extracted_data': extracted_data,
+            'embedding': embedded,
+            'score': score,
+            'timings_ms': timings,
+            'processed_at': datetime.utcnow().isoformat()
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error in ingest: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timings_ms': timings
+        }), 500
+
+
+if __name__ == '__main__':
+    load_models()
+    port = int(os.getenv('PORT', 5005))
+    logger.info(f"Starting Pipeline Service on port {port}")
+    app.run(host='0.0.0.0', port=port)
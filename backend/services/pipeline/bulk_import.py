@@ -0,0 +1,284 @@
+"""
+Bulk resume importer
+
+Parses and extracts every resume in a directory tree or a zip archive and
+stores the results in the shared document store, the same way
+/parse + /extract with a document_ref do. The standalone services do not
+need to be running: parsing and NLP are imported in-process and run in a
+pool of worker processes.
+
+Progress is recorded in a SQLite checkpoint, one row per file hash, as each
+document finishes. An interrupted import (crash, Ctrl-C, redeploy) resumes
+where it stopped when re-run with the same checkpoint. Files already done,
+and duplicates inside the import, are skipped without being parsed again.
+
+Near-duplicates of documents already in the store (the same resume
+exported again, see common.near_duplicates) are linked to the earlier
+document and reuse its extraction instead of running NLP again.
+
+Zip members are read one at a time, and at most --in-flight documents are
+held in memory, so archives never need to be extracted to disk.
+
+Point DOCUMENT_STORE_PATH at the store the services use (the
+./storage/documents volume in docker-compose) so they can resolve the
+imported documents by hash.
+
+Usage (from backend/services/pipeline):
+    python bulk_import.py /data/resumes --workers 4
+    python bulk_import.py client_export.zip --checkpoint client.db --retry-failed
+    python bulk_import.py /data/resumes --no-extract     # parse only
+"""
+
+import os
+import sys
+import time
+import hashlib
+import sqlite3
+import zipfile
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, Optional, Tuple
+
+from services import load_service
+from common.provenance import EXTRACTION_VERSION, put_artifact
+
+SUPPORTED_EXTENSIONS = {'pdf', 'docx', 'txt', 'rtf'}
+
+_CHECKPOINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS imports (
+    file_hash   TEXT PRIMARY KEY,
+    source      TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    error       TEXT,
+    chars       INTEGER,
+    duration_ms REAL,
+    finished_at TEXT NOT NULL
+)
+"""
+
+
+class Checkpoint:
+    """file hash -> import outcome, committed as each document finishes"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(_CHECKPOINT_SCHEMA)
+        self.conn.commit()
+
+    def finished(self, retry_failed: bool) -> set:
+        statuses = ('done',) if retry_failed else ('done', 'failed')
+        rows = self.conn.execute(
+            f"SELECT file_hash FROM imports WHERE status IN ({','.join('?' * len(statuses))})", statuses)
+        return {row[0] for row in rows}
+
+    def record(self, file_hash: str, source: str, status: str, error: Optional[str] = None,
+               chars: Optional[int] = None, duration_ms: Optional[float] = None):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO imports (file_hash, source, status, error, chars, duration_ms, finished_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (file_hash, source, status, error, chars, duration_ms, datetime.utcnow().isoformat())
+            )
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM imports GROUP BY status').fetchall())
+
+
+def _supported(name: str) -> bool:
+    return '.' in name and name.rsplit('.', 1)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def list_sources(source: Path) -> list:
+    """Names of the importable files, without reading them"""
+    if source.is_dir():
+        return sorted(str(p.relative_to(source)) for p in source.rglob('*') if p.is_file() and _supported(p.name))
+    with zipfile.ZipFile(source) as archive:
+        return [info.filename for info in archive.infolist() if not info.is_dir() and _supported(info.filename)]
+
+
+def read_sources(source: Path, names: list) -> Iterator[Tuple[str, bytes]]:
+    """Yield (name, content) one file at a time"""
+    if source.is_dir():
+        for name in names:
+            yield name, (source / name).read_bytes()
+        return
+    with zipfile.ZipFile(source) as archive:
+        for name in names:
+            yield name, archive.read(name)
+
+
+# ----------------------------------------------------------------------
+# Worker process
+# ----------------------------------------------------------------------
+
+_parsing = None
+_parser = None
+_extractor = None
+_store = None
+
+
+def _init_worker(extract: bool):
+    global _parsing, _parser, _extractor, _store
+    from common.runtime import configure_cpu_threads
+    configure_cpu_threads()
+    from common.docstore import get_document_store
+
+    _parsing = load_service('parsing')
+    _parser = _parsing.DocumentParser()
+    if extract:
+        nlp = load_service('nlp')
+        nlp.load_models(run_warmup=False)
+        _extractor = nlp.ResumeExtractor()
+    _store = get_document_store()
+
+
+def _import_document(name: str, file_hash: str, data: bytes) -> Dict:
+    start = time.perf_counter()
+    extension = name.rsplit('.', 1)[1].lower()
+    with tempfile.NamedTemporaryFile(suffix=f".{extension}", delete=False) as f:
+        f.write(data)
+        path = f.name
+    try:
+        parsed = _parser.parse_document(path, extension)
+    finally:
+        os.unlink(path)
+    put_artifact(_store, file_hash, 'parse', parsed)
+    near_duplicate = _parsing.link_near_duplicate(file_hash, parsed['text'])
+    if _extractor is not None:
+        canonical = (_store.get(near_duplicate['document_ref'], 'extracted', version=EXTRACTION_VERSION)
+                     if near_duplicate else None)
+        if canonical is not None:
+            extracted = _extractor.extract_from_duplicate(parsed, canonical)
+        else:
+            extracted = _extractor.extract(parsed)
+        put_artifact(_store, file_hash, 'extract', extracted)
+    return {'chars': len(parsed['text']), 'near_duplicate': near_duplicate is not None,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1)}
+
+
+# ----------------------------------------------------------------------
+# Driver
+# ----------------------------------------------------------------------
+
+class Progress:
+    """Single-line live progress: done/total, current and average rate, ETA"""
+
+    def __init__(self, total: int, interval: float = 1.0):
+        self.total = total
+        self.interval = interval
+        self.done = self.failed = self.skipped = self.near_duplicates = 0
+        self.start = self._last = time.monotonic()
+        self._last_done = 0
+        self._rate = None
+
+    def update(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        processed = self.done + self.failed
+        window = (processed - self._last_done) / max(now - self._last, 1e-9)
+        self._rate = window if self._rate is None else 0.7 * self._rate + 0.3 * window
+        self._last, self._last_done = now, processed
+        average = processed / max(now - self.start, 1e-9)
+        remaining = self.total - processed - self.skipped
+        eta = remaining / self._rate if self._rate else float('inf')
+        eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta != float('inf') else '--:--:--'
+        sys.stderr.write(f"\r{processed + self.skipped}/{self.total}  ok={self.done} failed={self.failed} "
+                         f"skipped={self.skipped}  {self._rate:.1f} docs/s (avg {average:.1f})  ETA {eta_text}  ")
+        sys.stderr.flush()
+
+
+def run(args) -> int:
+    source = Path(args.source)
+    checkpoint = Checkpoint(args.checkpoint)
+    finished = checkpoint.finished(args.retry_failed)
+    names = list_sources(source)
+    if args.limit:
+        names = names[:args.limit]
+    print(f"{len(names)} files in {source}; {len(finished)} already in checkpoint {args.checkpoint}", file=sys.stderr)
+
+    # Size each worker's BLAS / torch pools for the pool, not the whole machine
+    os.environ.setdefault('WORKERS', str(args.workers))
+    progress = Progress(len(names))
+    seen = set(finished)
+    pending = {}
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(not args.no_extract,)) as pool:
+        def collect(block: bool):
+            done, _ = wait(list(pending), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, file_hash = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    # A worker died (failed model load, OOM kill); not the document's fault
+                    raise
+                except Exception as e:
+                    checkpoint.record(file_hash, name, 'failed', error=str(e)[:500])
+                    progress.failed += 1
+                else:
+                    checkpoint.record(file_hash, name, 'done', chars=result['chars'],
+                                      duration_ms=result['duration_ms'])
+                    progress.done += 1
+                    progress.near_duplicates += result['near_duplicate']
+            progress.update()
+
+        try:
+            for name, data in read_sources(source, names):
+                file_hash = hashlib.sha256(data).hexdigest()
+                if file_hash in seen:
+                    progress.skipped += 1
+                    continue
+                seen.add(file_hash)
+                pending[pool.submit(_import_document, name, file_hash, data)] = (name, file_hash)
+                while len(pending) >= args.in_flight:
+                    collect(block=True)
+                collect(block=False)
+            while pending:
+                collect(block=True)
+        except KeyboardInterrupt:
+            print('\nInterrupted; finished documents are checkpointed, re-run to resume', file=sys.stderr)
+            pool.shutdown(wait=False, cancel_futures=True)
+            return 130
+        except BrokenProcessPool as e:
+            print(f"\nWorker pool failed ({e}); finished documents are checkpointed, re-run to resume",
+                  file=sys.stderr)
+            return 2
+        finally:
+            progress.update(force=True)
+            sys.stderr.write('\n')
+
+    counts = checkpoint.counts()
+    elapsed = time.monotonic() - progress.start
+    print(f"Imported {progress.done} ({progress.near_duplicates} near-duplicates), failed {progress.failed}, "
+          f"skipped {progress.skipped} in {elapsed:.1f}s "
+          f"(checkpoint totals: {counts})", file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help='Directory of resumes or a .zip archive')
+    parser.add_argument('--checkpoint', default='bulk_import.db', help='SQLite checkpoint file')
+    parser.add_argument('--workers', type=int, default=max((os.cpu_count() or 2) - 1, 1))
+    parser.add_argument('--in-flight', type=int, help='Max documents queued or running (default 4 x workers)')
+    parser.add_argument('--no-extract', action='store_true', help='Parse only; skip NLP extraction')
+    parser.add_argument('--retry-failed', action='store_true', help='Retry files that failed in an earlier run')
+    parser.add_argument('--limit', type=int, help='Import at most this many files')
+    args = parser.parse_args()
+    args.in_flight = args.in_flight or args.workers * 4
+
+    source = Path(args.source)
+    if not source.is_dir() and not zipfile.is_zipfile(source):
+        parser.error(f"{source} is neither a directory nor a zip archive")
+    sys.exit(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Version-aware reprocessing of stored documents
+
+Recomputes the per-document artifacts in the shared document store whose
+provenance is stale (see common.provenance): produced by an older stage
+version, or computed from inputs that have since changed. After bumping
+EXTRACTION_VERSION, say, only 'extracted' artifacts are recomputed, plus
+whatever depends on them, and only for documents that were not already
+recomputed.
+
+Planning reads provenance columns only, never the artifacts themselves.
+Documents are recomputed in a pool of worker processes that load just the
+models the planned stages need. Each worker re-checks staleness before
+running a stage, so a dependent stage is skipped when its recomputed input
+came out unchanged.
+
+The job is resumable without a checkpoint: every finished artifact carries
+the current version and input hash, so a re-run after an interruption
+plans only what is still stale. Artifacts written before provenance was
+recorded have no version and count as stale.
+
+Usage (from backend/services/pipeline):
+    python reprocess.py --dry-run                 # what is stale, per stage
+    python reprocess.py --workers 4               # recompute everything stale
+    python reprocess.py --stage extract           # extraction and its dependents only
+    python reprocess.py --stage embed --fill-missing   # also embed documents never embedded
+"""
+
+import os
+import sys
+import time
+import argparse
+from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Tuple
+
+from services import load_service
+from bulk_import import Progress
+from common.provenance import STAGES, combine_hashes, input_hash, put_artifact
+
+
+def dependents(stage: str) -> List[str]:
+    """The stage and every stage that consumes its output, directly or not, in dependency order"""
+    # STAGES is in dependency order, so one pass sees every producer first
+    selected = {stage}
+    for spec in STAGES.values():
+        if any(STAGES[name].kind in spec.inputs for name in selected):
+            selected.add(spec.name)
+    return [name for name in STAGES if name in selected]
+
+
+def plan(store, stages: List[str], fill_missing: bool) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Yield (file_hash, stages to run) for every document with stale artifacts
+
+    A stage is planned when its artifact is stale, or when one of its inputs
+    is itself planned (the worker decides whether that input really changed).
+    """
+    kinds = {kind for name in stages for kind in (STAGES[name].kind, *STAGES[name].inputs)}
+    for file_hash, rows in groupby(store.provenance(kinds), key=lambda row: row[0]):
+        artifacts = {kind: (version, inputs, data) for _, kind, version, inputs, data in rows}
+        data_hashes = {kind: data for kind, (_, _, data) in artifacts.items()}
+        planned, changing = [], set()
+        for name in stages:
+            spec = STAGES[name]
+            if any(kind not in artifacts for kind in spec.inputs):
+                continue
+            artifact = artifacts.get(spec.kind)
+            if artifact is None:
+                stale = fill_missing
+            else:
+                version, inputs, _ = artifact
+                stale = (version != spec.version or any(kind in changing for kind in spec.inputs)
+                         or inputs != combine_hashes(data_hashes, spec.inputs))
+            if stale:
+                planned.append(name)
+                changing.add(spec.kind)
+        if planned:
+            yield file_hash, planned
+
+
+def outdated_roots(store) -> Dict[str, int]:
+    """Artifacts of stages that cannot be recomputed here (no inputs), by stage, with an old version"""
+    counts = {}
+    for name, spec in STAGES.items():
+        if spec.inputs:
+            continue
+        stale = sum(1 for _, _, version, _, _ in store.provenance([spec.kind]) if version != spec.version)
+        if stale:
+            counts[name] = stale
+    return counts
+
+
+# ----------------------------------------------------------------------
+# Worker process
+# ----------------------------------------------------------------------
+
+_runners = {}
+_store = None
+
+
+def _init_worker(stages: List[str]):
+    global _store
+    from common.runtime import configure_cpu_threads
+    configure_cpu_threads()
+    from common.docstore import get_document_store
+
+    _store = get_document_store()
+    if 'extract' in stages:
+        nlp = load_service('nlp')
+        nlp.load_models(run_warmup=False)
+        extractor = nlp.ResumeExtractor()
+        _runners['extract'] = lambda file_hash, inputs: extractor.extract(inputs['parsed'])
+    if 'embed' in stages:
+        embedding = load_service('embedding')
+        embedding.load_model(run_warmup=False)
+
+        def embed(file_hash, inputs):
+            parsed = inputs['parsed']
+            document = {'id': file_hash, 'text': parsed.get('text', ''), 'sections': parsed.get('sections')}
+            return embedding.embed_documents(embedding.model, [document])[0]
+        _runners['embed'] = embed
+
+
+def _reprocess_document(file_hash: str, stages: List[str]) -> Dict[str, List[str]]:
+    recomputed, unchanged = [], []
+    for name in stages:
+        spec = STAGES[name]
+        current = input_hash(_store, file_hash, name)
+        artifact = _store.provenance_of(file_hash, spec.kind)
+        if artifact is not None and artifact == (spec.version, current):
+            unchanged.append(name)
+            continue
+        inputs = {kind: _store.resolve(file_hash, kind) for kind in spec.inputs}
+        put_artifact(_store, file_hash, name, _runners[name](file_hash, inputs))
+        recomputed.append(name)
+    return {'recomputed': recomputed, 'unchanged': unchanged}
+
+
+# ----------------------------------------------------------------------
+# Driver
+# ----------------------------------------------------------------------
+
+def run(args) -> int:
+    from common.docstore import get_document_store
+    store = get_document_store()
+
+    stages = dependents(args.stage) if args.stage else [name for name, spec in STAGES.items() if spec.inputs]
+    for name, count in outdated_roots(store).items():
+        print(f"note: {count} '{STAGES[name].kind}' artifacts predate {STAGES[name].version}; "
+              f"re-upload or re-import those documents to refresh them", file=sys.stderr)
+
+    work = list(plan(store, stages, args.fill_missing))
+    if args.limit:
+        work = work[:args.limit]
+    per_stage = {name: sum(name in planned for _, planned in work) for name in stages}
+    print(f"{len(work)} documents to reprocess; planned per stage: {per_stage}", file=sys.stderr)
+    if args.dry_run or not work:
+        return 0
+
+    os.environ.setdefault('WORKERS', str(args.workers))
+    progress = Progress(len(work))
+    pending = {}
+    recomputed = {name: 0 for name in stages}
+    failures = []
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(sorted({name for _, planned in work for name in planned}),)) as pool:
+        def collect(block: bool):
+            done, _ = wait(list(pending), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_hash = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    failures.append((file_hash, str(e)[:200]))
+                    progress.failed += 1
+                else:
+                    for name in result['recomputed']:
+                        recomputed[name] += 1
+                    if result['recomputed']:
+                        progress.done += 1
+                    else:
+                        progress.skipped += 1
+            progress.update()
+
+        try:
+            for file_hash, planned in work:
+                pending[pool.submit(_reprocess_document, file_hash, planned)] = file_hash
+                while len(pending) >= args.in_flight:
+                    collect(block=True)
+                collect(block=False)
+            while pending:
+                collect(block=True)
+        except KeyboardInterrupt:
+            print('\nInterrupted; finished documents are up to date, re-run to resume', file=sys.stderr)
+            pool.shutdown(wait=False, cancel_futures=True)
+            return 130
+        except BrokenProcessPool as e:
+            print(f"\nWorker pool failed ({e}); finished documents are up to date, re-run to resume",
+                  file=sys.stderr)
+            return 2
+        finally:
+            progress.update(force=True)
+            sys.stderr.write('\n')
+
+    for file_hash, error in failures[:20]:
+        print(f"failed {file_hash[:12]}: {error}", file=sys.stderr)
+    elapsed = time.monotonic() - progress.start
+    print(f"Reprocessed {progress.done} documents ({recomputed}), {progress.skipped} already current, "
+          f"failed {progress.failed} in {elapsed:.1f}s", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stage', choices=[name for name, spec in STAGES.items() if spec.inputs],
+                        help='Only this stage and the stages that depend on it (default: all)')
+    parser.add_argument('--fill-missing', action='store_true',
+                        help='Also compute artifacts documents do not have yet')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what is stale')
+    parser.add_argument('--workers', type=int, default=max((os.cpu_count() or 2) - 1, 1))
+    parser.add_argument('--in-flight', type=int, help='Max documents queued or running (default 4 x workers)')
+    parser.add_argument('--limit', type=int, help='Reprocess at most this many documents')
+    args = parser.parse_args()
+    args.in_flight = args.in_flight or args.workers * 4
+    sys.exit(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+In-process loading of the standalone services
+
+Each service is a single app.py that imports its own helper modules
+(vector_store, ranking, ...) from its directory. load_service() puts that
+directory on sys.path and imports the app under <name>_service, so the
+four apps can live in one process without their module names colliding.
+"""
+
+import sys
+import importlib.util
+from pathlib import Path
+
+SERVICES_DIR = Path(__file__).resolve().parent.parent
+if str(SERVICES_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICES_DIR))
+
+
+def load_service(name: str):
+    """Import backend/services/<name>/app.py under the module name <name>_service"""
+    module_name = f"{name}_service"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    service_dir = SERVICES_DIR / name
+    if str(service_dir) not in sys.path:
+        sys.path.insert(0, str(service_dir))
+    spec = importlib.util.spec_from_file_location(module_name, service_dir / 'app.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
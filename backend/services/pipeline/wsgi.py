@@ -0,0 +1,18 @@
+"""
+WSGI entrypoint: gunicorn -c ../common/gunicorn_conf.py wsgi:app (from pipeline/)
+
+Importing this module loads every stage's models once in the gunicorn
+master; forked workers share them copy-on-write.
+"""
+import os
+
+from app import app, load_models, nlp, embedding
+
+load_models(run_warmup=False)
+
+
+def worker_init():
+    """Called in each worker after fork (thread pools are per process)"""
+    if os.getenv('WARMUP', 'true').lower() == 'true':
+        nlp.warmup_models()
+        embedding.warmup_model()
@@ -1,17 +1,52 @@
 """Scoring Service - Calculate candidate-job match scores"""
 import os
-from flask import Flask, request, jsonify
+import sys
+import time
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from loguru import logger
 import numpy as np
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.projection import request_fields, project, wants
+from common.docstore import get_document_store, DocumentNotFound
+from common.metrics import init_app as init_metrics, stage, gauge, record_cache
+from common.profiling import init_app as init_profiling
+from common.transport import init_app as init_transport, dumps
+
+from feature_store import CandidateFeatureStore, take_columns, concat_columns
+from subscore_cache import SubscoreCache, input_hash
+from skill_vocab import SkillVocabulary, VocabularySnapshot, popcount_rows, fit_width
+from domain_scorer import DomainScorer, candidate_text
+from ranking import CursorError, query_fingerprint, encode_cursor, decode_cursor, select_top_k
 
 app = Flask(__name__)
 CORS(app)
+init_transport(app)
+init_metrics(app, 'scoring')
+init_profiling(app, 'scoring')
+
+FEATURE_STORE_FOLDER = os.getenv('FEATURE_STORE_FOLDER', './features')
+RANK_CHUNK_SIZE = int(os.getenv('RANK_CHUNK_SIZE', 2048))
+SUBSCORE_CACHE_JOBS = int(os.getenv('SUBSCORE_CACHE_JOBS', 32))
+# Cached subscore rows across all jobs; rows are len(SUBSCORE_KEYS) float64 each
+SUBSCORE_CACHE_ROWS = int(os.getenv('SUBSCORE_CACHE_ROWS', 200000))
+SKILL_VOCAB_PATH = os.getenv('SKILL_VOCAB_PATH', os.path.join(FEATURE_STORE_FOLDER, 'skill_vocab.json'))
+EMBEDDING_URL = os.getenv('EMBEDDING_URL')
+DOMAIN_CENTROIDS_PATH = os.getenv('DOMAIN_CENTROIDS_PATH', os.path.join(FEATURE_STORE_FOLDER, 'domain_centroids.npz'))
+MAX_RANK_K = 1000
+
+SUBSCORE_KEYS = ['skills', 'experience', 'domain', 'education', 'certifications', 'recency']
+MODEL_VERSION = 'scoring-v1.1.0'
+
 
 class CandidateScorer:
-    def __init__(self):
+    def __init__(self, cache: SubscoreCache = None, vocab: SkillVocabulary = None, domain: DomainScorer = None):
+        self.cache = cache
+        self.vocab = vocab if vocab is not None else SkillVocabulary()
+        self.domain = domain if domain is not None else DomainScorer(None)
         self.default_weights = {
             'skills': 0.30,
             'experience': 0.25,
@@ -21,78 +56,368 @@ class CandidateScorer:
             'recency': 0.10
         }
     
-    def calculate_score(self, candidate: Dict, job: Dict, weights: Dict = None) -> Dict[str, Any]:
+    def calculate_score(self, candidate: Dict, job: Dict, weights: Dict = None,
+                        candidate_id: str = None, job_id: str = None,
+                        explain: bool = True, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        candidate_ids = [candidate_id] if candidate_id is not None else None
+        return self.calculate_scores([candidate], job, weights, candidate_ids, job_id, explain, fields)[0]
+    
+    def calculate_scores(self, candidates: List[Dict], job: Dict, weights: Dict = None,
+                         candidate_ids: List[str] = None, job_id: str = None,
+                         explain: bool = True, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Score many candidates against one job
+        
+        Job features are computed once, candidate subscores are filled into
+        one (n_candidates, n_subscores) matrix, and overall scores are a
+        single matrix-vector product. The single-pair path goes through here
+        too, so both always return identical results.
+        """
+        job_features = self._job_features(job)
+        with stage('featurize'):
+            columns = self.candidate_columns(candidates, vocab=job_features['skill_vocab'])
+        return self.score_columns(columns, job, weights, candidate_ids, job_id, explain, fields, job_features)
+    
+    @stage('calculate_score')
+    def score_columns(self, columns: Dict[str, Any], job: Dict, weights: Dict = None,
+                      candidate_ids: List[str] = None, job_id: str = None,
+                      explain: bool = True, fields: Optional[List[str]] = None,
+                      job_features: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Score results from candidate feature columns
+        
+        Args:
+            explain: Build the explanations list
+            fields: Result keys to return (see common.projection); keys
+                that are not requested are never computed
+            job_features: The job's features, required when the columns
+                were built from its skill vocabulary snapshot
+        """
         if not weights:
             weights = self.default_weights
         
-        subscores = {
-            'skills': self._score_skills(candidate, job),
-            'experience': self._score_experience(candidate, job),
-            'domain': self._score_domain(candidate, job),
-            'education': self._score_education(candidate, job),
-            'certifications': self._score_certifications(candidate, job),
-            'recency': self._score_recency(candidate)
-        }
+        if job_features is None:
+            job_features = self._job_features(job)
+        matrix = self.subscore_matrix(columns, job_features, candidate_ids, job_id)
+        overall = matrix @ self._weight_vector(weights)
+        return self.build_results(matrix, overall, columns, job, explain, fields)
+    
+    @stage('build_results')
+    def build_results(self, matrix: np.ndarray, overall: np.ndarray, columns: Dict[str, Any], job: Dict,
+                      explain: bool = True, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Result dicts for already computed subscores and overall scores"""
+        explain = explain and wants(fields, 'explanations')
+        with_subscores = wants(fields, 'subscores')
+        with_overall = wants(fields, 'overallScore')
+        with_version = wants(fields, 'modelVersion')
+        timestamp = datetime.utcnow().isoformat() if wants(fields, 'timestamp') else None
+        
+        overall = [round(score, 4) for score in overall.tolist()]
+        rows = matrix.tolist() if with_subscores or explain else None
+        
+        results = []
+        for i in range(len(overall)):
+            result = {}
+            if with_overall:
+                result['overallScore'] = overall[i]
+            if rows is not None:
+                subscores = dict(zip(SUBSCORE_KEYS, rows[i]))
+                if with_subscores:
+                    result['subscores'] = subscores
+                if explain:
+                    result['explanations'] = self._generate_explanations(
+                        columns['experience_display'][i], job, subscores)
+            if with_version:
+                result['modelVersion'] = MODEL_VERSION
+            if timestamp is not None:
+                result['timestamp'] = timestamp
+            results.append(project(result, fields))
+        return results
+    
+    def overall_scores(self, columns: Dict[str, Any], job_features: Dict[str, Any], weight_vector: np.ndarray,
+                       candidate_ids: List[str] = None, job_id: str = None) -> np.ndarray:
+        """Overall scores only, for ranking passes that discard most candidates"""
+        return self.subscore_matrix(columns, job_features, candidate_ids, job_id) @ weight_vector
+    
+    def subscore_matrix(self, columns: Dict[str, Any], job_features: Dict[str, Any],
+                        candidate_ids: List[str] = None, job_id: str = None) -> np.ndarray:
+        """
+        (n_candidates, n_subscores) matrix, served from the cache where possible
+        
+        Candidates without ids are cached under their input hash, as
+        'hash:<input hash>' keys that are never returned to clients.
+        """
+        candidate_hashes = columns['hash']
+        if self.cache is None or not candidate_hashes:
+            return self._subscore_matrix(columns, job_features)
         
-        overall = sum(weights[k] * subscores[k] for k in subscores.keys())
+        job_key = self._job_key(job_id, job_features)
+        if candidate_ids is not None:
+            keys = [str(i) for i in candidate_ids]
+        else:
+            keys = [f"hash:{candidate_hash}" for candidate_hash in candidate_hashes]
+        
+        matrix, hit = self.cache.lookup(job_key, job_features['hash'], keys, candidate_hashes)
+        misses = np.flatnonzero(~hit)
+        record_cache('subscores', hits=len(keys) - len(misses), misses=len(misses))
+        if len(misses):
+            computed = self._subscore_matrix(take_columns(columns, misses), job_features)
+            matrix[misses] = computed
+            self.cache.store(job_key, job_features['hash'], [keys[i] for i in misses],
+                             [candidate_hashes[i] for i in misses], computed)
+        return matrix
+    
+    def reweight(self, job_id: str, weights: Dict, job: Dict = None):
+        """
+        Overall scores for every cached candidate of a job under new weights
+        
+        Returns (candidate ids, overall scores, complete), or None when
+        nothing is cached for the job (or the cached entry was built for
+        another job). complete is False when the job had more candidates
+        than the cache's row budget holds.
+        """
+        if self.cache is None:
+            return None
+        job_hash = self._job_features(job)['hash'] if job is not None else None
+        cached = self.cache.job_matrix(str(job_id), job_hash)
+        if cached is None:
+            return None
+        candidate_ids, matrix, complete = cached
+        return candidate_ids, matrix @ self._weight_vector(weights), complete
+    
+    @staticmethod
+    def public_id(candidate_key: str) -> Optional[str]:
+        """The client's candidate id for a cache key, or None for candidates sent without one"""
+        return None if candidate_key.startswith('hash:') else candidate_key
+    
+    @staticmethod
+    def _job_key(job_id, job_features):
+        return str(job_id) if job_id is not None else f"hash:{job_features['hash']}"
+    
+    def _weight_vector(self, weights: Dict) -> np.ndarray:
+        return np.array([weights[k] for k in SUBSCORE_KEYS], dtype=np.float64)
+    
+    def _job_features(self, job: Dict) -> Dict[str, Any]:
+        """
+        Everything derived from the job alone, computed once per request
         
+        Inline candidates of the same request must be featurized with the
+        returned 'skill_vocab', so their transient skill ids match the job's.
+        """
+        vocab = self.vocab.snapshot()
+        job_bits, job_transient = vocab.bitsets([job.get('required_skills', [])])
+        job_hash = input_hash({'job': job, 'model_version': MODEL_VERSION})
+        domain_profile = self.domain.job_profile(job)
         return {
-            'overallScore': round(overall, 4),
-            'subscores': subscores,
-            'explanations': self._generate_explanations(candidate, job, subscores),
-            'modelVersion': 'scoring-v1.0.0',
-            'timestamp': datetime.utcnow().isoformat()
+            'skill_vocab': vocab,
+            'skill_bits': job_bits[0],
+            'skill_transient': job_transient[0],
+            'skill_count': int(popcount_rows(job_bits[0]) + popcount_rows(job_transient[0])),
+            'required_years': job.get('required_experience_years', 3),
+            'domain_profile': domain_profile,
+            # Subscores cached while the job had no domain profile must not
+            # outlive the embedding service coming back
+            'hash': job_hash if domain_profile is not None else f"{job_hash}:nodomain"
         }
     
-    def _score_skills(self, candidate, job):
-        cand_skills = set()
-        for skill_list in candidate.get('skills', {}).values():
-            cand_skills.update([s.lower() for s in skill_list])
+    def candidate_columns(self, candidates: List[Dict], embed_missing: bool = False,
+                          assign_skills: bool = False,
+                          vocab: Optional[VocabularySnapshot] = None) -> Dict[str, Any]:
+        """
+        Pull the fields the subscores need out of each candidate's nested dicts
+        
+        Candidates carrying an 'embedding' get a domain profile from it. With
+        embed_missing, the others are embedded through the embedding service
+        in one batch; that is done when candidates are stored, not on every
+        inline scoring request. Likewise, assign_skills adds unseen skills to
+        the persisted vocabulary for stored rows. Inline candidates are
+        encoded with the job's vocab snapshot instead, and unseen skills get
+        ids in a separate 'skill_transient' bitset.
+        """
+        skill_sets = []
+        for candidate in candidates:
+            cand_skills = []
+            for skill_list in candidate.get('skills', {}).values():
+                cand_skills.extend(skill_list)
+            skill_sets.append(cand_skills)
+        
+        skill_columns = {}
+        if assign_skills:
+            skill_columns['skill_bits'] = self.vocab.stored_bitsets(skill_sets)
+        else:
+            vocab = vocab if vocab is not None else self.vocab.snapshot()
+            skill_columns['skill_bits'], skill_columns['skill_transient'] = vocab.bitsets(skill_sets)
         
-        job_skills = set([s.lower() for s in job.get('required_skills', [])])
+        raw_years = [c.get('metadata', {}).get('total_experience_years', 0) for c in candidates]
+        return {
+            'hash': [input_hash(c) for c in candidates],
+            'experience_display': raw_years,
+            **skill_columns,
+            'experience_years': np.array([y or 0 for y in raw_years], dtype=np.float64),
+            'education_count': np.array([len(c.get('education', [])) for c in candidates], dtype=np.int64),
+            'certification_count': np.array([len(c.get('certifications', [])) for c in candidates], dtype=np.int64),
+            'domain_profile': self.domain.embedding_profiles(
+                [c.get('embedding') for c in candidates],
+                [candidate_text(c) for c in candidates] if embed_missing else None
+            )
+        }
+    
+    @stage('subscores')
+    def _subscore_matrix(self, columns: Dict[str, Any], job_features: Dict[str, Any]) -> np.ndarray:
+        n = len(columns['experience_years'])
+        matrix = np.empty((n, len(SUBSCORE_KEYS)), dtype=np.float64)
+        matrix[:, 0] = self._score_skills(columns, job_features)
+        matrix[:, 1] = self._score_experience(columns, job_features)
+        matrix[:, 2] = self._score_domain(columns, job_features)
+        matrix[:, 3] = self._score_education(columns, job_features)
+        matrix[:, 4] = self._score_certifications(columns, job_features)
+        matrix[:, 5] = self._score_recency(columns)
+        return matrix
+    
+    def _score_skills(self, columns, job_features):
+        cand_bits = columns['skill_bits']
+        job_bits = job_features['skill_bits']
         
-        if not job_skills:
-            return 0.5
+        if not job_features['skill_count']:
+            return np.full(len(cand_bits), 0.5)
         
-        matched = len(cand_skills & job_skills)
-        return min(matched / len(job_skills), 1.0)
+        # Skills first persisted after the job was encoded can never match it
+        matched = popcount_rows(fit_width(cand_bits, len(job_bits)) & job_bits)
+        # Stored rows hold persisted ids only; transient ids are local to the
+        # request's vocab snapshot, so they only ever meet the job's own
+        cand_transient = columns.get('skill_transient')
+        job_transient = job_features['skill_transient']
+        if cand_transient is not None and job_transient.any():
+            matched = matched + popcount_rows(fit_width(cand_transient, len(job_transient)) & job_transient)
+        matched = matched.astype(np.float64)
+        return np.minimum(matched / job_features['skill_count'], 1.0)
     
-    def _score_experience(self, candidate, job):
-        years = candidate.get('metadata', {}).get('total_experience_years', 0)
-        required_years = job.get('required_experience_years', 3)
+    def _score_experience(self, columns, job_features):
+        years = columns['experience_years']
+        required_years = job_features['required_years']
         
-        if years >= required_years:
-            return 1.0
-        elif years >= required_years * 0.7:
-            return 0.8
-        elif years >= required_years * 0.5:
-            return 0.6
-        return 0.3
+        return np.select(
+            [years >= required_years, years >= required_years * 0.7, years >= required_years * 0.5],
+            [1.0, 0.8, 0.6],
+            default=0.3
+        )
     
-    def _score_domain(self, candidate, job):
-        # Simplified domain matching
-        return 0.75
+    def _score_domain(self, columns, job_features):
+        profiles = columns['domain_profile']
+        job_profile = job_features['domain_profile']
+        
+        # Without embeddings on either side, fall back to a neutral score
+        if job_profile is None:
+            return np.full(len(profiles), 0.75)
+        matched = np.clip(profiles @ job_profile, 0.0, 1.0).astype(np.float64)
+        return np.where(profiles.any(axis=1), matched, 0.75)
     
-    def _score_education(self, candidate, job):
-        edu = candidate.get('education', [])
-        if not edu:
-            return 0.5
-        return 0.7 if len(edu) > 0 else 0.3
+    def _score_education(self, columns, job_features):
+        return np.where(columns['education_count'] > 0, 0.7, 0.5)
     
-    def _score_certifications(self, candidate, job):
-        certs = candidate.get('certifications', [])
-        return min(len(certs) * 0.2, 1.0)
+    def _score_certifications(self, columns, job_features):
+        return np.minimum(columns['certification_count'] * 0.2, 1.0)
     
-    def _score_recency(self, candidate):
-        return 0.85  # Simplified
+    def _score_recency(self, columns):
+        return np.full(len(columns['experience_years']), 0.85)  # Simplified
     
-    def _generate_explanations(self, candidate, job, subscores):
+    def _generate_explanations(self, experience_years, job, subscores):
         return [
             {'criterion': 'skills', 'evidence': ['Skills match analysis']},
-            {'criterion': 'experience', 'evidence': [f"{candidate.get('metadata', {}).get('total_experience_years', 0)} years experience"]}
+            {'criterion': 'experience', 'evidence': [f"{experience_years} years experience"]}
         ]
 
-scorer = CandidateScorer()
+scorer = CandidateScorer(
+    cache=SubscoreCache(MODEL_VERSION, len(SUBSCORE_KEYS), max_jobs=SUBSCORE_CACHE_JOBS,
+                        max_rows=SUBSCORE_CACHE_ROWS),
+    vocab=SkillVocabulary(SKILL_VOCAB_PATH),
+    domain=DomainScorer(EMBEDDING_URL, DOMAIN_CENTROIDS_PATH)
+)
+feature_store = CandidateFeatureStore(FEATURE_STORE_FOLDER)
+
+
+def load_state():
+    """
+    Re-open the feature store and skill vocabulary from disk
+    
+    Called in every worker after fork: a worker forked from the preloaded
+    master (including a recycled one) would otherwise start from the
+    master's import-time copies, flush them over rows other workers have
+    written since, and hand out skill ids that stored bitsets already use.
+    """
+    global feature_store
+    scorer.vocab = SkillVocabulary(SKILL_VOCAB_PATH)
+    feature_store = CandidateFeatureStore(FEATURE_STORE_FOLDER)
+
+gauge('feature_store_candidates', 'Candidates in the feature store', multiprocess_mode='max').set_function(
+    lambda: len(feature_store))
+gauge('feature_store_pending_changes', 'Changes logged since the last feature store snapshot',
+      multiprocess_mode='max').set_function(lambda: feature_store.stats()['pending_changes'])
+gauge('subscore_cache_rows', 'Cached (job, candidate) subscore rows').set_function(
+    lambda: scorer.cache.stats()['rows'])
+
+
+def _stored_columns(columns: Dict[str, Any]) -> Dict[str, Any]:
+    """Feature columns as read from the store, ready for the scorer"""
+    # Whole years read back as floats; show them as profiles usually give them
+    columns['experience_display'] = [int(years) if years.is_integer() else years
+                                     for years in columns['experience_years'].tolist()]
+    if 'domain_profile' not in columns:
+        # Store written before domain profiles existed
+        columns['domain_profile'] = np.zeros((len(columns['experience_years']), scorer.domain.width), dtype=np.float32)
+    return columns
+
+
+def _iter_candidate_chunks(data: Dict[str, Any], missing: List[str], job_features: Dict[str, Any]):
+    """
+    Yield (ids, feature columns) chunks from one candidate source
+    
+    Sources: an inline 'candidates' list, 'candidate_ids' resolved against
+    the feature store, or source='store' for every stored candidate. Inline
+    candidates are featurized with the job's skill vocabulary snapshot.
+    """
+    if data.get('source') == 'store':
+        for ids, columns in feature_store.chunks(RANK_CHUNK_SIZE):
+            yield ids, _stored_columns(columns)
+        return
+    
+    if 'candidate_ids' in data:
+        candidate_ids = [str(i) for i in data['candidate_ids']]
+        for start in range(0, len(candidate_ids), RANK_CHUNK_SIZE):
+            ids, columns, not_found = feature_store.lookup(candidate_ids[start:start + RANK_CHUNK_SIZE])
+            missing.extend(not_found)
+            yield ids, _stored_columns(columns)
+        return
+    
+    items = data.get('candidates', [])
+    for start in range(0, len(items), RANK_CHUNK_SIZE):
+        ids, candidates = [], []
+        for index, item in enumerate(items[start:start + RANK_CHUNK_SIZE], start):
+            ids.append(str(item.get('id', index)))
+            candidates.append(_candidate_profile(item))
+        yield ids, scorer.candidate_columns(candidates, vocab=job_features['skill_vocab'])
+
+
+def _candidate_profile(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The extracted profile carried by a request item
+    
+    Items are {'candidate': profile}, {'document_ref': file_hash} resolved
+    against the shared document store, or the profile itself.
+    """
+    if 'candidate' in item:
+        return item['candidate']
+    if 'document_ref' in item:
+        return get_document_store().resolve(item['document_ref'], 'extracted')
+    return item
+
+
+def _explain_option(data: Dict[str, Any]) -> bool:
+    """`explain` from the query string or body; explanations are on by default"""
+    value = request.args.get('explain', data.get('explain', True))
+    if isinstance(value, str):
+        return value.lower() not in ('false', '0', 'no')
+    return bool(value)
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -102,15 +427,355 @@ def health():
 def score_candidate():
     try:
         data = request.json
-        candidate = data.get('candidate', {})
+        candidate = _candidate_profile(data) if 'document_ref' in data else data.get('candidate', {})
         job = data.get('job', {})
         weights = data.get('weights')
         
-        result = scorer.calculate_score(candidate, job, weights)
+        result = scorer.calculate_score(candidate, job, weights, data.get('candidate_id'), data.get('job_id'),
+                                        _explain_option(data), request_fields(request, data))
         return jsonify({'success': True, 'score': result})
+    except DocumentNotFound as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         logger.error(f"Scoring error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/score/batch', methods=['POST'])
+def score_batch():
+    """
+    Score N candidates against one job in a single call
+    
+    Pass explain=false and/or fields=overallScore to skip building the
+    per-candidate detail that bulk callers throw away.
+    """
+    try:
+        data = request.json
+        candidates = data.get('candidates', [])
+        job = data.get('job', {})
+        weights = data.get('weights')
+        
+        if not isinstance(candidates, list):
+            return jsonify({'error': 'candidates must be a list'}), 400
+        
+        candidates = [_candidate_profile(c) if 'document_ref' in c else c for c in candidates]
+        results = scorer.calculate_scores(candidates, job, weights, data.get('candidate_ids'), data.get('job_id'),
+                                          _explain_option(data), request_fields(request, data))
+        logger.info(f"Batch scored {len(results)} candidates")
+        return jsonify({'success': True, 'scores': results, 'count': len(results)})
+    except DocumentNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Batch scoring error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/rank', methods=['POST'])
+def rank_candidates():
+    """
+    Return the top-k candidates for a job, one page at a time
+    
+    Request:
+        - job: Job requirements
+        - candidates: Inline list of candidate profiles (or {id, candidate} /
+          {id, document_ref} items)
+        - candidate_ids: Alternatively, ids of candidates in the local store
+        - weights: Optional subscore weights
+        - k: Page size (default 50)
+        - cursor: next_cursor from the previous page
+        - explain: Set false to omit explanations (default true)
+        - fields: Score keys to return, e.g. "overallScore"; drill into
+          single candidates with POST /score/detail
+        
+    Response:
+        - results: Ranked candidates with their scores
+        - next_cursor: Cursor for the following page, or None
+    """
+    try:
+        data = request.json or {}
+        job = data.get('job', {})
+        weights = data.get('weights') or scorer.default_weights
+        k = min(max(int(data.get('k', 50)), 1), MAX_RANK_K)
+        
+        fingerprint = query_fingerprint(job, weights)
+        after = decode_cursor(data['cursor'], fingerprint) if data.get('cursor') else None
+        offset = after['offset'] if after else 0
+        
+        job_id = data.get('job_id')
+        job_features = scorer._job_features(job)
+        weight_vector = scorer._weight_vector(weights)
+        missing = []
+        
+        top, remaining = [], 0
+        with stage('rank_select'):
+            for ids, columns in _iter_candidate_chunks(data, missing, job_features):
+                scores = scorer.overall_scores(columns, job_features, weight_vector, ids, job_id)
+                # Payloads are row positions in the chunk; only rows that make the
+                # top k are copied out, so the top k never pins a whole chunk
+                top, chunk_remaining = select_top_k([(ids, scores, range(len(ids)))], k, after, initial=top)
+                remaining += chunk_remaining
+                top = [(score, candidate_id, take_columns(columns, [row]) if isinstance(row, int) else row)
+                       for score, candidate_id, row in top]
+        
+        top_columns = concat_columns([row for _, _, row in top])
+        scores = scorer.score_columns(top_columns, job, weights, [candidate_id for _, candidate_id, _ in top], job_id,
+                                      _explain_option(data), request_fields(request, data), job_features) if top else []
+        results = []
+        for rank, ((_, candidate_id, _), score) in enumerate(zip(top, scores), offset + 1):
+            results.append({'rank': rank, 'candidateId': candidate_id, 'score': score})
+        
+        next_cursor = None
+        if remaining > len(top) and top:
+            last_score, last_id, _ = top[-1]
+            next_cursor = encode_cursor(last_score, last_id, offset + len(top), fingerprint)
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'next_cursor': next_cursor,
+            'remaining': remaining - len(top),
+            'missing': missing
+        })
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+    except DocumentNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Ranking error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/rank/stream', methods=['POST'])
+def rank_stream():
+    """
+    Score every candidate and stream the results as NDJSON
+    
+    One {"type": "score"} line per candidate is written as each chunk of
+    RANK_CHUNK_SIZE candidates is scored, in source order, followed by a
+    final {"type": "summary"} line with the count and the top k. Only the
+    current chunk and the top k are held in memory.
+    
+    Request: as for /rank (job, candidates | candidate_ids | source='store',
+    weights, job_id, k, explain, fields), plus:
+        - min_score: Only stream candidates scoring at least this much
+    
+    An error after streaming has started is reported as a final
+    {"type": "error"} line, since the status code is already sent.
+    """
+    data = request.json or {}
+    job = data.get('job', {})
+    weights = data.get('weights') or scorer.default_weights
+    k = min(max(int(data.get('k', 50)), 1), MAX_RANK_K)
+    min_score = data.get('min_score')
+    explain = _explain_option(data)
+    fields = request_fields(request, data)
+    job_id = data.get('job_id')
+    
+    try:
+        job_features = scorer._job_features(job)
+        weight_vector = scorer._weight_vector(weights)
+    except Exception as e:
+        logger.error(f"Ranking stream error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        start = time.perf_counter()
+        missing = []
+        count = streamed = 0
+        top = []
+        try:
+            for ids, columns in _iter_candidate_chunks(data, missing, job_features):
+                if not ids:
+                    continue
+                matrix = scorer.subscore_matrix(columns, job_features, ids, job_id)
+                overall = matrix @ weight_vector
+                count += len(ids)
+                top, _ = select_top_k([(ids, overall, ids)], k, initial=top)
+                
+                keep = np.arange(len(ids))
+                if min_score is not None:
+                    keep = np.flatnonzero(overall >= float(min_score))
+                if not len(keep):
+                    continue
+                results = scorer.build_results(matrix[keep], overall[keep], take_columns(columns, keep),
+                                               job, explain, fields)
+                streamed += len(keep)
+                yield b''.join(
+                    dumps({'type': 'score', 'candidateId': ids[i], 'score': result}) + b'\n'
+                    for i, result in zip(keep.tolist(), results)
+                )
+            
+            yield dumps({
+                'type': 'summary',
+                'count': count,
+                'streamed': streamed,
+                'top': [{'rank': rank, 'candidateId': candidate_id, 'overallScore': round(score, 4)}
+                        for rank, (score, candidate_id, _) in enumerate(top, 1)],
+                'missing': missing,
+                'modelVersion': MODEL_VERSION,
+                'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+            }) + b'\n'
+        except Exception as e:
+            logger.error(f"Ranking stream error: {str(e)}")
+            yield dumps({'type': 'error', 'error': str(e), 'count': count}) + b'\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+@app.route('/score/detail', methods=['POST'])
+def score_detail():
+    """
+    Full scores with explanations for the candidates a caller drills into
+    
+    Meant to follow a lean /rank or /score/batch call: subscores come from
+    the cache filled by that call, only the detail is built here.
+    
+    Request:
+        - job, job_id, weights: As for the original ranking call
+        - candidate_ids: Ids in the local store, or
+        - candidates: Inline [{id, candidate}] items
+    """
+    try:
+        data = request.json or {}
+        if data.get('source') == 'store':
+            return jsonify({'error': 'Name the candidates to detail'}), 400
+        job = data.get('job', {})
+        job_features = scorer._job_features(job)
+        
+        missing = []
+        ids, parts = [], []
+        for chunk_ids, columns in _iter_candidate_chunks(data, missing, job_features):
+            ids.extend(chunk_ids)
+            parts.append(columns)
+        if not ids:
+            return jsonify({'error': 'No candidates found', 'missing': missing}), 404
+        if len(ids) > MAX_RANK_K:
+            return jsonify({'error': f'At most {MAX_RANK_K} candidates per detail call'}), 400
+        
+        scores = scorer.score_columns(concat_columns(parts), job, data.get('weights'), ids, data.get('job_id'),
+                                      True, request_fields(request, data), job_features)
+        return jsonify({
+            'success': True,
+            'scores': [{'candidateId': candidate_id, 'score': score} for candidate_id, score in zip(ids, scores)],
+            'missing': missing
+        })
+    except Exception as e:
+        logger.error(f"Score detail error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/score/reweight', methods=['POST'])
+def reweight_scores():
+    """
+    Re-rank a job's already-scored candidates under new weights
+    
+    Answers from the cached subscore matrix with one matrix-vector product.
+    The cache lives in the scoring worker's memory: it is empty after a
+    restart, and with several workers only the one that scored the job has
+    it. Without it the call fails with 409 and the client re-scores the
+    job (with the same job_id), which rebuilds the cache. A job scored
+    against more candidates than SUBSCORE_CACHE_ROWS is only partly cached;
+    the response then has complete=false and covers the cached ones only.
+    
+    Request:
+        - job_id: Job whose candidates were scored with that job_id before
+        - weights: New subscore weights
+        - job: Optional; when given, the cache must have been built for it
+        - k: Optional; return only the top k
+    
+    Candidates that were scored without ids have no candidateId in the
+    response.
+    """
+    try:
+        data = request.json or {}
+        if data.get('job_id') is None:
+            return jsonify({'error': 'job_id is required'}), 400
+        weights = data.get('weights') or scorer.default_weights
+        
+        reweighted = scorer.reweight(data['job_id'], weights, data.get('job'))
+        if reweighted is None:
+            return jsonify({
+                'error': 'No cached subscores for this job in this scoring worker (not scored yet, evicted, '
+                         'or scored by another worker or before a restart); re-score the job with this '
+                         'job_id, then retry',
+                'rescore': True
+            }), 409
+        
+        candidate_ids, overall, complete = reweighted
+        k = int(data.get('k') or len(candidate_ids))
+        public_ids = [scorer.public_id(candidate_id) for candidate_id in candidate_ids]
+        top, _ = select_top_k([(candidate_ids, overall, public_ids)], k)
+        
+        scores = []
+        for score, _, candidate_id in top:
+            entry = {'candidateId': candidate_id} if candidate_id is not None else {}
+            entry['overallScore'] = round(score, 4)
+            scores.append(entry)
+        
+        return jsonify({
+            'success': True,
+            'scores': scores,
+            'cached_candidates': len(candidate_ids),
+            'complete': complete,
+            'modelVersion': MODEL_VERSION
+        })
+    except Exception as e:
+        logger.error(f"Reweight error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _store_candidates(candidate_ids: List[str], candidates: List[Dict]):
+    """Featurize extraction output once and upsert it into the feature store"""
+    columns = scorer.candidate_columns(candidates, embed_missing=True, assign_skills=True)
+    hashes = columns.pop('hash')
+    feature_store.upsert(candidate_ids, hashes, {
+        name: column for name, column in columns.items() if isinstance(column, np.ndarray)
+    })
+    for candidate_id in candidate_ids:
+        scorer.cache.invalidate_candidate(str(candidate_id))
+
+@app.route('/candidates/<candidate_id>', methods=['PUT'])
+def put_candidate(candidate_id):
+    """Store a candidate's extracted profile (or a {'document_ref'} to it) for ranking by id"""
+    try:
+        candidate = request.json
+        if not isinstance(candidate, dict):
+            return jsonify({'error': 'Candidate profile must be a JSON object'}), 400
+        _store_candidates([candidate_id], [_candidate_profile(candidate)])
+        return jsonify({'success': True, 'candidateId': candidate_id})
+    except DocumentNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Feature store error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/candidates', methods=['POST'])
+def put_candidates():
+    """
+    Bulk-load extracted profiles into the feature store
+    
+    Request:
+        - items: [{'id': ..., 'candidate': extracted_data}] or
+          [{'id': ..., 'document_ref': file_hash}]
+    """
+    try:
+        items = (request.json or {}).get('items', [])
+        if not items:
+            return jsonify({'error': 'No items provided'}), 400
+        _store_candidates([str(item['id']) for item in items], [_candidate_profile(item) for item in items])
+        feature_store.flush()
+        return jsonify({'success': True, 'stored': len(items), 'total': len(feature_store)})
+    except DocumentNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Feature store error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/candidates/<candidate_id>', methods=['DELETE'])
+def delete_candidate(candidate_id):
+    if not feature_store.delete(candidate_id):
+        return jsonify({'error': 'Candidate not found'}), 404
+    scorer.cache.invalidate_candidate(candidate_id)
+    return jsonify({'success': True})
+
+@app.route('/candidates/stats', methods=['GET'])
+def candidate_stats():
+    return jsonify(feature_store.stats())
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5004)))
@@ -0,0 +1,277 @@
+"""
+Embedding-based domain matching
+
+Each domain/industry is described by a short text; the embeddings of those
+descriptions form a fixed (n_domains, dim) centroid matrix, computed once
+through the embedding service and cached on disk. A profile embedding
+projected onto the centroids and softmaxed gives a small domain profile
+(one weight per domain), L2-normalized so that the domain match between a
+candidate and a job is a plain dot product.
+
+Candidate profiles are computed once when a candidate is featurized and
+kept as a feature column; a job's profile is cached per job text. Scoring
+a batch is then one (n, n_domains) @ (n_domains,) product.
+
+The cached centroids are tagged with the embedding model name and vector
+dimension. Changing either rebuilds them instead of projecting embeddings
+onto centroids from another model.
+"""
+
+import time
+import threading
+import urllib.request
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from common.metrics import stage, record_cache
+from common.provenance import EMBEDDING_MODEL
+from common.transport import dumps, loads, decompress
+from subscore_cache import input_hash
+
+DOMAIN_DESCRIPTORS = {
+    'software_engineering': "Software engineering: backend and frontend development, web applications, "
+                            "APIs, microservices, programming in Python, Java, JavaScript, C#",
+    'data_science': "Data science and machine learning: statistics, modeling, analytics, deep learning, "
+                    "data pipelines, SQL, pandas, TensorFlow, PyTorch",
+    'devops_cloud': "DevOps and cloud infrastructure: AWS, Azure, GCP, Kubernetes, Docker, CI/CD, "
+                    "site reliability, networking, Linux administration",
+    'security': "Cybersecurity: penetration testing, security operations, threat detection, "
+                "identity and access management, compliance",
+    'design': "Product and UX design: user research, wireframes, prototyping, Figma, visual design",
+    'product_management': "Product management: roadmaps, requirements, stakeholders, agile delivery, "
+                          "product strategy",
+    'finance': "Finance and accounting: financial analysis, budgeting, auditing, banking, investment, "
+               "tax, reporting",
+    'healthcare': "Healthcare and life sciences: clinical care, nursing, patients, hospitals, "
+                  "pharmaceuticals, medical research",
+    'marketing': "Marketing: digital campaigns, SEO, content, brand management, social media, growth",
+    'sales': "Sales and business development: account management, lead generation, CRM, "
+             "negotiation, quotas",
+    'education': "Education: teaching, curriculum development, training, tutoring, academic research",
+    'legal': "Legal: contracts, litigation, regulatory compliance, corporate law, paralegal work",
+    'human_resources': "Human resources: recruiting, talent acquisition, onboarding, payroll, "
+                       "employee relations",
+    'operations': "Operations and supply chain: logistics, procurement, inventory, manufacturing, "
+                  "process improvement",
+    'customer_support': "Customer support and service: help desk, ticketing, client satisfaction, "
+                        "technical support",
+    'engineering_hardware': "Mechanical, electrical and civil engineering: CAD, embedded systems, "
+                            "hardware design, construction"
+}
+
+# Softmax temperature for centroid similarities; sentence-embedding cosines
+# sit in a narrow band, so a low temperature keeps profiles discriminative
+PROFILE_TEMPERATURE = 0.05
+
+# How long to wait before retrying an unreachable embedding service
+RETRY_AFTER_SECONDS = 60
+
+
+class DomainScorer:
+    """Domain profiles from embeddings and domain matching by dot product"""
+
+    def __init__(self, embedding_url: Optional[str], cache_path: Optional[str] = None,
+                 descriptors: Dict[str, str] = None, max_jobs: int = 256, timeout: float = 10.0,
+                 job_timeout: float = 2.0, model_name: str = EMBEDDING_MODEL,
+                 encoder: Optional[Callable[[List[str]], np.ndarray]] = None):
+        self.embedding_url = embedding_url.rstrip('/') if embedding_url else None
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.descriptors = descriptors or DOMAIN_DESCRIPTORS
+        self.domains = list(self.descriptors)
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        # Job profiles are embedded inside /score, so they get a short timeout
+        self.job_timeout = job_timeout
+        self.model_name = model_name
+        # In-process alternative to the embedding service: texts -> (n, dim)
+        # embeddings from a model already loaded in this process
+        self.encoder = encoder
+        self._centroids: Optional[np.ndarray] = None
+        self._job_profiles: 'OrderedDict[str, Optional[np.ndarray]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._unavailable_until = 0.0
+
+    @property
+    def width(self) -> int:
+        return len(self.domains)
+
+    def fingerprint(self, dim: int) -> str:
+        return input_hash({'descriptors': self.descriptors, 'model': self.model_name, 'dim': int(dim)})
+
+    # ------------------------------------------------------------------
+    # Embeddings
+    # ------------------------------------------------------------------
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Embed texts with the encoder or the embedding service; None when unavailable"""
+        if not texts:
+            return None
+        if self.encoder is not None:
+            try:
+                with stage('domain_embed'):
+                    return np.asarray(self.encoder(texts), dtype=np.float32)
+            except Exception as e:
+                logger.warning(f"Encoder failed for domain scoring: {str(e)}")
+                return None
+        if not self.embedding_url or time.monotonic() < self._unavailable_until:
+            return None
+        try:
+            req = urllib.request.Request(f"{self.embedding_url}/embed", data=dumps({'texts': texts}),
+                                         headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+            with stage('domain_embed'), urllib.request.urlopen(req, timeout=timeout or self.timeout) as response:
+                payload = loads(decompress(response.read(), response.headers.get('Content-Encoding')))
+            return np.asarray(payload['embeddings'], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Embedding service unavailable for domain scoring: {str(e)}")
+            self._unavailable_until = time.monotonic() + RETRY_AFTER_SECONDS
+            return None
+
+    def centroids(self, dim: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        (n_domains, dim) L2-normalized centroid matrix, built once
+
+        Pass the dimension of the embeddings about to be projected: centroids
+        of another dimension come from another model and are rebuilt.
+        """
+        centroids = self._centroids
+        if centroids is not None and (dim is None or centroids.shape[1] == dim):
+            return centroids
+        with self._lock:
+            centroids = self._centroids
+            if centroids is not None and (dim is None or centroids.shape[1] == dim):
+                return centroids
+
+            if centroids is None and self.cache_path and self.cache_path.exists():
+                cached = np.load(self.cache_path)
+                centroids = cached['centroids']
+                if (str(cached['fingerprint']) == self.fingerprint(centroids.shape[1])
+                        and (dim is None or centroids.shape[1] == dim)):
+                    self._centroids = centroids
+                    return centroids
+
+            vectors = self.embed([self.descriptors[domain] for domain in self.domains])
+            if vectors is None:
+                return None
+            if dim is not None and vectors.shape[1] != dim:
+                logger.warning(f"Embeddings of dim {dim} do not match the {self.model_name} embedding "
+                               f"service (dim {vectors.shape[1]}); re-embed them for domain scoring")
+                return None
+            self._centroids = _normalize_rows(vectors)
+            self._job_profiles.clear()
+
+            if self.cache_path:
+                self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.cache_path, 'wb') as f:
+                    np.savez(f, centroids=self._centroids,
+                             fingerprint=np.array(self.fingerprint(self._centroids.shape[1])))
+            logger.info(f"Built domain centroid matrix for {self.model_name}: {self._centroids.shape}")
+            return self._centroids
+
+    # ------------------------------------------------------------------
+    # Profiles
+    # ------------------------------------------------------------------
+
+    def profiles(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        (n, n_domains) unit-length domain profiles for (n, dim) embeddings
+
+        Rows that are all zero (no embedding) stay zero.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        profiles = np.zeros((len(embeddings), self.width), dtype=np.float32)
+        if not len(embeddings):
+            return profiles
+        centroids = self.centroids(embeddings.shape[1])
+        if centroids is None:
+            return profiles
+
+        present = np.flatnonzero(np.any(embeddings != 0, axis=1))
+        if not len(present):
+            return profiles
+        similarity = _normalize_rows(embeddings[present]) @ centroids.T
+        logits = similarity / PROFILE_TEMPERATURE
+        weights = np.exp(logits - logits.max(axis=1, keepdims=True))
+        profiles[present] = _normalize_rows(weights)
+        return profiles
+
+    def embedding_profiles(self, embeddings: List[Optional[List[float]]],
+                           texts: Optional[List[str]] = None, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Domain profiles for candidates that may or may not carry an embedding
+
+        Missing embeddings are fetched in one batch for the given texts;
+        without texts (or without the service) they get a zero profile.
+        """
+        missing = [i for i, embedding in enumerate(embeddings)
+                   if not embedding and texts is not None and texts[i]]
+        fetched = self.embed([texts[i] for i in missing], timeout) if missing else None
+
+        present = [np.asarray(e, dtype=np.float32) for e in embeddings if e]
+        dim = present[0].shape[0] if present else (fetched.shape[1] if fetched is not None else 0)
+        if not dim:
+            return np.zeros((len(embeddings), self.width), dtype=np.float32)
+
+        matrix = np.zeros((len(embeddings), dim), dtype=np.float32)
+        for i, embedding in enumerate(embeddings):
+            if embedding:
+                matrix[i] = embedding
+        if fetched is not None:
+            matrix[missing] = fetched
+        return self.profiles(matrix)
+
+    def job_profile(self, job: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Cached domain profile for a job; None when it cannot be embedded
+
+        Keyed by the text that is embedded (or the job's own embedding), so
+        jobs that differ only in fields the profile ignores share an entry.
+        """
+        embedding = job.get('embedding')
+        key = input_hash({'embedding': embedding} if embedding else {'text': job_text(job)})
+        with self._lock:
+            if key in self._job_profiles:
+                self._job_profiles.move_to_end(key)
+                record_cache('domain_job_profile', hits=1)
+                return self._job_profiles[key]
+        record_cache('domain_job_profile', misses=1)
+
+        if embedding:
+            profile = self.profiles(np.asarray([embedding], dtype=np.float32))[0]
+        else:
+            profile = self.embedding_profiles([None], [job_text(job)], timeout=self.job_timeout)[0]
+        if not profile.any():
+            # Not cached, so the job is retried once the service is back
+            return None
+
+        with self._lock:
+            self._job_profiles[key] = profile
+            while len(self._job_profiles) > self.max_jobs:
+                self._job_profiles.popitem(last=False)
+        return profile
+
+
+def job_text(job: Dict[str, Any]) -> str:
+    parts = [job.get('title', ''), job.get('description', ''), ', '.join(job.get('required_skills', []))]
+    return '\n'.join(part for part in parts if part)
+
+
+def candidate_text(candidate: Dict[str, Any]) -> str:
+    """Short text standing in for a candidate profile when it has no embedding"""
+    metadata = candidate.get('metadata', {})
+    skills = [skill for skill_list in candidate.get('skills', {}).values() for skill in skill_list]
+    parts = [
+        candidate.get('summary') or '',
+        ', '.join(metadata.get('job_titles', [])),
+        ', '.join(metadata.get('industries', [])),
+        ', '.join(skills)
+    ]
+    return '\n'.join(part for part in parts if part)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32)
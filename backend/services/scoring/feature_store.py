@@ -0,0 +1,269 @@
+"""
+Columnar candidate feature store for the scoring service
+
+Instead of keeping each candidate's nested extracted_data and digging
+through it on every request, the store keeps one NumPy array per scoring
+feature (plus a uint64 skill bitset column) with one row per candidate id.
+Batch scoring and ranking read contiguous slices of these arrays.
+
+On disk:
+    CURRENT              - name of the live snapshot directory
+    snapshot.<n>/        - ids.json (ids + profile hashes) and <column>.npy
+    pending.jsonl        - rows upserted or deleted since that snapshot
+
+Writes append to pending.jsonl and are folded into a new snapshot every
+FLUSH_EVERY changes (or on flush()), so filling the store one extraction at
+a time stays cheap. On open, the log is replayed over the snapshot.
+"""
+
+import os
+import json
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+
+import numpy as np
+from loguru import logger
+
+from skill_vocab import fit_width
+
+FLUSH_EVERY = 1000
+
+
+def take_columns(columns: Dict[str, Any], positions) -> Dict[str, Any]:
+    """Select rows from a column dict (arrays and plain lists alike)"""
+    taken = {}
+    for name, column in columns.items():
+        if isinstance(column, np.ndarray):
+            taken[name] = column[positions]
+        else:
+            taken[name] = [column[p] for p in positions]
+    return taken
+
+
+def concat_columns(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Stack column dicts row-wise, padding bitset columns to a common width"""
+    if not parts:
+        return {}
+    merged = {}
+    for name, first in parts[0].items():
+        if isinstance(first, np.ndarray):
+            arrays = [part[name] for part in parts]
+            if first.ndim == 2:
+                width = max(a.shape[1] for a in arrays)
+                arrays = [fit_width(a, width) for a in arrays]
+            merged[name] = np.concatenate(arrays)
+        else:
+            merged[name] = [value for part in parts for value in part[name]]
+    return merged
+
+
+class CandidateFeatureStore:
+    """One row of scoring features per candidate id, stored column-wise"""
+
+    def __init__(self, folder: str):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self.ids: List[str] = []
+        self.hashes: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._pending = 0
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _snapshot_dir(self) -> Optional[Path]:
+        current = self.folder / 'CURRENT'
+        if not current.exists():
+            return None
+        return self.folder / current.read_text(encoding='utf-8').strip()
+
+    def _load(self):
+        snapshot = self._snapshot_dir()
+        if snapshot is not None and snapshot.exists():
+            with open(snapshot / 'ids.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self.ids = meta['ids']
+            self.hashes = meta['hashes']
+            self.index = {candidate_id: i for i, candidate_id in enumerate(self.ids)}
+            for name in meta['columns']:
+                self._columns[name] = np.load(snapshot / f"{name}.npy")
+
+        log_path = self.folder / 'pending.jsonl'
+        if log_path.exists():
+            with open(log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final line from a crash mid-append
+                        break
+                    if entry.get('deleted'):
+                        self._delete_row(entry['id'])
+                    else:
+                        columns = {name: np.asarray([value], dtype=entry['dtypes'][name])
+                                   for name, value in entry['columns'].items()}
+                        self._upsert_rows([entry['id']], [entry['hash']], columns)
+                    self._pending += 1
+
+        logger.info(f"Loaded candidate feature store: {len(self.ids)} candidates, {self._pending} pending changes")
+
+    def flush(self):
+        """Write all rows as a new snapshot and truncate the change log"""
+        with self._lock:
+            previous = self._snapshot_dir()
+            generation = int(previous.name.split('.')[-1]) + 1 if previous else 0
+            snapshot = self.folder / f"snapshot.{generation}"
+            snapshot.mkdir(parents=True, exist_ok=True)
+
+            n = len(self.ids)
+            for name, column in self._columns.items():
+                np.save(snapshot / f"{name}.npy", column[:n])
+            with open(snapshot / 'ids.json', 'w', encoding='utf-8') as f:
+                json.dump({'ids': self.ids, 'hashes': self.hashes, 'columns': list(self._columns)}, f)
+
+            tmp_current = self.folder / 'CURRENT.tmp'
+            tmp_current.write_text(snapshot.name, encoding='utf-8')
+            os.replace(tmp_current, self.folder / 'CURRENT')
+
+            # Replaying the old log over the new snapshot would be harmless,
+            # so truncating it after the pointer swap is crash-safe
+            open(self.folder / 'pending.jsonl', 'w').close()
+            self._pending = 0
+
+            if previous is not None and previous != snapshot:
+                shutil.rmtree(previous, ignore_errors=True)
+
+    def _log(self, entries: List[Dict[str, Any]]):
+        with open(self.folder / 'pending.jsonl', 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+        self._pending += len(entries)
+        if self._pending >= FLUSH_EVERY:
+            self.flush()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def upsert(self, ids: List[str], hashes: List[str], columns: Dict[str, np.ndarray]):
+        """Insert or replace feature rows; columns must all have len(ids) rows"""
+        ids = [str(i) for i in ids]
+        with self._lock:
+            self._upsert_rows(ids, hashes, columns)
+            self._log([
+                {'id': candidate_id, 'hash': hashes[i],
+                 'columns': {name: column[i].tolist() for name, column in columns.items()},
+                 'dtypes': {name: str(column.dtype) for name, column in columns.items()}}
+                for i, candidate_id in enumerate(ids)
+            ])
+
+    def delete(self, candidate_id: str) -> bool:
+        with self._lock:
+            if not self._delete_row(str(candidate_id)):
+                return False
+            self._log([{'id': str(candidate_id), 'deleted': True}])
+            return True
+
+    def _upsert_rows(self, ids: List[str], hashes: List[str], columns: Dict[str, np.ndarray]):
+        positions = []
+        for candidate_id, candidate_hash in zip(ids, hashes):
+            position = self.index.get(candidate_id)
+            if position is None:
+                position = len(self.ids)
+                self.index[candidate_id] = position
+                self.ids.append(candidate_id)
+                self.hashes.append(candidate_hash)
+            else:
+                self.hashes[position] = candidate_hash
+            positions.append(position)
+
+        n = len(self.ids)
+        for name, values in columns.items():
+            values = np.asarray(values)
+            column = self._columns.get(name)
+            if column is None:
+                column = np.zeros((max(n, 64),) + values.shape[1:], dtype=values.dtype)
+            if values.ndim == 2 and values.shape[1] != column.shape[1]:
+                # Skill vocabulary grew: widen every stored bitset
+                width = max(values.shape[1], column.shape[1])
+                column = fit_width(column, width)
+                values = fit_width(values, width)
+            if n > len(column):
+                grown = np.zeros((max(n, len(column) * 2),) + column.shape[1:], dtype=column.dtype)
+                grown[:len(column)] = column
+                column = grown
+            column[positions] = values
+            self._columns[name] = column
+
+    def _delete_row(self, candidate_id: str) -> bool:
+        position = self.index.pop(candidate_id, None)
+        if position is None:
+            return False
+        # Move the last row into the hole so live rows stay contiguous
+        last = len(self.ids) - 1
+        if position != last:
+            self.ids[position] = self.ids[last]
+            self.hashes[position] = self.hashes[last]
+            for column in self._columns.values():
+                column[position] = column[last]
+            self.index[self.ids[position]] = position
+        self.ids.pop()
+        self.hashes.pop()
+        return True
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def lookup(self, ids: List[str]) -> Tuple[List[str], Dict[str, Any], List[str]]:
+        """(found ids, their feature columns, missing ids)"""
+        with self._lock:
+            found, positions, missing = [], [], []
+            for candidate_id in ids:
+                position = self.index.get(str(candidate_id))
+                if position is None:
+                    missing.append(str(candidate_id))
+                else:
+                    found.append(str(candidate_id))
+                    positions.append(position)
+            return found, self._take(np.asarray(positions, dtype=np.int64)), missing
+
+    def chunks(self, chunk_size: int) -> Iterator[Tuple[List[str], Dict[str, Any]]]:
+        """Every candidate stored when iteration starts, as (ids, columns) slices
+
+        The id order is taken once up front and each slice is copied under the
+        lock but yielded outside it, so a slow consumer never holds up writes.
+        A delete moves the last row into the hole, so rows are looked up by id
+        rather than position: candidates deleted meanwhile are left out and
+        none are skipped or repeated.
+        """
+        with self._lock:
+            order = list(self.ids)
+        for start in range(0, len(order), chunk_size):
+            found, columns, _ = self.lookup(order[start:start + chunk_size])
+            if found:
+                yield found, columns
+
+    def _take(self, positions: np.ndarray) -> Dict[str, Any]:
+        columns = {name: column[positions] for name, column in self._columns.items()}
+        columns['hash'] = [self.hashes[p] for p in positions]
+        return columns
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'candidates': len(self.ids),
+                'columns': {name: str(column.dtype) for name, column in self._columns.items()},
+                'pending_changes': self._pending
+            }
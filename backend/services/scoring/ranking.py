@@ -0,0 +1,87 @@
+"""
+Top-k candidate selection with stable cursor pagination
+
+Candidates are scored chunk by chunk and only the best k seen so far are
+kept, so memory is O(k + chunk size) however many candidates are ranked.
+Ordering is by score descending, then candidate id ascending, which makes
+the order total and lets a cursor (last score, last id) resume exactly
+after the previous page by re-scanning the source.
+"""
+
+import json
+import base64
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+import numpy as np
+
+
+class CursorError(ValueError):
+    """Raised for malformed cursors or cursors issued for another query"""
+
+
+def query_fingerprint(job: Dict[str, Any], weights: Optional[Dict[str, float]]) -> str:
+    payload = json.dumps({'job': job, 'weights': weights}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def encode_cursor(score: float, candidate_id: str, offset: int, fingerprint: str) -> str:
+    payload = json.dumps({'s': score, 'id': candidate_id, 'o': offset, 'q': fingerprint})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, fingerprint: str) -> Dict[str, Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        decoded = {'score': float(payload['s']), 'id': str(payload['id']), 'offset': int(payload['o'])}
+    except (ValueError, KeyError, TypeError):
+        raise CursorError("Invalid cursor")
+    if payload.get('q') != fingerprint:
+        raise CursorError("Cursor was issued for a different job or weights")
+    return decoded
+
+
+def select_top_k(chunks: Iterable[Tuple[List[str], np.ndarray, List[Any]]], k: int,
+                 after: Optional[Dict[str, Any]] = None,
+                 initial: Optional[List[Tuple[float, str, Any]]] = None) -> Tuple[List[Tuple[float, str, Any]], int]:
+    """
+    Keep the k best (score, id, payload) entries ranked after the cursor
+
+    Args:
+        chunks: (ids, scores, payloads) per chunk of candidates
+        k: Page size
+        after: Decoded cursor; only entries ranked strictly after it count
+        initial: Top entries from an earlier call, to keep a running top k
+            across calls
+
+    Returns:
+        (top entries in rank order, number of entries ranked after the cursor)
+    """
+    top: List[Tuple[float, str, Any]] = list(initial) if initial else []
+    remaining = 0
+
+    for ids, scores, payloads in chunks:
+        if not len(ids):
+            continue
+        scores = np.asarray(scores, dtype=np.float64)
+
+        eligible = np.ones(len(ids), dtype=bool)
+        if after is not None:
+            ids_after = np.fromiter((i > after['id'] for i in ids), dtype=bool, count=len(ids))
+            eligible = (scores < after['score']) | ((scores == after['score']) & ids_after)
+
+        positions = np.flatnonzero(eligible)
+        remaining += len(positions)
+        if not len(positions):
+            continue
+
+        # Preselect by score only; ties at the boundary are resolved below
+        if len(positions) > k:
+            threshold = np.partition(scores[positions], len(positions) - k)[len(positions) - k]
+            positions = positions[scores[positions] >= threshold]
+
+        top.extend((float(scores[p]), ids[p], payloads[p]) for p in positions)
+        top.sort(key=lambda entry: (-entry[0], entry[1]))
+        del top[k:]
+
+    return top, remaining
@@ -0,0 +1,218 @@
+"""
+Integer-id skill vocabulary and bitset skill matching
+
+Every canonical (lowercased) skill gets a stable integer id. A skill set is
+then a fixed-width row of uint64 words with bit `id` set, and the overlap
+between many candidates and one job is a bulk AND + popcount instead of a
+Python set intersection per candidate.
+
+Ids are append-only: a skill keeps its id for the lifetime of the
+vocabulary file, so stored bitsets stay valid as the vocabulary grows.
+Only feature-store writes add skills to the file, under an inter-process
+lock after re-reading it, so every worker agrees on the ids.
+
+A scoring request encodes its job and all of its inline candidates from one
+VocabularySnapshot. Skills the snapshot does not know get transient ids that
+exist only in that snapshot and are kept in a separate bitset, so they can
+never collide with a persisted id, not even one another process assigns
+while the request runs. Transient ids are never saved, so ad-hoc input
+cannot grow the vocabulary.
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Iterable, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single writer process assumed
+    fcntl = None
+
+WORD_BITS = 64
+
+# Bits set in every byte value, for numpy versions without bitwise_count
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount_rows(bitsets: np.ndarray) -> np.ndarray:
+    """Number of set bits in each row of a (n, words) uint64 array"""
+    bitsets = np.ascontiguousarray(bitsets, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bitsets).sum(axis=-1, dtype=np.int64)
+    as_bytes = bitsets.view(np.uint8).reshape(bitsets.shape[:-1] + (-1,))
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def fit_width(bitsets: np.ndarray, words: int) -> np.ndarray:
+    """Zero-pad or truncate bitset rows to the given number of words"""
+    current = bitsets.shape[-1]
+    if current == words:
+        return bitsets
+    if current > words:
+        return bitsets[..., :words]
+    pad = [(0, 0)] * (bitsets.ndim - 1) + [(0, words - current)]
+    return np.pad(bitsets, pad)
+
+
+def _words_for(bits: int) -> int:
+    return max((bits + WORD_BITS - 1) // WORD_BITS, 1)
+
+
+def _encode(id_lists: List[List[int]], words: int) -> np.ndarray:
+    """(n, words) uint64 bitsets with the given ids set, one row per id list"""
+    bits = np.zeros((len(id_lists), words * WORD_BITS // 8), dtype=np.uint8)
+    for row, ids in enumerate(id_lists):
+        for skill_id in ids:
+            bits[row, skill_id >> 3] |= np.uint8(1 << (skill_id & 7))
+    # Little-endian byte order puts id 0 in the lowest bit of word 0
+    return bits.view('<u8').astype(np.uint64, copy=False)
+
+
+class SkillVocabulary:
+    """Maps canonical skill names to stable integer ids"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._lock = threading.RLock()
+        self._skills: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._mtime = None
+        self._reload()
+
+    def _reload(self):
+        """Pick up skills other processes have added to the file"""
+        if not self.path:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            skills = json.load(f)['skills']
+        with self._lock:
+            self._mtime = mtime
+            for skill in skills[len(self._skills):]:
+                self._ids[skill] = len(self._skills)
+                self._skills.append(skill)
+
+    def __len__(self) -> int:
+        return len(self._skills)
+
+    @property
+    def words(self) -> int:
+        """Bitset width in uint64 words covering every persisted skill"""
+        return _words_for(len(self._skills))
+
+    @staticmethod
+    def canonical(skill: str) -> str:
+        return skill.lower()
+
+    def snapshot(self) -> 'VocabularySnapshot':
+        """The persisted ids as of now, to encode one request's job and candidates with"""
+        self._reload()
+        with self._lock:
+            return VocabularySnapshot(self._ids, len(self._skills))
+
+    def stored_bitsets(self, skill_sets: List[Iterable[str]]) -> np.ndarray:
+        """
+        (n, words) uint64 bitsets for feature-store rows
+
+        Unseen skills are added to the vocabulary file first, so the rows
+        only ever hold persisted ids.
+        """
+        skill_sets = [list(skills) for skills in skill_sets]
+        unseen = [self.canonical(skill) for skills in skill_sets for skill in skills
+                  if self.canonical(skill) not in self._ids]
+        if unseen:
+            self._assign(unseen)
+        return self.snapshot().bitsets(skill_sets)[0]
+
+    def _assign(self, keys: List[str]):
+        """Persist ids for unseen skills, re-reading the file under the lock first"""
+        with self._lock, _FileLock(self.path.with_suffix('.lock') if self.path else None):
+            self._reload()
+            added = False
+            for key in keys:
+                if key not in self._ids:
+                    self._ids[key] = len(self._skills)
+                    self._skills.append(key)
+                    added = True
+            if added:
+                self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            skills = list(self._skills)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'skills': skills}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+
+class VocabularySnapshot:
+    """
+    Persisted skill ids at one point in time, plus one request's transient ids
+
+    Skills the snapshot does not know as persisted (including ones assigned
+    after it was taken) get transient ids numbered from 0 in a separate
+    bitset, so the two kinds can never be confused.
+    """
+
+    def __init__(self, ids: Dict[str, int], persisted: int):
+        # The vocabulary's own map, shared rather than copied: it only ever
+        # gains entries, and any id at or above `persisted` postdates us
+        self._ids = ids
+        self.persisted = persisted
+        self._transient: Dict[str, int] = {}
+
+    @property
+    def words(self) -> int:
+        return _words_for(self.persisted)
+
+    def bitsets(self, skill_sets: List[Iterable[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """(persisted, transient) uint64 bitsets, one row each per skill collection"""
+        persisted_ids, transient_ids = [], []
+        for skills in skill_sets:
+            known, local = [], []
+            for skill in skills:
+                key = SkillVocabulary.canonical(skill)
+                skill_id = self._ids.get(key)
+                if skill_id is not None and skill_id < self.persisted:
+                    known.append(skill_id)
+                else:
+                    local.append(self._transient.setdefault(key, len(self._transient)))
+            persisted_ids.append(known)
+            transient_ids.append(local)
+        return (_encode(persisted_ids, self.words),
+                _encode(transient_ids, _words_for(len(self._transient))))
+
+
+class _FileLock:
+    """Inter-process lock around vocabulary writes (no-op without a path or fcntl)"""
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if self.path is not None and fcntl is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = open(self.path, 'a')
+            fcntl.flock(self._fd.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd.fileno(), fcntl.LOCK_UN)
+            self._fd.close()
+            self._fd = None
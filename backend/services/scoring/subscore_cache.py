@@ -0,0 +1,181 @@
+"""
+Subscore matrix cache for the scoring service
+
+Subscores depend on the candidate profile, the job and the scoring model
+version, never on the weights. Caching one subscore row per (job, candidate)
+means a weights-only change is answered by one matrix-vector product over
+the cached matrix instead of re-scoring everyone.
+
+Each job entry is tagged with the job's input hash and the model version;
+each row with the candidate's input hash. A changed job drops the whole
+entry, a changed candidate profile recomputes only that row.
+
+The cache is per process and is not persisted. /score/reweight answers
+409 when the worker it reaches has no entry for the job.
+
+Memory is bounded by rows, not just by jobs. When a store would exceed
+max_rows, the least recently used other jobs are evicted first. A job that
+alone needs more rows than the budget keeps only what fits and is marked
+incomplete, so one ranking over a huge inline candidate list cannot pin all
+of its rows.
+"""
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+
+def input_hash(obj: Any) -> str:
+    payload = json.dumps(obj, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class _JobEntry:
+    def __init__(self, job_hash: str, model_version: str, width: int, max_rows: int):
+        self.job_hash = job_hash
+        self.model_version = model_version
+        self.max_rows = max_rows
+        self.ids: List[str] = []
+        self.hashes: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.matrix = np.empty((min(64, max_rows), width), dtype=np.float64)
+        # False once rows were dropped for lack of budget
+        self.complete = True
+
+    def put(self, candidate_id: str, candidate_hash: str, row: np.ndarray):
+        position = self.index.get(candidate_id)
+        if position is None:
+            position = len(self.ids)
+            if position == len(self.matrix):
+                grown = np.empty((min(len(self.matrix) * 2, self.max_rows), self.matrix.shape[1]), dtype=np.float64)
+                grown[:position] = self.matrix[:position]
+                self.matrix = grown
+            self.index[candidate_id] = position
+            self.ids.append(candidate_id)
+            self.hashes.append(candidate_hash)
+        else:
+            self.hashes[position] = candidate_hash
+        self.matrix[position] = row
+
+    def remove(self, candidate_id: str):
+        position = self.index.pop(candidate_id, None)
+        if position is None:
+            return
+        # Move the last row into the hole to keep the matrix dense
+        last = len(self.ids) - 1
+        if position != last:
+            self.ids[position] = self.ids[last]
+            self.hashes[position] = self.hashes[last]
+            self.matrix[position] = self.matrix[last]
+            self.index[self.ids[position]] = position
+        self.ids.pop()
+        self.hashes.pop()
+
+
+class SubscoreCache:
+    """LRU of per-job subscore matrices, bounded by job count and total rows"""
+
+    def __init__(self, model_version: str, width: int, max_jobs: int = 32, max_rows: int = 200000):
+        self.model_version = model_version
+        self.width = width
+        self.max_jobs = max_jobs
+        self.max_rows = max(int(max_rows), 1)
+        self._jobs: 'OrderedDict[str, _JobEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, job_key: str, job_hash: str, create: bool) -> Optional[_JobEntry]:
+        entry = self._jobs.get(job_key)
+        if entry is not None and (entry.job_hash != job_hash or entry.model_version != self.model_version):
+            # Job changed (or scorer upgraded): every row for it is stale
+            del self._jobs[job_key]
+            entry = None
+        if entry is None and create:
+            entry = _JobEntry(job_hash, self.model_version, self.width, self.max_rows)
+            self._jobs[job_key] = entry
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        if entry is not None:
+            self._jobs.move_to_end(job_key)
+        return entry
+
+    def lookup(self, job_key: str, job_hash: str, candidate_ids: List[str],
+               candidate_hashes: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, hit mask); rows for misses are undefined"""
+        rows = np.empty((len(candidate_ids), self.width), dtype=np.float64)
+        hit = np.zeros(len(candidate_ids), dtype=bool)
+        with self._lock:
+            entry = self._entry(job_key, job_hash, create=False)
+            if entry is not None:
+                for i, (candidate_id, candidate_hash) in enumerate(zip(candidate_ids, candidate_hashes)):
+                    position = entry.index.get(candidate_id)
+                    if position is not None and entry.hashes[position] == candidate_hash:
+                        rows[i] = entry.matrix[position]
+                        hit[i] = True
+            hits = int(hit.sum())
+            self.hits += hits
+            self.misses += len(candidate_ids) - hits
+        return rows, hit
+
+    def store(self, job_key: str, job_hash: str, candidate_ids: List[str],
+              candidate_hashes: List[str], rows: np.ndarray):
+        with self._lock:
+            entry = self._entry(job_key, job_hash, create=True)
+            new_rows = sum(1 for candidate_id in candidate_ids if candidate_id not in entry.index)
+            # Make room by evicting least recently used other jobs
+            while self._rows() + new_rows > self.max_rows and len(self._jobs) > 1:
+                self._jobs.popitem(last=False)
+            budget = self.max_rows - self._rows()
+            for candidate_id, candidate_hash, row in zip(candidate_ids, candidate_hashes, rows):
+                if candidate_id not in entry.index:
+                    if budget <= 0:
+                        entry.complete = False
+                        continue
+                    budget -= 1
+                entry.put(candidate_id, candidate_hash, row)
+
+    def _rows(self) -> int:
+        return sum(len(entry.ids) for entry in self._jobs.values())
+
+    def job_matrix(self, job_key: str,
+                   job_hash: Optional[str] = None) -> Optional[Tuple[List[str], np.ndarray, bool]]:
+        """
+        Cached (candidate ids, subscore matrix, complete) for a job, or None
+
+        complete is False when rows were dropped because the job alone
+        needed more than max_rows.
+        """
+        with self._lock:
+            entry = self._jobs.get(job_key)
+            if entry is None or entry.model_version != self.model_version:
+                return None
+            if job_hash is not None and entry.job_hash != job_hash:
+                return None
+            self._jobs.move_to_end(job_key)
+            return list(entry.ids), entry.matrix[:len(entry.ids)].copy(), entry.complete
+
+    def invalidate_candidate(self, candidate_id: str):
+        with self._lock:
+            for entry in self._jobs.values():
+                entry.remove(candidate_id)
+
+    def invalidate_job(self, job_key: str):
+        with self._lock:
+            self._jobs.pop(job_key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'jobs': len(self._jobs),
+                'rows': self._rows(),
+                'max_rows': self.max_rows,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
@@ -0,0 +1,15 @@
+"""
+WSGI entrypoint: gunicorn -c common/gunicorn_conf.py wsgi:app
+
+The feature store snapshot and skill vocabulary are re-read from disk in
+each worker after fork (worker_init), never inherited from the master.
+Writes (PUT/POST /candidates) only update the worker that served them, so
+run a single worker, without max_requests recycling, when candidates are
+written through this service.
+"""
+from app import app, load_state
+
+
+def worker_init():
+    """Called in each worker after fork"""
+    load_state()